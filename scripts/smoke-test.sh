@@ -5,6 +5,8 @@ MAX_WAIT_SECONDS="${MAX_WAIT_SECONDS:-180}"
 WEBSERVICE_URL="${WEBSERVICE_URL:-http://localhost:8080}"
 REFDATA_ADMIN_URL="${REFDATA_ADMIN_URL:-}"
 CONSUL_HTTP_ADDR="${CONSUL_HTTP_ADDR:-http://localhost:8500}"
+# wan (WAN federation) or peering (cluster peering; see docs/production-runbook.md).
+MESH_FEDERATION="${MESH_FEDERATION:-wan}"
 
 if ! command -v curl >/dev/null 2>&1; then
   echo "Missing required command: curl" >&2
@@ -129,15 +131,51 @@ wait_for_passing_service() {
   return 1
 }
 
+wait_for_peering() {
+  peer="$1"
+  deadline=$(( $(date +%s) + 60 ))
+  while [ "$(date +%s)" -lt "$deadline" ]; do
+    body="$(curl -sS "${CONSUL_HTTP_ADDR}/v1/peering/${peer}" 2>/dev/null || true)"
+    echo "$body" | grep -q '"State":"ACTIVE"' && return 0
+    sleep 2
+  done
+  echo "ERROR: Peering with ${peer} is not ACTIVE. Got: ${body:-<empty>}" >&2
+  echo "Run 'meshctl peering token' on the acceptor and 'meshctl peering establish' on the dialer." >&2
+  return 1
+}
+
+wait_for_imported_service() {
+  peer="$1"
+  name="$2"
+  deadline=$(( $(date +%s) + 90 ))
+  while [ "$(date +%s)" -lt "$deadline" ]; do
+    body="$(curl -sS "${CONSUL_HTTP_ADDR}/v1/health/service/${name}?peer=${peer}&passing=1" 2>/dev/null || true)"
+    echo "$body" | grep -q "\"ServiceName\":\"${name}\"" && return 0
+    sleep 2
+  done
+  echo "ERROR: Timed out waiting for passing '${name}' imported from peer ${peer}." >&2
+  echo "Check that ${peer} applied its exported-services entry and that both mesh gateways are healthy." >&2
+  return 1
+}
+
 echo "Waiting for Consul (${CONSUL_HTTP_ADDR})..."
 wait_http_ok "${CONSUL_HTTP_ADDR}/v1/status/leader"
 
-echo "Waiting for WAN federation/catalog to include dc2..."
-wait_for_consul_dc "dc2"
+if [ "$MESH_FEDERATION" = "peering" ]; then
+  echo "Waiting for the dc2 peering to be ACTIVE..."
+  wait_for_peering "dc2"
 
-echo "Waiting for passing mesh gateways (dc1 + dc2)..."
-wait_for_passing_service "dc1" "mesh-gateway"
-wait_for_passing_service "dc2" "mesh-gateway"
+  echo "Waiting for a passing mesh gateway (dc1) and refdata imported from dc2..."
+  wait_for_passing_service "dc1" "mesh-gateway"
+  wait_for_imported_service "dc2" "refdata"
+else
+  echo "Waiting for WAN federation/catalog to include dc2..."
+  wait_for_consul_dc "dc2"
+
+  echo "Waiting for passing mesh gateways (dc1 + dc2)..."
+  wait_for_passing_service "dc1" "mesh-gateway"
+  wait_for_passing_service "dc2" "mesh-gateway"
+fi
 
 echo "Waiting for webservice..."
 wait_http_ok "${WEBSERVICE_URL}/actuator/health"
@@ -155,13 +193,14 @@ echo ""
 refdata_admin="$(pick_refdata_admin_url)"
 echo ""
 echo "Disabling primary refdata (dc1) via ${refdata_admin}..."
+failover_start=$(date +%s)
 curl -fsS "${refdata_admin}?value=false" >/dev/null
 echo "Waiting for Consul health hysteresis + failover..."
 
 echo ""
 echo "== After failover (should be dc2 refdata) =="
 wait_for_refdata_dc "dc2"
-echo "OK: webservice is now using dc2 refdata"
+echo "OK: webservice is now using dc2 refdata (failover took ~$(( $(date +%s) - failover_start ))s, ${MESH_FEDERATION})"
 
 echo ""
 echo "Re-enabling primary refdata (dc1)..."
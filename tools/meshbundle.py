@@ -0,0 +1,38 @@
+# Bundle files as written by tools/render-mesh-bundles.py and read back by tools/meshctl/ (see meshschema.py for
+# what a bundle holds). zipfile and hashlib are imported where they are used: meshctl's start-up must not load them.
+import json
+from collections.abc import Mapping
+from pathlib import Path
+
+# Bump when the shape of bundle["index"] changes; meshctl refuses indexes it does not understand.
+INDEX_VERSION = 4
+# Bump when the shape of the expanded plan.json changes; meshctl asks for `expand --force` on older plans.
+PLAN_VERSION = 3
+
+
+def materialize_files(files: Mapping) -> dict:
+    # A zip bundle loaded by meshctl decodes its file sections lazily; read all of them.
+    return {section: dict(entries) for section, entries in files.items()}
+
+
+def files_digest(files: Mapping) -> str:
+    import hashlib
+
+    return hashlib.sha256(json.dumps(materialize_files(files), sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def write_bundle(path: Path, bundle: dict) -> None:
+    # The format follows the suffix. A zip holds the header (everything but files) first, then one member per
+    # files section so readers can load sections lazily.
+    files = materialize_files(bundle.get("files") or {})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".zip":
+        import zipfile
+
+        header = {k: v for k, v in bundle.items() if k != "files"}
+        with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("bundle.json", json.dumps(header, separators=(",", ":")))
+            for section, entries in sorted(files.items()):
+                zf.writestr(f"files/{section}.json", json.dumps(entries, separators=(",", ":")))
+        return
+    path.write_text(json.dumps({**bundle, "files": files}, indent=2) + "\n", encoding="utf-8")
@@ -0,0 +1 @@
+# meshctl subcommands, one module each; see cli.py for the command line and tools/meshctl.py for the entry point.
@@ -0,0 +1,369 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+from pathlib import Path
+
+from .bundle import bundle_index, is_zip_bundle, load_bundle
+from .common import REPO_ROOT, die, http_get, parse_csv, prometheus_samples, write_text
+from .podman import network_mode, podman
+
+# Agent-to-server RPC counters (Prometheus names) reported by `agent-rpc`.
+AGENT_RPC_METRICS = ("consul_client_rpc", "consul_client_rpc_exceeded", "consul_client_rpc_failed")
+# Server counters reported by `bench-federation`: WAN gossip bytes (network="wan") and RPCs forwarded to other DCs.
+WAN_GOSSIP_METRICS = ("consul_memberlist_udp_sent", "consul_memberlist_udp_received", "consul_memberlist_tcp_sent", "consul_memberlist_tcp_received")
+CROSS_DC_RPC_METRIC = "consul_rpc_cross_dc"
+# Must stay out of the start-up import graph; `bench-import` fails if any of them is loaded by `--help`.
+LAZY_MODULES = ("subprocess", "socket", "zipfile", "mmap", "hashlib", "csv", "gzip", "threading", "http.client", "urllib.request")
+
+
+def latency_summary(samples_ms: list[float]) -> dict:
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {"count": 0}
+
+    def pct(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def measure_latency(host: str, port: int, *, path: str, count: int, keepalive: bool) -> dict:
+    from http.client import HTTPConnection
+
+    connect_ms: list[float] = []
+    request_ms: list[float] = []
+    errors = 0
+    conn = None
+    for _ in range(count):
+        try:
+            if conn is None:
+                t0 = time.perf_counter()
+                conn = HTTPConnection(host, port, timeout=2.0)
+                conn.connect()
+                connect_ms.append((time.perf_counter() - t0) * 1000)
+            if path:
+                t0 = time.perf_counter()
+                conn.request("GET", path)
+                conn.getresponse().read()
+                request_ms.append((time.perf_counter() - t0) * 1000)
+        except OSError:
+            errors += 1
+            if conn is not None:
+                conn.close()
+            conn = None
+            continue
+        if not keepalive:
+            conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+    return {"connect": latency_summary(connect_ms), "request": latency_summary(request_ms), "errors": errors}
+
+
+def cmd_latency(args) -> int:
+    if args.compare:
+        a, b = (json.loads(Path(p).read_text(encoding="utf-8")) for p in args.compare)
+        print(f"{'metric':<20} {a.get('label', 'A'):>12} {b.get('label', 'B'):>12} {'delta':>9}")
+        for phase in ("connect", "request"):
+            for key in ("p50_ms", "p90_ms", "p99_ms", "mean_ms"):
+                va = (a.get(phase) or {}).get(key)
+                vb = (b.get(phase) or {}).get(key)
+                if va is None or vb is None:
+                    continue
+                delta = f"{(vb - va) / va * 100:+.1f}%" if va else "-"
+                print(f"{phase + '.' + key:<20} {va:>12.3f} {vb:>12.3f} {delta:>9}")
+        return 0
+
+    if not args.target:
+        die("latency: --target host:port is required unless --compare is used")
+    host, _, port = args.target.rpartition(":")
+    label = args.label
+    if not label and args.bundle:
+        label = network_mode({k: str(v) for k, v in (load_bundle(Path(args.bundle)).get("env", {}) or {}).items()})
+    result = {
+        "label": label or args.target,
+        "target": args.target,
+        "path": args.path,
+        "keepalive": args.keepalive,
+        **measure_latency(host or "127.0.0.1", int(port), path=args.path, count=args.count, keepalive=args.keepalive),
+    }
+    out = json.dumps(result, indent=2)
+    if args.out:
+        write_text(Path(args.out), out)
+    print(out)
+    return 0
+
+
+def read_agent_counters(base: str) -> dict[str, float]:
+    counters: dict[str, float] = {}
+    for name, _, value in prometheus_samples(base):
+        if name in AGENT_RPC_METRICS:
+            counters[name] = counters.get(name, 0.0) + value
+    return counters
+
+
+def cmd_agent_rpc(args) -> int:
+    if args.compare:
+        a, b = (json.loads(Path(p).read_text(encoding="utf-8")) for p in args.compare)
+        print(f"{'metric (per s)':<28} {a.get('label', 'A'):>12} {b.get('label', 'B'):>12} {'delta':>9}")
+        for name in AGENT_RPC_METRICS:
+            va = (a.get("rates") or {}).get(name)
+            vb = (b.get("rates") or {}).get(name)
+            if va is None or vb is None:
+                continue
+            delta = f"{(vb - va) / va * 100:+.1f}%" if va else "-"
+            print(f"{name:<28} {va:>12.2f} {vb:>12.2f} {delta:>9}")
+        return 0
+
+    base = args.consul_addr.rstrip("/")
+    start = read_agent_counters(base)
+    t0 = time.perf_counter()
+    time.sleep(args.duration)
+    end = read_agent_counters(base)
+    elapsed = time.perf_counter() - t0
+    label = args.label
+    if not label and args.bundle:
+        label = Path(args.bundle).name
+    result = {
+        "label": label or base,
+        "consul_addr": base,
+        "duration_s": round(elapsed, 3),
+        "rates": {name: round((end.get(name, 0.0) - start.get(name, 0.0)) / elapsed, 3) for name in AGENT_RPC_METRICS if name in end},
+    }
+    out = json.dumps(result, indent=2)
+    if args.out:
+        write_text(Path(args.out), out)
+    print(out)
+    return 0
+
+
+def read_federation_counters(base: str, consul_container: str) -> dict[str, float]:
+    counters = {"wan_gossip_bytes": 0.0, "cross_dc_rpc": 0.0}
+    for name, labels, value in prometheus_samples(base):
+        if name in WAN_GOSSIP_METRICS and 'network="wan"' in labels:
+            counters["wan_gossip_bytes"] += value
+        elif name == CROSS_DC_RPC_METRIC:
+            counters["cross_dc_rpc"] += value
+    # Everything the server pod sends and receives (LAN and WAN, control and data plane).
+    pid = podman(["inspect", "--format", "{{.State.Pid}}", consul_container], capture=True).strip()
+    total = 0
+    for line in Path(f"/proc/{pid}/net/dev").read_text(encoding="utf-8").splitlines()[2:]:
+        iface, _, fields = line.partition(":")
+        if iface.strip() != "lo":
+            cols = fields.split()
+            total += int(cols[0]) + int(cols[8])
+    counters["pod_net_bytes"] = float(total)
+    return counters
+
+
+def wait_body(url: str, expect: str, *, present: bool, timeout_s: float) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout_s:
+        code, body = http_get(url, timeout_s=2.0)
+        if code == 200 and (expect in body) == present:
+            return time.perf_counter() - t0
+        time.sleep(0.2)
+    die(f"Timed out after {timeout_s:.0f}s waiting for {url} to {'return' if present else 'stop returning'} {expect!r}")
+    return 0.0
+
+
+def cmd_bench_federation(args) -> int:
+    if args.compare:
+        a, b = (json.loads(Path(p).read_text(encoding="utf-8")) for p in args.compare)
+        print(f"{'metric':<28} {a.get('label', 'A'):>12} {b.get('label', 'B'):>12} {'delta':>9}")
+        rows = [(f"{name} per s", (a.get("rates") or {}).get(name), (b.get("rates") or {}).get(name)) for name in (a.get("rates") or {})]
+        rows += [(name, a.get(name), b.get(name)) for name in ("failover_s", "restore_s")]
+        for name, va, vb in rows:
+            if va is None or vb is None:
+                continue
+            delta = f"{(vb - va) / va * 100:+.1f}%" if va else "-"
+            print(f"{name:<28} {va:>12.2f} {vb:>12.2f} {delta:>9}")
+        return 0
+
+    if not args.bundle:
+        die("bench-federation: --bundle (server bundle) or --compare is required")
+    bundle = load_bundle(Path(args.bundle))
+    if bundle.get("role") != "server":
+        die("bench-federation --bundle expects a server bundle")
+    env = bundle.get("env") or {}
+    base = f"http://{env.get('MGMT_BIND_ADDR', '127.0.0.1')}:8500"
+    consul_container = bundle_index(bundle)["containers"]["consul"]
+
+    # Control-plane traffic: run with no application traffic, so what the pod moves is Consul's own chatter.
+    start = read_federation_counters(base, consul_container)
+    t0 = time.perf_counter()
+    time.sleep(args.duration)
+    end = read_federation_counters(base, consul_container)
+    elapsed = time.perf_counter() - t0
+    result = {
+        "label": args.label or env.get("CONSUL_FEDERATION", "wan"),
+        "bundle": Path(args.bundle).name,
+        "duration_s": round(elapsed, 3),
+        "rates": {name: round((end[name] - start[name]) / elapsed, 3) for name in end},
+    }
+
+    # Failover time: make the primary unhealthy, then time until the probe is served by the failover DC.
+    if args.trigger_url:
+        if not args.probe_url or not args.expect:
+            die("--trigger-url needs --probe-url and --expect")
+        wait_body(args.probe_url, args.expect, present=False, timeout_s=args.timeout)
+        code, _ = http_get(args.trigger_url, timeout_s=5.0)
+        if code != 200:
+            die(f"GET {args.trigger_url} -> {code}")
+        result["failover_s"] = round(wait_body(args.probe_url, args.expect, present=True, timeout_s=args.timeout), 3)
+        if args.restore_url:
+            code, _ = http_get(args.restore_url, timeout_s=5.0)
+            if code != 200:
+                die(f"GET {args.restore_url} -> {code}")
+            result["restore_s"] = round(wait_body(args.probe_url, args.expect, present=False, timeout_s=args.timeout), 3)
+
+    out = json.dumps(result, indent=2)
+    if args.out:
+        write_text(Path(args.out), out)
+    print(out)
+    return 0
+
+
+def cmd_bench_load(args) -> int:
+    bundle_path = Path(args.bundle)
+    sections = parse_csv(args.sections)
+    samples: list[float] = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        bundle = load_bundle(bundle_path)
+        files = bundle.get("files") or {}
+        for section in sections:
+            files.get(section)
+        samples.append((time.perf_counter() - t0) * 1000)
+    result = {
+        "bundle": bundle_path.as_posix(),
+        "format": "zip" if is_zip_bundle(bundle_path) else "json",
+        "bytes": bundle_path.stat().st_size,
+        "sections": sections,
+        "load": latency_summary(samples),
+    }
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def parse_importtime(stderr: str) -> dict[str, float]:
+    # `-X importtime` lines: "import time: self [us] | cumulative | [indent]module"; top-level modules only.
+    cumulative: dict[str, float] = {}
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not line.startswith("import time:") or parts[2].startswith("  "):
+            continue
+        try:
+            cumulative[parts[2].strip()] = int(parts[1]) / 1000
+        except ValueError:
+            continue
+    return cumulative
+
+
+def cmd_bench_import(args) -> int:
+    import subprocess
+
+    entry = REPO_ROOT / "tools" / "meshctl.py"
+    cli = [sys.executable, "-X", "importtime", str(entry), *args.command.split(), "--help"]
+    baseline: list[float] = []
+    samples: list[float] = []
+    imports: dict[str, float] = {}
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        baseline.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        proc = subprocess.run(cli, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        samples.append((time.perf_counter() - t0) * 1000)
+        imports = parse_importtime(proc.stderr)
+    # Best-of-N: start-up noise on a busy host only ever adds time.
+    overhead = round(min(samples) - min(baseline), 3)
+    loaded = sorted(m for m in imports if m in LAZY_MODULES)
+    result = {
+        "command": args.command or "(main)",
+        "repeat": args.repeat,
+        "python_ms": round(min(baseline), 3),
+        "cli_ms": round(min(samples), 3),
+        "overhead_ms": overhead,
+        "max_ms": args.max_ms,
+        "top_imports": [
+            {"module": m, "cumulative_ms": ms} for m, ms in sorted(imports.items(), key=lambda kv: -kv[1])[: args.top]
+        ],
+        "lazy_modules_loaded": loaded,
+    }
+    print(json.dumps(result, indent=2))
+    if loaded:
+        die(f"Start-up imports modules that must stay lazy: {', '.join(loaded)}")
+    if args.max_ms and overhead > args.max_ms:
+        die(f"Start-up overhead {overhead:.1f}ms exceeds --max-ms {args.max_ms:g}")
+    return 0
+
+
+def gateway_targets(args) -> list[tuple[str, int]]:
+    if args.targets:
+        targets = []
+        for t in parse_csv(args.targets):
+            host, _, port = t.rpartition(":")
+            if not host or not port.isdigit():
+                die(f"Invalid target (expected host:port): {t}")
+            targets.append((host, int(port)))
+        return targets
+    if not args.bundle:
+        die("Provide --targets or --bundle (server bundle)")
+    bundle = load_bundle(Path(args.bundle))
+    if bundle.get("role") != "server":
+        die("bench-gateway --bundle expects a server bundle")
+    host = args.host or str((bundle.get("env") or {}).get("HOST_IP") or bundle.get("host_ip") or "127.0.0.1")
+    return [(host, int(gw["port"])) for gw in bundle_index(bundle)["gateways"]]
+
+
+def connect_loop(targets: list[tuple[str, int]], offset: int, deadline: float) -> tuple[int, int]:
+    import socket
+
+    ok = errors = 0
+    i = offset
+    while time.perf_counter() < deadline:
+        host, port = targets[i % len(targets)]
+        i += 1
+        try:
+            socket.create_connection((host, port), timeout=2.0).close()
+            ok += 1
+        except OSError:
+            errors += 1
+    return ok, errors
+
+
+def cmd_bench_gateway(args) -> int:
+    from concurrent.futures import ThreadPoolExecutor
+
+    targets = gateway_targets(args)
+    results = []
+    # Same client load against 1..N gateways: connection rate should grow with the gateway count
+    # until the client or the network becomes the bottleneck.
+    for k in range(1, len(targets) + 1):
+        subset = targets[:k]
+        deadline = time.perf_counter() + args.duration
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            counts = list(pool.map(lambda w: connect_loop(subset, w, deadline), range(args.concurrency)))
+        ok = sum(c[0] for c in counts)
+        errors = sum(c[1] for c in counts)
+        results.append({"gateways": k, "connections": ok, "errors": errors, "conn_per_s": round(ok / args.duration, 1)})
+    base = results[0]["conn_per_s"] or 1.0
+    for r in results:
+        r["scaling"] = round(r["conn_per_s"] / base, 2)
+    report = {"targets": [f"{h}:{p}" for h, p in targets], "duration_s": args.duration, "concurrency": args.concurrency, "results": results}
+    if args.out:
+        write_text(Path(args.out), json.dumps(report, indent=2) + "\n")
+    print(f"{'gateways':>8} {'conn/s':>10} {'scaling':>8} {'errors':>7}")
+    for r in results:
+        print(f"{r['gateways']:>8} {r['conn_per_s']:>10} {r['scaling']:>8} {r['errors']:>7}")
+    return 0
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from meshbundle import INDEX_VERSION, materialize_files, write_bundle
+
+from .common import REPO_ROOT, die
+
+if TYPE_CHECKING:
+    import zipfile
+
+
+class LazyFiles(Mapping):
+    # bundle.files backed by one zip member per section; a section is decoded on first access.
+    def __init__(self, zf: zipfile.ZipFile, sections: list[str]):
+        self._zf = zf
+        self._sections = sections
+        self._cache: dict[str, dict] = {}
+
+    def __getitem__(self, section: str) -> dict:
+        if section not in self._cache:
+            if section not in self._sections:
+                raise KeyError(section)
+            self._cache[section] = json.loads(self._zf.read(f"files/{section}.json"))
+        return self._cache[section]
+
+    def __iter__(self):
+        return iter(self._sections)
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+
+def load_bundle_zip(bundle_path: Path) -> dict:
+    import mmap
+    import zipfile
+
+    class MappedFile(mmap.mmap):
+        # zipfile wants a seekable file object; mmap provides read/seek/tell but not seekable().
+        def seekable(self) -> bool:
+            return True
+
+    with bundle_path.open("rb") as f:
+        mm = MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ)
+    zf = zipfile.ZipFile(mm)
+    bundle = json.loads(zf.read("bundle.json"))
+    sections = [m[len("files/") : -len(".json")] for m in zf.namelist() if m.startswith("files/") and m.endswith(".json")]
+    bundle["files"] = LazyFiles(zf, sections)
+    return bundle
+
+
+def is_zip_bundle(bundle_path: Path) -> bool:
+    import zipfile
+
+    return bundle_path.suffix == ".zip" or zipfile.is_zipfile(bundle_path)
+
+
+def load_bundle(bundle_path: Path) -> dict:
+    if is_zip_bundle(bundle_path):
+        bundle = load_bundle_zip(bundle_path)
+    else:
+        bundle = json.loads(bundle_path.read_text(encoding="utf-8"))
+    if not isinstance(bundle, dict):
+        die(f"{bundle_path}: not a bundle")
+    # A stale index gets the "re-render" message rather than a list of schema errors.
+    bundle_index(bundle)
+    # Header only: file sections are checked where they are used (expand, doctor).
+    check_bundle_schema(bundle, bundle_path, files=False)
+    return bundle
+
+
+def check_bundle_schema(bundle: dict, bundle_path: Path, *, files: bool = True) -> None:
+    import meshschema
+
+    if files:
+        bundle = {**bundle, "files": materialize_files(bundle.get("files") or {})}
+    errors = meshschema.bundle_errors(bundle, files=files)
+    if errors:
+        die(f"{bundle_path}: bundle does not match the bundle schema (version {meshschema.BUNDLE_VERSION}):\n  " + "\n  ".join(errors))
+
+
+def bundle_index(bundle: dict) -> dict:
+    index = bundle.get("index")
+    if not isinstance(index, dict):
+        die(f"{bundle.get('host')}: bundle has no precomputed index; re-render it with tools/render-mesh-bundles.py")
+    if index.get("version") != INDEX_VERSION:
+        die(
+            f"{bundle.get('host')}: bundle index version {index.get('version')} is not supported "
+            f"(expected {INDEX_VERSION}); re-render it with tools/render-mesh-bundles.py"
+        )
+    return index
+
+
+def expanded_root(bundle: dict) -> Path:
+    host = bundle.get("host") or "unknown-host"
+    role = bundle.get("role") or "unknown-role"
+    return REPO_ROOT / "run" / "mesh" / "expanded" / host / role
+
+
+def read_entry_store(refs: Mapping, store_dir: Path) -> dict[str, str]:
+    import hashlib
+
+    entries: dict[str, str] = {}
+    for name, digest in refs.items():
+        path = store_dir / f"{digest}.hcl"
+        if not path.is_file():
+            die(f"Config entry {name} not found in entry store: {path.as_posix()}")
+        content = path.read_text(encoding="utf-8")
+        if hashlib.sha256(content.encode("utf-8")).hexdigest() != digest:
+            die(f"Config entry store file is corrupt (hash mismatch): {path.as_posix()}")
+        entries[name] = content
+    return entries
+
+
+def cmd_convert(args) -> int:
+    src = Path(args.bundle)
+    out = Path(args.out)
+    if out.suffix not in (".json", ".zip"):
+        die(f"--out must end in .json or .zip: {out}")
+    bundle = load_bundle(src)
+    write_bundle(out, bundle)
+    print(f"Converted: {src.as_posix()} ({src.stat().st_size} bytes) -> {out.as_posix()} ({out.stat().st_size} bytes)")
+    return 0
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+
+# Subcommands live in their own modules and are imported only when they run; modules used by only some
+# subcommands (subprocess, socket, zipfile, urllib, ...) are imported where they are used. Every invocation
+# pays for the imports of this module (see `bench-import`).
+
+
+def add_drain_args(p) -> None:
+    p.add_argument("--no-drain", action="store_true", help="Remove the pod immediately (no maintenance, no listener drain)")
+    p.add_argument(
+        "--drain-timeout", type=float, help="Max seconds to wait for active connections to reach zero (default: ENVOY_DRAIN_TIME_S, 15)"
+    )
+    p.add_argument("--propagation-timeout", type=float, default=30.0, help="Max seconds to wait for the servers to see maintenance (default: 30)")
+    p.add_argument("--settle", type=float, default=2.0, help="Seconds for other proxies to receive the endpoint removal (default: 2)")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Start/stop the Podman-based Consul mesh using a single per-host bundle JSON.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("expand", help="Deploy-time: expand a bundle into run/mesh/expanded/<host>/<role>/ (no containers started)")
+    p.add_argument("--bundle", required=True, help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--force", action="store_true", help="Overwrite existing expanded output")
+    p.add_argument("--entry-store", help="Config entry store directory for hash-referenced entries (default: <bundle dir>/entries)")
+    p.set_defaults(func="expand:cmd_expand")
+
+    p = sub.add_parser("up-server", help="Start server+mesh-gateway using podman (requires pre-expanded bundle output)")
+    p.add_argument("--bundle", help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--plan", help="Replay this expanded plan.json directly (no bundle needed)")
+    p.add_argument("--auto-expand", action="store_true", help="If expanded output is missing, generate it at runtime (not recommended)")
+    p.set_defaults(func="stack:cmd_up_server")
+
+    p = sub.add_parser("down-server", help="Stop server pod (optionally remove volumes)")
+    p.add_argument("--bundle", required=True, help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--remove-volumes", action="store_true", help="Also delete Podman volumes (data + bootstraps)")
+    add_drain_args(p)
+    p.set_defaults(func="stack:cmd_down_server")
+
+    p = sub.add_parser("up-app", help="Start agent+sidecars using podman (requires pre-expanded bundle output)")
+    p.add_argument("--bundle", help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--plan", help="Replay this expanded plan.json directly (no bundle needed)")
+    p.add_argument("--auto-expand", action="store_true", help="If expanded output is missing, generate it at runtime (not recommended)")
+    p.set_defaults(func="stack:cmd_up_app")
+
+    p = sub.add_parser("down-app", help="Stop app pod (optionally remove volumes)")
+    p.add_argument("--bundle", required=True, help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--remove-volumes", action="store_true", help="Also delete Podman volumes (data + bootstraps)")
+    add_drain_args(p)
+    p.set_defaults(func="stack:cmd_down_app")
+
+    p = sub.add_parser("verify", help="Basic readiness check (server leader / app agent reachable)")
+    p.add_argument("--bundle", action="append", help="Path to <host>.bundle.json or <host>.bundle.zip (repeatable)")
+    p.add_argument("--bundles", action="append", help="Verify every bundle in this directory (repeatable)")
+    p.add_argument("--jobs", type=int, default=16, help="Checks run concurrently (default: 16)")
+    p.add_argument("--timeout", type=float, default=2.0, help="Per-request timeout, seconds (default: 2)")
+    p.add_argument(
+        "--address",
+        action="append",
+        help="HOST=ADDR[:PORT]: Consul HTTP API to check HOST's bundle against (repeatable; default: loopback for this host, "
+        "else the host's management bind or host_ip)",
+    )
+    p.add_argument("--json", action="store_true", help="Print pass/fail and per-check latency as JSON")
+    p.set_defaults(func="verify:cmd_verify")
+
+    p = sub.add_parser("peering", help="Cluster peering: generate tokens (acceptor), establish (dialer), or show peering state")
+    p.add_argument("action", choices=("token", "establish", "status"))
+    p.add_argument("--bundle", required=True, help="Server bundle rendered with mesh_federation: peering")
+    p.add_argument("--token-dir", default="run/mesh/peering", help="Where tokens are written/read (default: run/mesh/peering)")
+    p.add_argument("--force", action="store_true", help="Regenerate/re-establish even if the peering is ACTIVE")
+    p.set_defaults(func="peering:cmd_peering")
+
+    p = sub.add_parser("doctor", help="Preflight check: validate bundle + expanded artifacts + basic Podman availability")
+    p.add_argument("--bundle", required=True, help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--deep", action="store_true", help="Also hash the bundle files to confirm the index is not stale")
+    p.set_defaults(func="doctor:cmd_doctor")
+
+    p = sub.add_parser("latency", help="Measure connect/request latency through a local port (A/B network mode comparison)")
+    p.add_argument("--target", help="host:port to measure, e.g. 127.0.0.1:18082 (a sidecar upstream)")
+    p.add_argument("--path", default="", help="HTTP path to GET per sample (default: TCP connect only)")
+    p.add_argument("--count", type=int, default=500, help="Number of samples (default: 500)")
+    p.add_argument("--keepalive", action="store_true", help="Reuse one connection for all requests")
+    p.add_argument("--bundle", help="Label the result with this bundle's MESH_NETWORK_MODE")
+    p.add_argument("--label", help="Label for the result (default: network mode or target)")
+    p.add_argument("--out", help="Write JSON result to this path")
+    p.add_argument("--compare", nargs=2, metavar=("A_JSON", "B_JSON"), help="Compare two saved results instead of measuring")
+    p.set_defaults(func="bench:cmd_latency")
+
+    p = sub.add_parser("agent-rpc", help="Measure agent-to-server RPC rate from the local agent's metrics (A/B agent tuning comparison)")
+    p.add_argument("--consul-addr", default="http://127.0.0.1:8500", help="Agent HTTP address (default: http://127.0.0.1:8500)")
+    p.add_argument("--duration", type=float, default=60.0, help="Seconds between the two counter reads (default: 60)")
+    p.add_argument("--bundle", help="Label the result with this bundle's file name")
+    p.add_argument("--label", help="Label for the result (default: bundle name or agent address)")
+    p.add_argument("--out", help="Write JSON result to this path")
+    p.add_argument("--compare", nargs=2, metavar=("A_JSON", "B_JSON"), help="Compare two saved results instead of measuring")
+    p.set_defaults(func="bench:cmd_agent_rpc")
+
+    p = sub.add_parser("bench-federation", help="Measure control-plane traffic and failover time of a server (WAN federation vs peering)")
+    p.add_argument("--bundle", help="Server bundle whose Consul server and pod are measured")
+    p.add_argument("--duration", type=float, default=60.0, help="Seconds between the two counter reads (default: 60)")
+    p.add_argument("--probe-url", help="URL polled during failover, e.g. http://127.0.0.1:8080/api/refdata/demo")
+    p.add_argument("--expect", help='Text in the probe response once failover is done, e.g. \'"datacenter":"dc2"\'')
+    p.add_argument("--trigger-url", help="URL that makes the primary unhealthy (GET)")
+    p.add_argument("--restore-url", help="URL that makes the primary healthy again (GET)")
+    p.add_argument("--timeout", type=float, default=180.0, help="Failover/restore timeout, seconds (default: 180)")
+    p.add_argument("--label", help="Label for the result (default: the bundle's federation mode)")
+    p.add_argument("--out", help="Write JSON result to this path")
+    p.add_argument("--compare", nargs=2, metavar=("A_JSON", "B_JSON"), help="Compare two saved results instead of measuring")
+    p.set_defaults(func="bench:cmd_bench_federation")
+
+    p = sub.add_parser("bench-dns", help="Measure query rate and latency of a DNS server (the pod's caching forwarder or a local stub)")
+    p.add_argument("--server", default="127.0.0.1:8653", help="DNS server host:port (default: 127.0.0.1:8653)")
+    p.add_argument("--stub", action="store_true", help="Run against an in-process stub that answers every query")
+    p.add_argument("--names", default="refdata.service.consul", help="Comma-separated names to query round-robin")
+    p.add_argument("--duration", type=float, default=10.0, help="Seconds to run (default: 10)")
+    p.add_argument("--concurrency", type=int, default=8, help="Client threads (default: 8)")
+    p.add_argument("--label", help="Label for the result")
+    p.add_argument("--out", help="Write JSON result to this path")
+    p.set_defaults(func="dns:cmd_bench_dns")
+
+    p = sub.add_parser("snapshot", help="Export health of every service instance across DCs to CSV, or diff two snapshots")
+    p.add_argument("--consul-addr", default="http://127.0.0.1:8500", help="Consul HTTP address (default: http://127.0.0.1:8500)")
+    p.add_argument("--dcs", default="", help="Comma-separated DCs (default: all from /v1/catalog/datacenters)")
+    p.add_argument("--out", help="Output file (.csv or .csv.gz)")
+    p.add_argument("--diff", nargs=2, metavar=("A", "B"), help="Compare two snapshots instead of fetching")
+    p.add_argument("--json", action="store_true", help="Print the diff as JSON")
+    p.set_defaults(func="snapshot:cmd_snapshot")
+
+    p = sub.add_parser("prefetch", help="Deploy-time: pull the bundle's images, pin them to digests in runtime.env, verify the local store")
+    p.add_argument("--bundle", required=True, help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--verify", action="store_true", help="Only check that the pinned images are in the local store")
+    p.add_argument("--jobs", type=int, default=0, help="Parallel pulls (default: one per image)")
+    p.set_defaults(func="prefetch:cmd_prefetch")
+
+    p = sub.add_parser("supervise", help="Long-running: watch containers (podman events) and health, restart only broken components")
+    p.add_argument("--bundle", required=True, help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--interval", type=float, default=5.0, help="Health check interval while healthy, seconds (default: 5)")
+    p.add_argument("--grace", type=float, default=5.0, help="Seconds a component may stay unhealthy before it is restarted (default: 5)")
+    p.add_argument("--metrics-file", help="Write Prometheus textfile metrics here (node_exporter textfile collector)")
+    p.set_defaults(func="supervise:cmd_supervise")
+
+    p = sub.add_parser("convert", help="Convert a bundle between the JSON and zip container formats")
+    p.add_argument("--bundle", required=True, help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--out", required=True, help="Output path; the format follows the suffix (.json or .zip)")
+    p.set_defaults(func="bundle:cmd_convert")
+
+    p = sub.add_parser("bench-load", help="Measure bundle load time (optionally decoding some file sections)")
+    p.add_argument("--bundle", required=True, help="Path to <host>.bundle.json or <host>.bundle.zip")
+    p.add_argument("--sections", default="", help="Comma-separated file sections to decode, e.g. config_entries")
+    p.add_argument("--repeat", type=int, default=50, help="Number of loads (default: 50)")
+    p.set_defaults(func="bench:cmd_bench_load")
+
+    p = sub.add_parser("bench-import", help="Measure CLI start-up (interpreter + imports) and fail on regressions")
+    p.add_argument("--command", default="", help="Subcommand whose --help is timed, e.g. verify (default: top-level --help)")
+    p.add_argument("--repeat", type=int, default=10, help="Number of runs; the fastest is reported (default: 10)")
+    p.add_argument("--max-ms", type=float, default=0.0, help="Fail if start-up exceeds bare `python -c pass` by more than this")
+    p.add_argument("--top", type=int, default=8, help="Number of slowest top-level imports to list (default: 8)")
+    p.set_defaults(func="bench:cmd_bench_import")
+
+    p = sub.add_parser("bench-gateway", help="Measure TCP connection rate through 1..N mesh gateway instances")
+    p.add_argument("--targets", help="Comma-separated gateway host:port list")
+    p.add_argument("--bundle", help="Server bundle; gateway ports are taken from its index")
+    p.add_argument("--host", help="Gateway host when using --bundle (default: bundle HOST_IP)")
+    p.add_argument("--duration", type=float, default=5.0, help="Seconds per step (default: 5)")
+    p.add_argument("--concurrency", type=int, default=32, help="Client threads (default: 32)")
+    p.add_argument("--out", help="Write the JSON report here")
+    p.set_defaults(func="bench:cmd_bench_gateway")
+
+    args = ap.parse_args()
+    # Only the chosen subcommand's module is imported (see `bench-import`).
+    module, _, name = args.func.partition(":")
+    return int(getattr(importlib.import_module(f".{module}", __package__), name)(args))
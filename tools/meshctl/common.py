@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import subprocess
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def die(msg: str) -> None:
+    print(f"ERROR: {msg}", file=sys.stderr)
+    raise SystemExit(2)
+
+
+def warn(msg: str) -> None:
+    print(f"WARN: {msg}", file=sys.stderr)
+
+
+def run_proc(cmd: list[str], *, check: bool = True, capture: bool = False, cwd: Path | None = None) -> subprocess.CompletedProcess:
+    import subprocess
+
+    return subprocess.run(
+        cmd,
+        check=check,
+        cwd=str(cwd) if cwd else None,
+        stdout=subprocess.PIPE if capture else None,
+        stderr=subprocess.PIPE if capture else None,
+        text=True,
+    )
+
+
+def run(cmd: list[str], *, check: bool = True, capture: bool = False, cwd: Path | None = None) -> str:
+    proc = run_proc(cmd, check=check, capture=capture, cwd=cwd)
+    if capture:
+        return (proc.stdout or "").strip()
+    return ""
+
+
+def http_get(url: str, timeout_s: float = 2.0) -> tuple[int, str]:
+    from urllib.error import HTTPError, URLError
+    from urllib.request import urlopen
+
+    try:
+        with urlopen(url, timeout=timeout_s) as resp:
+            return resp.status, resp.read().decode("utf-8", errors="replace")
+    except HTTPError as e:
+        body = e.read().decode("utf-8", errors="replace") if e.fp else ""
+        return e.code, body
+    except URLError as e:
+        return 0, str(e)
+    except OSError as e:
+        # Includes ConnectionResetError, BrokenPipeError, etc.
+        return 0, str(e)
+
+
+def http_send(method: str, url: str, body: str, timeout_s: float = 5.0) -> tuple[int, str]:
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+
+    req = Request(url, data=body.encode("utf-8"), method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urlopen(req, timeout=timeout_s) as resp:
+            return resp.status, resp.read().decode("utf-8", errors="replace")
+    except HTTPError as e:
+        return e.code, e.read().decode("utf-8", errors="replace") if e.fp else ""
+    except OSError as e:
+        return 0, str(e)
+
+
+def write_text(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content.rstrip() + "\n", encoding="utf-8")
+
+
+def write_env(path: Path, env: dict[str, str]) -> None:
+    lines = []
+    for k in sorted(env.keys()):
+        v = env[k]
+        if v is None:
+            continue
+        lines.append(f"{k}={v}")
+    write_text(path, "\n".join(lines))
+
+
+def read_env(path: Path) -> dict[str, str]:
+    env: dict[str, str] = {}
+    if not path.is_file():
+        return env
+    for line in path.read_text(encoding="utf-8").splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            env[key] = value
+    return env
+
+
+def parse_csv(value: str) -> list[str]:
+    if not value:
+        return []
+    return [p.strip() for p in value.split(",") if p.strip()]
+
+
+def require_file(path: Path) -> None:
+    if not path.is_file():
+        die(f"Missing required file: {path}")
+
+
+def require_cmd(name: str) -> None:
+    from shutil import which
+
+    if which(name) is None:
+        die(f"Missing required command in PATH: {name}")
+
+
+def prometheus_samples(base: str) -> list[tuple[str, str, float]]:
+    # Prometheus output keeps cumulative counters (the JSON endpoint only shows the current interval).
+    code, body = http_get(f"{base}/v1/agent/metrics?format=prometheus", timeout_s=5.0)
+    if code != 200:
+        die(
+            f"GET {base}/v1/agent/metrics?format=prometheus -> {code}; "
+            "set prometheus_retention_time (e.g. 60s) in consul_agent_tuning/consul_server_tuning to expose counters"
+        )
+    samples = []
+    for line in body.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_labels, _, value = line.rpartition(" ")
+        name, _, labels = name_labels.partition("{")
+        try:
+            samples.append((name, labels, float(value)))
+        except ValueError:
+            continue
+    return samples
+
+
+def fetch_json(url: str) -> object:
+    code, body = http_get(url, timeout_s=10.0)
+    if code != 200:
+        die(f"GET {url} -> {code}: {body[:200]}")
+    return json.loads(body)
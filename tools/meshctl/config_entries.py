@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import json
+
+from .common import die
+
+# Singleton config entry kinds have no Name field; Consul names them after the kind.
+UNNAMED_ENTRY_KINDS = ("mesh",)
+
+
+def hcl_tokens(text: str) -> list[tuple[str, str, int]]:
+    import re
+
+    token_re = re.compile(
+        r'(?P<skip>\s+|#[^\n]*|//[^\n]*|/\*.*?\*/)|(?P<str>"(?:[^"\\]|\\.)*")|(?P<num>-?\d+(?:\.\d+)?(?![\w.]))'
+        r"|(?P<ident>[A-Za-z_][\w.-]*)|(?P<punct>[{}\[\]=:,])",
+        re.S,
+    )
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        m = token_re.match(text, pos)
+        if not m:
+            raise ValueError(f"line {text.count(chr(10), 0, pos) + 1}: unexpected {text[pos]!r}")
+        if m.lastgroup != "skip":
+            tokens.append((m.lastgroup, m.group(), text.count("\n", 0, pos) + 1))
+        pos = m.end()
+    return tokens
+
+
+def parse_hcl(text: str) -> dict:
+    # The HCL subset config entries use: attributes, `Key = { ... }` / `Key { ... }` blocks (repeated
+    # blocks become a list), lists, strings, numbers and booleans.
+    tokens = hcl_tokens(text)
+    pos = 0
+
+    def peek() -> str:
+        return tokens[pos][1] if pos < len(tokens) else ""
+
+    def take() -> tuple[str, str, int]:
+        nonlocal pos
+        if pos >= len(tokens):
+            raise ValueError("unexpected end of input")
+        pos += 1
+        return tokens[pos - 1]
+
+    def body(end: str) -> dict:
+        obj: dict = {}
+        while peek() != end:
+            kind, key, line = take()
+            if kind == "str":
+                key = json.loads(key)
+            elif kind != "ident":
+                raise ValueError(f"line {line}: expected a key, got {key!r}")
+            if peek() in ("=", ":"):
+                take()
+            elif peek() != "{":
+                raise ValueError(f"line {line}: expected '=' after {key}")
+            v = value()
+            if key in obj and isinstance(v, dict):
+                prev = obj[key]
+                obj[key] = (prev if isinstance(prev, list) else [prev]) + [v]
+            else:
+                obj[key] = v
+            if peek() == ",":
+                take()
+        return obj
+
+    def value() -> object:
+        kind, tok, line = take()
+        if tok == "{":
+            v = body("}")
+            take()
+            return v
+        if tok == "[":
+            items = []
+            while peek() != "]":
+                items.append(value())
+                if peek() == ",":
+                    take()
+            take()
+            return items
+        if kind == "str":
+            return json.loads(tok)
+        if kind == "num":
+            return float(tok) if "." in tok else int(tok)
+        if tok in ("true", "false"):
+            return tok == "true"
+        if tok == "null":
+            return None
+        raise ValueError(f"line {line}: unexpected {tok!r}")
+
+    return body("")
+
+
+def go_duration_s(value: str) -> float | None:
+    import re
+
+    units = {"ns": 1e-9, "us": 1e-6, "µs": 1e-6, "ms": 1e-3, "s": 1.0, "m": 60.0, "h": 3600.0}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h)", value)
+    if not parts or "".join(n + u for n, u in parts) != value:
+        return None
+    return sum(float(n) * units[u] for n, u in parts)
+
+
+def entry_drift(want: object, got: object, path: str = "") -> list[str]:
+    # Differences between a rendered entry and the live one. Only fields the entry sets are compared:
+    # Consul adds indexes/defaults, drops zero values, and accepts snake_case or CamelCase keys.
+    where = path or "."
+    if isinstance(want, dict):
+        if not isinstance(got, dict):
+            return [f"{where}: want an object, got {json.dumps(got)}"]
+        live = {k.replace("_", "").lower(): v for k, v in got.items()}
+        drift = []
+        for k, v in want.items():
+            sub = f"{path}.{k}" if path else k
+            key = k.replace("_", "").lower()
+            if key not in live:
+                if v not in ({}, [], "", None, False, 0):
+                    drift.append(f"{sub}: missing")
+                continue
+            drift += entry_drift(v, live[key], sub)
+        return drift
+    if isinstance(want, list):
+        if not isinstance(got, list) or len(got) != len(want):
+            return [f"{where}: want {json.dumps(want)}, got {json.dumps(got)}"]
+        if not all(isinstance(w, dict) for w in want):
+            # Scalar lists (e.g. failover Datacenters) are ordered.
+            return [d for i, (w, g) in enumerate(zip(want, got)) for d in entry_drift(w, g, f"{path}[{i}]")]
+        # Object lists (e.g. intention Sources) may come back reordered.
+        unmatched = list(got)
+        drift = []
+        for i, w in enumerate(want):
+            match = next((g for g in unmatched if not entry_drift(w, g)), None)
+            if match is None:
+                drift.append(f"{path}[{i}]: no live match for {json.dumps(w)}")
+            else:
+                unmatched.remove(match)
+        return drift
+    if want == got:
+        return []
+    if isinstance(want, str) and isinstance(got, str) and go_duration_s(want) is not None:
+        if go_duration_s(want) == go_duration_s(got):
+            return []
+    return [f"{where}: want {json.dumps(want)}, got {json.dumps(got)}"]
+
+
+def parse_config_entries(entries: dict[str, str]) -> dict[str, dict[str, dict]]:
+    # kind -> name -> parsed entry; dies on an entry that does not parse or lacks Kind/Name.
+    by_kind: dict[str, dict[str, dict]] = {}
+    for filename, content in sorted(entries.items()):
+        try:
+            entry = parse_hcl(content)
+        except ValueError as e:
+            die(f"{filename}: cannot parse config entry: {e}")
+        kind, name = entry.get("Kind") or entry.get("kind"), entry.get("Name") or entry.get("name")
+        if kind in UNNAMED_ENTRY_KINDS and name is None:
+            name = kind
+        if not isinstance(kind, str) or not isinstance(name, str) or not kind or not name:
+            die(f"{filename}: config entry has no Kind/Name")
+        if name in by_kind.get(kind, {}):
+            die(f"{filename}: duplicate config entry {kind}/{name}")
+        by_kind.setdefault(kind, {})[name] = entry
+    return by_kind
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from .common import die, http_get, http_send, require_file
+
+
+def wait_for_consul(url_base: str, timeout_s: int) -> None:
+    deadline = time.time() + timeout_s
+    last = ""
+    while time.time() < deadline:
+        code, body = http_get(f"{url_base}/v1/status/leader", timeout_s=2.0)
+        if code == 200 and body.strip().strip('"'):
+            return
+        last = f"{code}: {body[:200]}"
+        time.sleep(1)
+    die(f"Timed out waiting for Consul leader at {url_base} ({last})")
+
+
+def apply_prepared_queries(base: str, paths: list[Path]) -> None:
+    code, body = http_get(f"{base}/v1/query", timeout_s=5.0)
+    if code != 200:
+        die(f"Failed to list prepared queries (GET /v1/query -> {code})")
+    existing = {q.get("Name"): q.get("ID") for q in json.loads(body or "[]")}
+    for path in paths:
+        require_file(path)
+        query = json.loads(path.read_text(encoding="utf-8"))
+        # Upsert by name so re-running up-server does not create duplicates.
+        if query["Name"] in existing:
+            code, body = http_send("PUT", f"{base}/v1/query/{existing[query['Name']]}", json.dumps(query))
+        else:
+            code, body = http_send("POST", f"{base}/v1/query", json.dumps(query))
+        if code != 200:
+            die(f"Failed to apply prepared query {query['Name']} ({code}: {body[:200]})")
+
+
+def drain_targets(base: str, service_ids: set[str]) -> dict[str, str] | None:
+    # service ID -> service name for the given services and their sidecar proxies; None if the agent is down.
+    code, body = http_get(f"{base}/v1/agent/services", timeout_s=5.0)
+    if code != 200:
+        return None
+    return {
+        sid: svc.get("Service") or sid
+        for sid, svc in (json.loads(body or "{}") or {}).items()
+        if sid in service_ids or (svc.get("Proxy") or {}).get("DestinationServiceID") in service_ids
+    }
+
+
+def set_maintenance(base: str, service_ids: set[str], *, enable: bool, reason: str = "") -> dict[str, str]:
+    from urllib.parse import quote, urlencode
+
+    targets = drain_targets(base, service_ids)
+    if targets is None:
+        die(f"Consul agent not reachable at {base}")
+    query = urlencode({"enable": "true" if enable else "false", **({"reason": reason} if reason else {})})
+    for sid in sorted(targets):
+        code, body = http_send("PUT", f"{base}/v1/agent/service/maintenance/{quote(sid, safe='')}?{query}", "")
+        if code != 200:
+            die(f"Failed to {'enable' if enable else 'disable'} maintenance for {sid} ({code}: {body[:200]})")
+    return targets
+
+
+def agent_node_name(base: str) -> str | None:
+    code, body = http_get(f"{base}/v1/agent/self", timeout_s=5.0)
+    if code != 200:
+        return None
+    try:
+        return (json.loads(body).get("Config") or {}).get("NodeName") or None
+    except (ValueError, AttributeError):
+        return None
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import time
+from collections.abc import Iterator
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .bench import latency_summary
+from .common import die, parse_csv, write_text
+
+if TYPE_CHECKING:
+    import socket
+
+
+def dns_query_packet(qid: int, name: str) -> bytes:
+    import struct
+
+    qname = b"".join(bytes([len(label)]) + label.encode("ascii") for label in name.strip(".").split(".")) + b"\0"
+    return struct.pack("!HHHHHH", qid, 0x0100, 1, 0, 0, 0) + qname + struct.pack("!HH", 1, 1)
+
+
+def dns_lookup(sock: socket.socket, server: tuple[str, int], qid: int, name: str) -> tuple[int, int]:
+    # Returns (rcode, answer count) for an A query.
+    import struct
+
+    sock.sendto(dns_query_packet(qid, name), server)
+    while True:
+        data, _ = sock.recvfrom(4096)
+        rid, flags, _, ancount = struct.unpack("!HHHH", data[:8])
+        if rid == qid:
+            return flags & 0x000F, ancount
+
+
+def dns_probe(server: tuple[str, int], name: str, timeout_s: float) -> str:
+    # "" once the server answers a query (NXDOMAIN counts); a TCP connect is not enough, see wait_sidecar_ready.
+    import socket
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(timeout_s)
+    try:
+        rcode, _ = dns_lookup(sock, server, 1, name)
+    except OSError as e:
+        return f"DNS cache not answering on {server[0]}:{server[1]} ({e})"
+    finally:
+        sock.close()
+    return "" if rcode in (0, 3) else f"DNS cache returned rcode {rcode} for {name}"
+
+
+def dns_stub_answer(query: bytes) -> bytes:
+    import socket
+    import struct
+
+    end = query.index(b"\0", 12) + 5
+    header = struct.pack("!HHHHHH", struct.unpack("!H", query[:2])[0], 0x8180, 1, 1, 0, 0)
+    answer = struct.pack("!HHHIH", 0xC00C, 1, 1, 5, 4) + socket.inet_aton("127.0.0.1")
+    return header + query[12:end] + answer
+
+
+@contextmanager
+def dns_stub() -> Iterator[tuple[str, int]]:
+    # Answers every A query with 127.0.0.1; measures the client/harness ceiling without a pod. The server
+    # thread checks for shutdown between short receive timeouts, so leaving the block joins it and closes the socket.
+    import socket
+    import threading
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.1)
+    stop = threading.Event()
+
+    def serve() -> None:
+        while not stop.is_set():
+            try:
+                data, addr = sock.recvfrom(4096)
+                sock.sendto(dns_stub_answer(data), addr)
+            except OSError:
+                # Receive timeout (check stop again), or a client that went away.
+                continue
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        yield sock.getsockname()
+    finally:
+        stop.set()
+        thread.join()
+        sock.close()
+
+
+def dns_worker(server: tuple[str, int], names: list[str], worker: int, deadline: float) -> dict:
+    import socket
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(1.0)
+    samples: list[float] = []
+    errors = empty = 0
+    qid = worker << 8
+    while time.perf_counter() < deadline:
+        qid = (qid + 1) & 0xFFFF
+        t0 = time.perf_counter()
+        try:
+            rcode, ancount = dns_lookup(sock, server, qid, names[qid % len(names)])
+        except OSError:
+            errors += 1
+            continue
+        samples.append((time.perf_counter() - t0) * 1000)
+        if rcode != 0 or ancount == 0:
+            empty += 1
+    sock.close()
+    return {"samples": samples, "errors": errors, "empty": empty}
+
+
+def cmd_bench_dns(args) -> int:
+    from concurrent.futures import ThreadPoolExecutor
+
+    names = parse_csv(args.names)
+    if not names:
+        die("bench-dns: --names must list at least one name")
+    with ExitStack() as stack:
+        if args.stub:
+            server = stack.enter_context(dns_stub())
+        else:
+            host, _, port = args.server.rpartition(":")
+            server = (host or "127.0.0.1", int(port))
+        deadline = time.perf_counter() + args.duration
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda w: dns_worker(server, names, w, deadline), range(args.concurrency)))
+    samples = [ms for r in results for ms in r["samples"]]
+    result = {
+        "label": args.label or ("stub" if args.stub else args.server),
+        "server": f"{server[0]}:{server[1]}",
+        "names": names,
+        "concurrency": args.concurrency,
+        "qps": round(len(samples) / args.duration, 1),
+        "latency": latency_summary(samples),
+        "timeouts": sum(r["errors"] for r in results),
+        "empty_or_error_answers": sum(r["empty"] for r in results),
+    }
+    out = json.dumps(result, indent=2)
+    if args.out:
+        write_text(Path(args.out), out)
+    print(out)
+    return 0
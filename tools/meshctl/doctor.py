@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from meshbundle import files_digest
+
+from .bundle import bundle_index, check_bundle_schema, expanded_root, load_bundle
+from .common import die, read_env, require_cmd, warn
+from .config_entries import parse_config_entries
+from .placement import check_envoy_profiles, plan_placement, read_numa_topology
+from .plan import load_plan, required_server_entries
+from .podman import podman, podman_exists
+from .prefetch import bundle_images
+
+
+def cmd_doctor(args) -> int:
+    bundle_path = Path(args.bundle)
+    bundle = load_bundle(bundle_path)
+    role = bundle.get("role")
+
+    print(f"Bundle: {bundle_path.as_posix()}")
+    print(f"  host={bundle.get('host')} role={role} dc={bundle.get('dc')} host_ip={bundle.get('host_ip')}")
+    check_bundle_schema(bundle, bundle_path)
+    print(f"Bundle schema: OK (version {bundle['version']})")
+
+    require_cmd("podman")
+
+    # Podman sanity (don’t fail hard if it errors; some environments restrict it)
+    try:
+        podman(["version"], capture=True, check=True)
+        print("Podman: OK (version command succeeded)")
+    except Exception as e:
+        warn(f"Podman version check failed: {e}")
+
+    out_root = expanded_root(bundle)
+    print(f"Expanded dir: {out_root.as_posix()}")
+    if not out_root.is_dir():
+        die(f"Missing expanded dir. Run: python tools/meshctl.py expand --bundle {bundle_path.as_posix()}")
+
+    env_path = out_root / "runtime.env"
+    if not env_path.is_file():
+        die(f"Missing expanded runtime env: {env_path.as_posix()}")
+    print("Expanded env: OK")
+    plan = load_plan(bundle, out_root)
+    print(f"Execution plan: OK ({len(plan['steps'])} steps)")
+    runtime_env = read_env(env_path)
+    if runtime_env.get("MESH_IMAGES_PINNED") == "1":
+        missing = [ref for ref in bundle_images(bundle, runtime_env).values() if not podman_exists("image", ref)]
+        if missing:
+            die(f"Pinned images missing from the local store: {', '.join(missing)} (re-run prefetch)")
+        print("Images: OK (pinned, local)")
+    else:
+        warn("Images are not pinned; `up` may pull from the registry (run prefetch after expand)")
+
+    index = bundle_index(bundle)
+    if args.deep and index.get("files_sha256") != files_digest(bundle.get("files") or {}):
+        die("Bundle index is stale (files digest mismatch); re-render the bundle")
+    print(f"Bundle index: OK (version {index['version']}{', digest verified' if args.deep else ''})")
+
+    # The same host checks `up-*` runs before replaying the plan.
+    host_checks = plan["host_checks"]
+    profiles = host_checks["envoy_profiles"]
+    if profiles:
+        check_envoy_profiles(profiles, os.cpu_count())
+        print(f"Envoy profiles: OK ({len(profiles)} proxies, {os.cpu_count()} host cores)")
+
+    placement = host_checks["placement"]
+    if placement:
+        topology = read_numa_topology()
+        cpusets = plan_placement(placement, [(key, cores) for key, cores in host_checks["owners"]], topology)
+        print(f"Placement: OK ({len(topology)} NUMA nodes, app_cpus={placement.get('app_cpus') or '-'})")
+        for owner, cpuset_args in cpusets.items():
+            print(f"  {owner}: cpus={cpuset_args[1]} mems={cpuset_args[3]}")
+
+    if role == "server":
+        config_dir = out_root / "config-entries"
+        if not config_dir.is_dir():
+            die(f"Missing config entries dir: {config_dir.as_posix()}")
+        for p in required_server_entries(config_dir):
+            if not p.is_file():
+                die(f"Missing required config entry: {p.as_posix()}")
+        expanded_entries: dict[str, str] = {}
+        for name in index.get("config_entries") or []:
+            if not (config_dir / name).is_file():
+                die(f"Missing expanded config entry: {(config_dir / name).as_posix()} (re-run expand --force)")
+            expanded_entries[name] = (config_dir / name).read_text(encoding="utf-8")
+        by_kind = parse_config_entries(expanded_entries)
+        print(f"Config entries: OK ({len(expanded_entries)} entries, {len(by_kind)} kinds)")
+        peers = bundle.get("peering") or []
+        if peers:
+            print("Federation: peering (" + ", ".join(f"{p['peer']} {p['role']}" for p in peers) + "; run `meshctl peering status`)")
+        server_hcl = out_root / "consul-config" / index["consul_config"]
+        if not server_hcl.is_file():
+            die(f"Missing server agent config: {server_hcl.as_posix()} (re-run expand --force)")
+        print(f"Server agent config: OK ({index['consul_config']})")
+        for name in index.get("prepared_queries") or []:
+            if not (out_root / "prepared-queries" / name).is_file():
+                die(f"Missing prepared query: {(out_root / 'prepared-queries' / name).as_posix()} (re-run expand --force)")
+
+    if role == "app":
+        rendered_dir = out_root / "rendered"
+        if not rendered_dir.is_dir():
+            die(f"Missing rendered templates dir: {rendered_dir.as_posix()}")
+        services = index.get("services") or []
+        if not services:
+            die("No services in bundle index")
+        for svc in services:
+            if not (rendered_dir / svc["template"]).is_file():
+                die(f"Missing rendered template: {(rendered_dir / svc['template']).as_posix()} (re-run expand --force)")
+        print(f"Rendered templates: OK ({len(services)} services, {len(index.get('sidecars') or [])} sidecars)")
+        agent_hcl = out_root / "consul-config" / index["consul_config"]
+        if not agent_hcl.is_file():
+            die(f"Missing agent config: {agent_hcl.as_posix()} (re-run expand --force)")
+        print(f"Agent config: OK ({index['consul_config']})")
+        dns = index.get("dns")
+        if dns:
+            if not (out_root / "dns" / dns["corefile"]).is_file():
+                die(f"Missing DNS cache config: {(out_root / 'dns' / dns['corefile']).as_posix()} (re-run expand --force)")
+            print(f"DNS cache: OK (port {dns['port']})")
+
+    print("Doctor: OK")
+    return 0
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from .bundle import check_bundle_schema, expanded_root, load_bundle, read_entry_store
+from .common import write_env, write_text
+from .plan import write_plan
+
+
+def expand_bundle(
+    bundle: dict, *, bundle_path: Path, force: bool = False, entry_store: Path | None = None
+) -> tuple[dict, Path, dict]:
+    import shutil
+
+    role = bundle["role"]
+
+    out_root = expanded_root(bundle)
+    if out_root.exists() and (out_root / "plan.json").is_file() and not force:
+        # Don't mutate existing expansion unless forced.
+        env = bundle.get("env", {}) or {}
+        return bundle, out_root, {k: str(v) for k, v in env.items()}
+
+    check_bundle_schema(bundle, bundle_path)
+    files = bundle.get("files", {}) or {}
+    env = bundle.get("env", {}) or {}
+
+    # Everything is written to a staging directory that replaces out_root once the plan is written, so an
+    # expansion is either complete or absent. Paths recorded in runtime.env and the plan name out_root.
+    staging = out_root.with_name(f".{role}.staging")
+    previous = out_root.with_name(f".{role}.previous")
+    shutil.rmtree(staging, ignore_errors=True)
+    shutil.rmtree(previous, ignore_errors=True)
+
+    if role == "server":
+        config_entries = dict(files.get("config_entries") or {})
+        refs = files.get("config_entry_refs") or {}
+        if refs:
+            config_entries.update(read_entry_store(refs, entry_store or bundle_path.parent / "entries"))
+        for name, content in config_entries.items():
+            write_text(staging / "config-entries" / name, content)
+        env["CONSUL_CONFIG_ENTRIES_DIR"] = str((out_root / "config-entries").as_posix())
+
+    for name, content in (files.get("consul_config") or {}).items():
+        write_text(staging / "consul-config" / name, content)
+    for name, content in (files.get("prepared_queries") or {}).items():
+        write_text(staging / "prepared-queries" / name, content)
+    for name, content in (files.get("dns_cache") or {}).items():
+        write_text(staging / "dns" / name, content)
+
+    if role == "app":
+        templates = files.get("service_templates") or {}
+        templates_dir = staging / "services"
+        for name, content in templates.items():
+            write_text(templates_dir / name, content)
+        env["CONSUL_SERVICE_TEMPLATES_DIR"] = str((out_root / "services").as_posix())
+
+        # Pre-render templates with the host IP to avoid runtime mutation.
+        host_ip = str(env.get("HOST_IP") or bundle.get("host_ip") or "")
+        if host_ip:
+            rendered_dir = staging / "rendered"
+            rendered_dir.mkdir(parents=True, exist_ok=True)
+            for p in sorted(templates_dir.glob("*.json")):
+                content = p.read_text(encoding="utf-8").replace("__HOST_IP__", host_ip)
+                (rendered_dir / p.name).write_text(content, encoding="utf-8")
+
+    write_env(staging / "runtime.env", {k: str(v) for k, v in env.items()})
+
+    # The plan checks the expanded files at their final paths, so it is written after the swap; if that
+    # fails, the previous expansion (or none) is put back.
+    if out_root.exists():
+        out_root.rename(previous)
+    staging.rename(out_root)
+    try:
+        write_plan(bundle, out_root)
+    except BaseException:
+        shutil.rmtree(out_root, ignore_errors=True)
+        if previous.exists():
+            previous.rename(out_root)
+        raise
+    shutil.rmtree(previous, ignore_errors=True)
+
+    return bundle, out_root, {k: str(v) for k, v in env.items()}
+
+
+def cmd_expand(args) -> int:
+    bundle_path = Path(args.bundle)
+    bundle = load_bundle(bundle_path)
+    entry_store = Path(args.entry_store) if args.entry_store else None
+    bundle, out_root, _ = expand_bundle(bundle, bundle_path=bundle_path, force=args.force, entry_store=entry_store)
+    print(f"Expanded: {bundle.get('host')} ({bundle.get('role')}) -> {out_root.as_posix()}")
+    return 0
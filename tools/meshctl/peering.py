@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from .bundle import load_bundle
+from .common import die, http_get, http_send, require_file
+
+
+def peering_states(base: str) -> dict[str, dict]:
+    code, body = http_get(f"{base}/v1/peerings", timeout_s=5.0)
+    if code != 200:
+        die(f"GET {base}/v1/peerings -> {code}")
+    return {p.get("Name"): p for p in json.loads(body or "[]") or []}
+
+
+def cmd_peering(args) -> int:
+    bundle = load_bundle(Path(args.bundle))
+    if bundle.get("role") != "server":
+        die("peering expects a server bundle")
+    peers = bundle.get("peering") or []
+    if not peers:
+        die("Bundle is not rendered for cluster peering (set mesh_federation: peering and re-render)")
+    dc = bundle["dc"]
+    base = f"http://{(bundle.get('env') or {}).get('MGMT_BIND_ADDR', '127.0.0.1')}:8500"
+    token_dir = Path(args.token_dir)
+    states = peering_states(base)
+
+    if args.action == "status":
+        print(f"{'peer':<16} {'role':<9} {'state':<12} {'imported':>8} {'exported':>8}")
+        inactive = 0
+        for p in peers:
+            live = states.get(p["peer"]) or {}
+            stream = live.get("StreamStatus") or {}
+            state = live.get("State") or "MISSING"
+            inactive += state != "ACTIVE"
+            print(
+                f"{p['peer']:<16} {p['role']:<9} {state:<12} "
+                f"{len(stream.get('ImportedServices') or []):>8} {len(stream.get('ExportedServices') or []):>8}"
+            )
+        return 1 if inactive else 0
+
+    # Tokens are exchanged as files: <acceptor>-<dialer>.token, generated on the acceptor and copied to the dialer.
+    role = "acceptor" if args.action == "token" else "dialer"
+    for p in peers:
+        peer = p["peer"]
+        if p["role"] != role:
+            continue
+        if (states.get(peer) or {}).get("State") == "ACTIVE" and not args.force:
+            print(f"{peer}: already ACTIVE (use --force to re-{'generate' if role == 'acceptor' else 'establish'})")
+            continue
+        if args.action == "token":
+            code, body = http_send("POST", f"{base}/v1/peering/token", json.dumps({"PeerName": peer}))
+            if code != 200:
+                die(f"Failed to generate a peering token for {peer} ({code}: {body[:200]})")
+            path = token_dir / f"{dc}-{peer}.token"
+            token_dir.mkdir(parents=True, exist_ok=True)
+            # The token carries the acceptor's server addresses and a secret; keep it private.
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.loads(body)["PeeringToken"] + "\n")
+            print(f"{peer}: wrote {path.as_posix()} (copy it to the {peer} server's {token_dir.as_posix()}/ and run `peering establish` there)")
+        else:
+            path = token_dir / f"{peer}-{dc}.token"
+            require_file(path)
+            payload = {"PeerName": peer, "PeeringToken": path.read_text(encoding="utf-8").strip()}
+            code, body = http_send("POST", f"{base}/v1/peering/establish", json.dumps(payload))
+            if code != 200:
+                die(f"Failed to establish peering with {peer} ({code}: {body[:200]})")
+            print(f"{peer}: establishing (check with `peering status`)")
+    return 0
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from .bundle import bundle_index
+from .common import die, parse_csv, warn
+
+FIXED_HEAP_MONITOR = "envoy.resource_monitors.fixed_heap"
+SYS_NODE_DIR = Path("/sys/devices/system/node")
+
+
+def envoy_bootstrap_overlay(profile: dict) -> dict:
+    overlay: dict = {}
+    if profile.get("stats_flush_interval"):
+        overlay["stats_flush_interval"] = profile["stats_flush_interval"]
+
+    max_heap = profile.get("max_heap_bytes")
+    if max_heap:
+        heap_trigger = {"name": FIXED_HEAP_MONITOR}
+        actions = [
+            {"name": "envoy.overload_actions.shrink_heap", "triggers": [{**heap_trigger, "threshold": {"value": 0.95}}]},
+            {"name": "envoy.overload_actions.stop_accepting_requests", "triggers": [{**heap_trigger, "threshold": {"value": 0.98}}]},
+        ]
+        overload: dict = {
+            "refresh_interval": "0.25s",
+            "resource_monitors": [
+                {
+                    "name": FIXED_HEAP_MONITOR,
+                    "typed_config": {
+                        "@type": "type.googleapis.com/envoy.extensions.resource_monitors.fixed_heap.v3.FixedHeapConfig",
+                        "max_heap_size_bytes": int(max_heap),
+                    },
+                }
+            ],
+            "actions": actions,
+        }
+        buffer_limit = profile.get("buffer_limit_bytes")
+        if buffer_limit:
+            # Streams buffering more than ~buffer_limit_bytes are tracked and reset first under heap pressure.
+            overload["buffer_factory_config"] = {"minimum_account_to_track_power_of_two": max(10, int(buffer_limit).bit_length() - 1)}
+            actions.append(
+                {
+                    "name": "envoy.overload_actions.reset_high_memory_stream",
+                    "triggers": [{**heap_trigger, "scaled": {"scaling_threshold": 0.85, "saturation_threshold": 0.95}}],
+                }
+            )
+        overlay["overload_manager"] = overload
+    return overlay
+
+
+def envoy_profile_args(profile: dict | None) -> list[str]:
+    if not profile:
+        return []
+    args: list[str] = []
+    if profile.get("cpus"):
+        args += ["--cpus", str(profile["cpus"])]
+    if profile.get("memory"):
+        args += ["--memory", str(profile["memory"])]
+    if profile.get("concurrency"):
+        args += ["-e", f"ENVOY_CONCURRENCY={int(profile['concurrency'])}"]
+    overlay = envoy_bootstrap_overlay(profile)
+    if overlay:
+        args += ["-e", f"ENVOY_CONFIG_YAML={json.dumps(overlay, separators=(',', ':'))}"]
+    return args
+
+
+def check_envoy_profiles(profiles: dict, cores: int | None) -> None:
+    if not profiles or not cores:
+        return
+    total_concurrency = 0
+    for owner, profile in sorted(profiles.items()):
+        concurrency = int(profile.get("concurrency") or 0)
+        if concurrency > cores:
+            die(f"Envoy profile for {owner}: concurrency={concurrency} exceeds host cores ({cores})")
+        if float(profile.get("cpus") or 0) > cores:
+            die(f"Envoy profile for {owner}: cpus={profile['cpus']} exceeds host cores ({cores})")
+        total_concurrency += concurrency
+    if total_concurrency > cores:
+        warn(f"Envoy worker threads across sidecars ({total_concurrency}) exceed host cores ({cores})")
+
+
+def parse_cpulist(value: str) -> list[int]:
+    cpus: list[int] = []
+    for part in parse_csv(value):
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpulist(cpus: list[int]) -> str:
+    parts = []
+    ordered = sorted(set(cpus))
+    i = 0
+    while i < len(ordered):
+        j = i
+        while j + 1 < len(ordered) and ordered[j + 1] == ordered[j] + 1:
+            j += 1
+        parts.append(str(ordered[i]) if i == j else f"{ordered[i]}-{ordered[j]}")
+        i = j + 1
+    return ",".join(parts)
+
+
+def read_numa_topology(sys_node_dir: Path = SYS_NODE_DIR) -> dict[int, list[int]]:
+    nodes: dict[int, list[int]] = {}
+    if sys_node_dir.is_dir():
+        for p in sorted(sys_node_dir.glob("node[0-9]*")):
+            cpulist = p / "cpulist"
+            if cpulist.is_file():
+                nodes[int(p.name[4:])] = parse_cpulist(cpulist.read_text(encoding="utf-8").strip())
+    if not nodes:
+        # Non-NUMA kernels (and most containers) don't expose node directories.
+        nodes[0] = list(range(os.cpu_count() or 1))
+    return nodes
+
+
+def plan_placement(placement: dict | None, owners: list[tuple[str, int]], topology: dict[int, list[int]]) -> dict[str, list[str]]:
+    # owners: (container key, cores wanted), in priority order. Returns podman args per key.
+    if not placement:
+        return {}
+    app_cpus = set(parse_cpulist(placement.get("app_cpus", "")))
+    numa_node = placement.get("numa_node", "auto")
+    if numa_node == "auto":
+        numa_node = max(sorted(topology), key=lambda n: len(set(topology[n]) - app_cpus))
+    if int(numa_node) not in topology:
+        die(f"placement.numa_node={numa_node} not present on this host (nodes: {sorted(topology)})")
+    numa_node = int(numa_node)
+
+    # Hand out cores from the top of the node so the apps keep the low-numbered ones.
+    pool = sorted(set(topology[numa_node]) - app_cpus, reverse=True)
+    if not pool:
+        die(f"placement leaves no CPUs for mesh containers on NUMA node {numa_node} (app_cpus={placement.get('app_cpus')})")
+
+    wanted = sum(cores for _, cores in owners)
+    plan: dict[str, list[str]] = {}
+    if wanted > len(pool):
+        warn(f"placement wants {wanted} dedicated cores but only {len(pool)} are free on node {numa_node}; mesh containers will share them")
+        shared = format_cpulist(pool)
+        for key, _ in owners:
+            plan[key] = ["--cpuset-cpus", shared, "--cpuset-mems", str(numa_node)]
+        return plan
+
+    for key, cores in owners:
+        taken, pool = pool[:cores], pool[cores:]
+        plan[key] = ["--cpuset-cpus", format_cpulist(taken), "--cpuset-mems", str(numa_node)]
+    return plan
+
+
+def sidecar_cores(placement: dict, profile: dict | None) -> int:
+    return int((profile or {}).get("concurrency") or placement.get("sidecar_cores", 1))
+
+
+def placement_owners(bundle: dict) -> list[tuple[str, int]]:
+    # (container, cores wanted) in priority order: the Consul agent/server first, then the Envoys.
+    placement = bundle.get("placement") or {}
+    profiles = bundle.get("envoy_profiles") or {}
+    index = bundle_index(bundle)
+    if bundle.get("role") == "server":
+        owners = [(index["containers"]["consul"], int(placement.get("agent_cores", 1)))]
+        owners += [(gw["container"], sidecar_cores(placement, profiles.get("mesh-gateway"))) for gw in index["gateways"]]
+    else:
+        owners = [(index["containers"]["agent"], int(placement.get("agent_cores", 1)))]
+        owners += [(sc["container"], sidecar_cores(placement, profiles.get(sc["name"]))) for sc in index.get("sidecars") or []]
+    return owners
@@ -0,0 +1,753 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from meshbundle import PLAN_VERSION
+
+from .bundle import bundle_index
+from .common import die, http_get, parse_csv, read_env, require_file, write_text
+from .consul import apply_prepared_queries, set_maintenance, wait_for_consul
+from .dns import dns_probe
+from .placement import check_envoy_profiles, envoy_profile_args, placement_owners, plan_placement, read_numa_topology
+from .podman import ensure_pod, ensure_volume, network_mode, pod_create_args, podman, podman_tail_logs, pull_policy
+
+# Profile knobs are passed as env so the shell wrapper keeps the --config-yaml JSON as one argument.
+ENVOY_CMD = (
+    "test -s /bootstrap/bootstrap.json; exec envoy -c /bootstrap/bootstrap.json "
+    "${ENVOY_CONCURRENCY:+--concurrency \"$ENVOY_CONCURRENCY\"} "
+    "${ENVOY_CONFIG_YAML:+--config-yaml \"$ENVOY_CONFIG_YAML\"} "
+    "${ENVOY_DRAIN_TIME_S:+--drain-time-s \"$ENVOY_DRAIN_TIME_S\" --drain-strategy immediate} "
+    "${ENVOY_EXTRA_ARGS:-}"
+)
+# Plan steps only a full `up-*` runs: restarting one component must not lift maintenance an operator set.
+FULL_RUN_OPS = ("maintenance_off",)
+# Graceful drain period of every Envoy (`down-*` drains listeners before removing the pod).
+DEFAULT_DRAIN_TIME_S = 15
+
+
+def podman_step(args: list[str], component: str | None = None, *, check: bool = True, cpuset: str | None = None) -> dict:
+    # cpuset: placement key whose --cpuset-* args resolve_plan() adds on the host that runs the plan.
+    step = {"op": "podman", "args": args, "check": check, "component": component}
+    if cpuset:
+        step["cpuset"] = cpuset
+    return step
+
+
+def resolve_plan(plan: dict) -> list[dict]:
+    # Core and NUMA checks use the host that starts the stack, not the one that expanded the plan.
+    host_checks = plan["host_checks"]
+    check_envoy_profiles(host_checks["envoy_profiles"], os.cpu_count())
+    cpusets = plan_placement(host_checks["placement"], [(key, cores) for key, cores in host_checks["owners"]], read_numa_topology())
+    steps = []
+    for step in plan["steps"]:
+        if step.get("cpuset"):
+            step = {**step, "args": [step["args"][0], *cpusets.get(step["cpuset"], []), *step["args"][1:]]}
+        steps.append(step)
+    return steps
+
+
+def run_plan(steps: list[dict], only: set[str] | None = None) -> None:
+    # only: container names to (re)start; None runs everything. Steps without a component
+    # (pod, volumes, shared waits) always run, except FULL_RUN_OPS.
+    for step in steps:
+        component = step.get("component")
+        if only is not None and component is not None and component not in only:
+            continue
+        if only is not None and step["op"] in FULL_RUN_OPS:
+            continue
+        op = step["op"]
+        if op == "pod":
+            ensure_pod(step["name"], step["args"])
+        elif op == "volume":
+            ensure_volume(step["name"])
+        elif op == "podman":
+            podman(step["args"], check=step.get("check", True))
+        elif op == "mkdir":
+            Path(step["path"]).mkdir(parents=True, exist_ok=True)
+        elif op == "wait_leader":
+            wait_for_consul(step["url"], timeout_s=step["timeout_s"])
+        elif op == "wait_http":
+            wait_http_ok(step["url"], timeout_s=step["timeout_s"])
+        elif op == "wait_dns":
+            wait_dns_answer(step["host"], step["port"], step["name"], timeout_s=step["timeout_s"])
+        elif op == "wait_sidecar":
+            try:
+                wait_sidecar_ready(step["mode"], step["sidecar_port"], step["admin_port"], timeout_s=step["timeout_s"])
+            except SystemExit:
+                logs = podman_tail_logs(component, lines=250)
+                print(f"Envoy logs ({component}):\n{logs}", file=sys.stderr)
+                raise
+        elif op == "prepared_queries":
+            apply_prepared_queries(step["url"], [Path(p) for p in step["paths"]])
+        elif op == "maintenance_off":
+            set_maintenance(step["url"], set(step["service_ids"]), enable=False)
+        else:
+            die(f"Unknown plan step: {op}")
+
+
+def render_templates(templates_dir: Path, *, host_ip: str, out_dir: Path) -> list[Path]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rendered = []
+    for p in sorted(templates_dir.glob("*.json")):
+        content = p.read_text(encoding="utf-8")
+        content = content.replace("__HOST_IP__", host_ip)
+        out = out_dir / p.name
+        out.write_text(content, encoding="utf-8")
+        rendered.append(out)
+    return rendered
+
+
+def required_server_entries(config_dir: Path) -> list[Path]:
+    return [
+        config_dir / "proxy-defaults.hcl",
+    ]
+
+
+def wait_http_ok(url: str, timeout_s: int) -> None:
+    deadline = time.time() + timeout_s
+    last = ""
+    while time.time() < deadline:
+        code, body = http_get(url, timeout_s=2.0)
+        if code == 200:
+            return
+        last = f"{code}: {body[:200]}"
+        time.sleep(1)
+    die(f"Timed out waiting for HTTP 200: {url} ({last})")
+
+
+def wait_tcp_connect(host: str, port: int, timeout_s: int) -> None:
+    import socket
+
+    deadline = time.time() + timeout_s
+    last = ""
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=2.0):
+                return
+        except OSError as e:
+            last = str(e)
+            time.sleep(1)
+    die(f"Timed out waiting for TCP connect: {host}:{port} ({last})")
+
+
+def wait_dns_answer(host: str, port: int, name: str, timeout_s: int) -> None:
+    deadline = time.time() + timeout_s
+    last = ""
+    while time.time() < deadline:
+        last = dns_probe((host, port), name, 1.0)
+        if not last:
+            return
+        time.sleep(1)
+    die(f"Timed out waiting for a DNS answer from {host}:{port} ({last})")
+
+
+def wait_sidecar_ready(mode: str, sidecar_port: int, admin_port: int, timeout_s: int) -> None:
+    if mode != "host":
+        # Published ports are accepted by the port forwarder even when nothing listens inside the pod,
+        # so a TCP connect alone proves nothing; ask Envoy itself first.
+        wait_http_ok(f"http://127.0.0.1:{admin_port}/ready", timeout_s=timeout_s)
+    wait_tcp_connect("127.0.0.1", sidecar_port, timeout_s=timeout_s)
+
+
+def server_plan(bundle: dict, env: dict, out_root: Path) -> list[dict]:
+    steps: list[dict] = []
+    dc = env.get("CONSUL_DATACENTER") or bundle.get("dc")
+    host_ip = env.get("HOST_IP") or bundle.get("host_ip")
+    if not dc or not host_ip:
+        die("Missing CONSUL_DATACENTER/HOST_IP in bundle")
+
+    consul_image = env.get("CONSUL_IMAGE") or (bundle.get("images") or {}).get("consul") or "docker.io/hashicorp/consul:1.17"
+    envoy_image = env.get("ENVOY_IMAGE") or (bundle.get("images") or {}).get("envoy") or "docker.io/envoyproxy/envoy:v1.29-latest"
+
+    mgmt_bind = env.get("MGMT_BIND_ADDR", "127.0.0.1")
+    mode = network_mode(env)
+    config_entries_dir = Path(env.get("CONSUL_CONFIG_ENTRIES_DIR", ""))
+    if not config_entries_dir.is_dir():
+        die(f"Missing CONSUL_CONFIG_ENTRIES_DIR: {config_entries_dir}")
+
+    index = bundle_index(bundle)
+    pod_name = index["pod"]
+    consul_container = index["containers"]["consul"]
+    gateways = index["gateways"]
+    server_hcl = out_root / "consul-config" / index["consul_config"]
+    require_file(server_hcl)
+
+    consul_data_vol = f"consul-server-data-{dc}"
+    steps.append({"op": "volume", "name": consul_data_vol})
+    for gw in gateways:
+        steps.append({"op": "volume", "name": gw["bootstrap_volume"]})
+
+    port_args = [
+        "-p",
+        f"{mgmt_bind}:8500:8500/tcp",
+        "-p",
+        f"{mgmt_bind}:8502:8502/tcp",
+        "-p",
+        "8300:8300/tcp",
+        "-p",
+        "8301:8301/tcp",
+        "-p",
+        "8301:8301/udp",
+        "-p",
+        "8302:8302/tcp",
+        "-p",
+        "8302:8302/udp",
+    ]
+    for port in sorted({gw["port"] for gw in gateways}):
+        port_args += ["-p", f"{port}:{port}/tcp"]
+    for gw in gateways:
+        port_args += ["-p", f"{mgmt_bind}:{gw['admin_port']}:{gw['admin_port']}/tcp"]
+    steps.append({"op": "pod", "name": pod_name, "args": pod_create_args(pod_name, port_args, mode)})
+    # Without port publishing the management bind must be applied by the processes themselves.
+    client_addr = "0.0.0.0" if mode != "host" else " ".join(sorted({"127.0.0.1", mgmt_bind}))
+    admin_bind = "0.0.0.0" if mode != "host" else mgmt_bind
+
+    bootstrap_expect = env.get("CONSUL_BOOTSTRAP_EXPECT", "1")
+    node = env.get("CONSUL_NODE_NAME", f"consul-server-{dc}-{host_ip.replace('.', '-')}" )
+    advertise = env.get("CONSUL_ADVERTISE_ADDR", host_ip)
+    advertise_wan = env.get("CONSUL_ADVERTISE_WAN_ADDR", host_ip)
+
+    args = [
+        "agent",
+        f"-config-file=/consul/config/{index['consul_config']}",
+        "-data-dir=/consul/data",
+        "-server",
+        f"-bootstrap-expect={bootstrap_expect}",
+        f"-node={node}",
+        f"-datacenter={dc}",
+        f"-client={client_addr}",
+        f"-bind={env.get('CONSUL_BIND_ADDR','0.0.0.0')}",
+        f"-advertise={advertise}",
+        f"-advertise-wan={advertise_wan}",
+    ]
+    if env.get("CONSUL_ENABLE_UI", "1") == "1":
+        args.append("-ui")
+    if env.get("CONSUL_ENCRYPT"):
+        args.append(f"-encrypt={env['CONSUL_ENCRYPT']}")
+
+    for addr in parse_csv(env.get("CONSUL_RETRY_JOIN", "")):
+        args.append(f"-retry-join={addr}")
+    # Peered DCs are joined with `meshctl peering`, never over WAN gossip.
+    if env.get("CONSUL_FEDERATION", "wan") != "peering":
+        for addr in parse_csv(env.get("CONSUL_RETRY_JOIN_WAN", "")):
+            args.append(f"-retry-join-wan={addr}")
+
+    profiles = bundle.get("envoy_profiles") or {}
+    steps += consul_server_steps(
+        consul_container,
+        env=env,
+        pod_name=pod_name,
+        run_args=[
+            "-v",
+            f"{server_hcl.as_posix()}:/consul/config/{index['consul_config']}:ro",
+            "-v",
+            f"{consul_data_vol}:/consul/data",
+        ],
+        consul_image=consul_image,
+        args=args,
+        mgmt_bind=mgmt_bind,
+        dc=dc,
+        config_entries_dir=config_entries_dir,
+        prepared_queries=[out_root / "prepared-queries" / name for name in index.get("prepared_queries") or []],
+    )
+
+    envoy_extra = env.get("ENVOY_EXTRA_ARGS", "")
+    for i, gw in enumerate(gateways):
+        steps += mesh_gateway_steps(
+            gw,
+            env=env,
+            host_ip=host_ip,
+            dc=dc,
+            pod_name=pod_name,
+            admin_bind=admin_bind,
+            consul_image=consul_image,
+            envoy_image=envoy_image,
+            # Explicit address overrides only describe the first instance.
+            overrides=(i == 0),
+            run_args=envoy_profile_args(profiles.get("mesh-gateway")),
+            envoy_extra=envoy_extra,
+        )
+    # Maintenance set by a drained `down-server` survives in the data volume; lift it once the gateways are back.
+    steps.append({"op": "maintenance_off", "url": f"http://{mgmt_bind}:8500", "service_ids": [gw["proxy_id"] for gw in gateways]})
+    return steps
+
+
+def consul_server_steps(
+    consul_container: str,
+    *,
+    env: dict,
+    pod_name: str,
+    run_args: list[str],
+    consul_image: str,
+    args: list[str],
+    mgmt_bind: str,
+    dc: str,
+    config_entries_dir: Path,
+    prepared_queries: list[Path],
+) -> list[dict]:
+    c = consul_container
+    steps = [podman_step(["rm", "-f", c], c, check=False)]
+    steps.append(
+        podman_step(
+            [
+                "run",
+                *pull_policy(env),
+                "-d",
+                "--name",
+                consul_container,
+                "--pod",
+                pod_name,
+                "--restart",
+                "unless-stopped",
+                *run_args,
+                consul_image,
+                *args,
+            ],
+            c,
+            cpuset=c,
+        )
+    )
+    steps.append({"op": "wait_leader", "url": f"http://{mgmt_bind}:8500", "timeout_s": 180, "component": c})
+
+    # Apply config entries (idempotent)
+    steps.append(
+        podman_step(
+            [
+                "run",
+                *pull_policy(env),
+                "--rm",
+                "--pod",
+                pod_name,
+                "-e",
+                "CONSUL_HTTP_ADDR=http://127.0.0.1:8500",
+                "-v",
+                f"{config_entries_dir.as_posix()}:/config-entries:ro",
+                consul_image,
+                "sh",
+                "-ec",
+                (
+                    f"consul config write -datacenter='{dc}' /config-entries/proxy-defaults.hcl\n"
+                    f"for f in /config-entries/service-defaults-*.hcl; do consul config write -datacenter='{dc}' \"$f\"; done\n"
+                    f"for f in /config-entries/intentions-*.hcl; do consul config write -datacenter='{dc}' \"$f\"; done\n"
+                    # Cluster peering only: mesh-wide peering settings and what this DC exports to its peers.
+                    f"for f in /config-entries/mesh.hcl /config-entries/exported-services-{dc}.hcl; do\n"
+                    f"  if [ -f \"$f\" ]; then consul config write -datacenter='{dc}' \"$f\"; fi\n"
+                    "done\n"
+                    # Global resolvers (WAN federation) or this DC's own (peering); a single DC has none.
+                    f"for f in /config-entries/*-resolver.hcl /config-entries/*-resolver-{dc}.hcl; do\n"
+                    f"  if [ -f \"$f\" ]; then consul config write -datacenter='{dc}' \"$f\"; fi\n"
+                    "done\n"
+                ),
+            ],
+            c,
+        )
+    )
+
+    if prepared_queries:
+        steps.append(
+            {"op": "prepared_queries", "url": f"http://{mgmt_bind}:8500", "paths": [p.as_posix() for p in prepared_queries], "component": c}
+        )
+    return steps
+
+
+def mesh_gateway_steps(
+    gw: dict,
+    *,
+    env: dict,
+    host_ip: str,
+    dc: str,
+    pod_name: str,
+    admin_bind: str,
+    consul_image: str,
+    envoy_image: str,
+    overrides: bool,
+    run_args: list[str],
+    envoy_extra: str,
+) -> list[dict]:
+    # Generate mesh gateway bootstrap; every instance registers under its own proxy ID so Consul
+    # spreads cross-DC traffic across them.
+    default_address = f"{host_ip}:{gw['port']}"
+    mesh_gateway_address = env.get("MESH_GATEWAY_ADDRESS", default_address) if overrides else default_address
+    mesh_gateway_wan_address = env.get("MESH_GATEWAY_WAN_ADDRESS", mesh_gateway_address) if overrides else mesh_gateway_address
+    default_bind = f"0.0.0.0:{gw['port']}"
+    mesh_gateway_bind_address = env.get("MESH_GATEWAY_BIND_ADDRESS", default_bind) if overrides else default_bind
+    expose_servers = env.get("EXPOSE_SERVERS", "0")
+
+    c = gw["container"]
+    steps = [podman_step(["rm", "-f", c], c, check=False)]
+    steps.append(
+        podman_step(
+            [
+                "run",
+                *pull_policy(env),
+                "--rm",
+                "--pod",
+                pod_name,
+                "-e",
+                "CONSUL_HTTP_ADDR=http://127.0.0.1:8500",
+                "-e",
+                "CONSUL_GRPC_ADDR=http://127.0.0.1:8502",
+                "-e",
+                f"CONSUL_DATACENTER={dc}",
+                "-e",
+                f"ENVOY_ADMIN_BIND={admin_bind}:{gw['admin_port']}",
+                "-e",
+                f"MESH_GATEWAY_PROXY_ID={gw['proxy_id']}",
+                "-e",
+                f"MESH_GATEWAY_ADDRESS={mesh_gateway_address}",
+                "-e",
+                f"MESH_GATEWAY_WAN_ADDRESS={mesh_gateway_wan_address}",
+                "-e",
+                f"MESH_GATEWAY_BIND_ADDRESS={mesh_gateway_bind_address}",
+                "-e",
+                f"EXPOSE_SERVERS={expose_servers}",
+                "-v",
+                f"{gw['bootstrap_volume']}:/bootstrap",
+                consul_image,
+                "sh",
+                "-ec",
+                (
+                    "if [ \"${EXPOSE_SERVERS:-0}\" = \"1\" ]; then\n"
+                    "  consul connect envoy -gateway=mesh -register -service \"mesh-gateway\" -proxy-id \"${MESH_GATEWAY_PROXY_ID}\" "
+                    "-address \"${MESH_GATEWAY_ADDRESS}\" -wan-address \"${MESH_GATEWAY_WAN_ADDRESS}\" "
+                    "-bind-address \"default=${MESH_GATEWAY_BIND_ADDRESS}\" -admin-bind \"${ENVOY_ADMIN_BIND}\" "
+                    "-bootstrap -expose-servers >/bootstrap/bootstrap.json\n"
+                    "else\n"
+                    "  consul connect envoy -gateway=mesh -register -service \"mesh-gateway\" -proxy-id \"${MESH_GATEWAY_PROXY_ID}\" "
+                    "-address \"${MESH_GATEWAY_ADDRESS}\" -wan-address \"${MESH_GATEWAY_WAN_ADDRESS}\" "
+                    "-bind-address \"default=${MESH_GATEWAY_BIND_ADDRESS}\" -admin-bind \"${ENVOY_ADMIN_BIND}\" "
+                    "-bootstrap >/bootstrap/bootstrap.json\n"
+                    "fi\n"
+                ),
+            ],
+            c,
+        )
+    )
+
+    steps.append(
+        podman_step(
+            [
+                "run",
+                *pull_policy(env),
+                "-d",
+                "--name",
+                c,
+                "--pod",
+                pod_name,
+                "--restart",
+                "unless-stopped",
+                *run_args,
+                "-e",
+                f"ENVOY_DRAIN_TIME_S={env.get('ENVOY_DRAIN_TIME_S', DEFAULT_DRAIN_TIME_S)}",
+                "-e",
+                f"ENVOY_EXTRA_ARGS={envoy_extra}",
+                "-v",
+                f"{gw['bootstrap_volume']}:/bootstrap:ro",
+                envoy_image,
+                "sh",
+                "-ec",
+                ENVOY_CMD,
+            ],
+            c,
+            cpuset=c,
+        )
+    )
+    return steps
+
+
+def app_plan(bundle: dict, env: dict, out_root: Path) -> list[dict]:
+    steps: list[dict] = []
+    dc = env.get("CONSUL_DATACENTER") or bundle.get("dc")
+    host_ip = env.get("HOST_IP") or bundle.get("host_ip")
+    if not dc or not host_ip:
+        die("Missing CONSUL_DATACENTER/HOST_IP in bundle")
+
+    consul_image = env.get("CONSUL_IMAGE") or (bundle.get("images") or {}).get("consul") or "docker.io/hashicorp/consul:1.17"
+    envoy_image = env.get("ENVOY_IMAGE") or (bundle.get("images") or {}).get("envoy") or "docker.io/envoyproxy/envoy:v1.29-latest"
+
+    rendered_dir = out_root / "rendered"
+    if not rendered_dir.is_dir():
+        die(
+            f"Missing pre-rendered templates directory: {rendered_dir}. "
+            "Run `python tools/meshctl.py expand --bundle <bundle>` during deployment."
+        )
+
+    index = bundle_index(bundle)
+    if not index.get("services"):
+        die(f"No service templates in bundle index for {bundle.get('host')}")
+    agent_hcl = out_root / "consul-config" / index["consul_config"]
+    require_file(agent_hcl)
+
+    profiles = bundle.get("envoy_profiles") or {}
+    mode = network_mode(env)
+    local_bind = "0.0.0.0" if mode != "host" else "127.0.0.1"
+
+    port_args = [
+        "-p",
+        "127.0.0.1:8500:8500/tcp",
+        "-p",
+        "127.0.0.1:8502:8502/tcp",
+        "-p",
+        "8301:8301/tcp",
+        "-p",
+        "8301:8301/udp",
+    ]
+
+    socket_dir = env.get("MESH_SOCKET_DIR", "")
+    socket_users: set[str] = set()
+
+    sidecars = index.get("sidecars") or []
+    for sc in sidecars:
+        if sc["upstream_sockets"]:
+            if not socket_dir:
+                die(f"{sc['name']}: socket upstreams require MESH_SOCKET_DIR in the bundle env")
+            socket_users.add(sc["name"])
+        port_args += ["-p", f"{sc['sidecar_port']}:{sc['sidecar_port']}/tcp"]
+        port_args += ["-p", f"127.0.0.1:{sc['admin_port']}:{sc['admin_port']}/tcp"]
+        for up in sc["upstream_ports"]:
+            port_args += ["-p", f"127.0.0.1:{up}:{up}/tcp"]
+
+    dns = index.get("dns")
+    if dns:
+        port_args += ["-p", f"127.0.0.1:{dns['port']}:{dns['port']}/udp", "-p", f"127.0.0.1:{dns['port']}:{dns['port']}/tcp"]
+
+    pod_name = index["pod"]
+    agent_container = index["containers"]["agent"]
+    steps.append({"op": "pod", "name": pod_name, "args": pod_create_args(pod_name, port_args, mode)})
+
+    agent_data_vol = f"consul-agent-data-{dc}"
+    steps.append({"op": "volume", "name": agent_data_vol})
+
+    node = env.get("CONSUL_NODE_NAME", f"app-{dc}-{host_ip.replace('.', '-')}")
+
+    args = [
+        "agent",
+        f"-config-file=/consul/config/{index['consul_config']}",
+        "-data-dir=/consul/data",
+        f"-node={node}",
+        f"-datacenter={dc}",
+        f"-client={local_bind}",
+        "-config-dir=/consul/config/rendered",
+        f"-bind={env.get('CONSUL_BIND_ADDR','0.0.0.0')}",
+        f"-advertise={env.get('CONSUL_ADVERTISE_ADDR', host_ip)}",
+    ]
+    if env.get("CONSUL_ENCRYPT"):
+        args.append(f"-encrypt={env['CONSUL_ENCRYPT']}")
+    for addr in parse_csv(env.get("CONSUL_RETRY_JOIN", "")):
+        args.append(f"-retry-join={addr}")
+
+    steps.append(podman_step(["rm", "-f", agent_container], agent_container, check=False))
+    steps.append(
+        podman_step(
+            [
+                "run",
+                *pull_policy(env),
+                "-d",
+                "--name",
+                agent_container,
+                "--pod",
+                pod_name,
+                "--restart",
+                "unless-stopped",
+                "-v",
+                f"{agent_hcl.as_posix()}:/consul/config/{index['consul_config']}:ro",
+                "-v",
+                f"{rendered_dir.as_posix()}:/consul/config/rendered:ro",
+                "-v",
+                f"{agent_data_vol}:/consul/data",
+                consul_image,
+                *args,
+            ],
+            agent_container,
+            cpuset=agent_container,
+        )
+    )
+
+    # Not tied to a component: sidecar bootstraps need the agent even when only they are restarted.
+    steps.append({"op": "wait_http", "url": "http://127.0.0.1:8500/v1/agent/self", "timeout_s": 120})
+
+    if dns:
+        corefile = out_root / "dns" / dns["corefile"]
+        require_file(corefile)
+        dns_image = env.get("DNS_CACHE_IMAGE") or "docker.io/coredns/coredns:1.11.1"
+        steps.append(podman_step(["rm", "-f", dns["container"]], dns["container"], check=False))
+        steps.append(
+            podman_step(
+                [
+                    "run",
+                    *pull_policy(env),
+                    "-d",
+                    "--name",
+                    dns["container"],
+                    "--pod",
+                    pod_name,
+                    "--restart",
+                    "unless-stopped",
+                    "-v",
+                    f"{corefile.as_posix()}:/Corefile:ro",
+                    dns_image,
+                    "-conf",
+                    "/Corefile",
+                ],
+                dns["container"],
+                # Shares the agent's cores.
+                cpuset=agent_container,
+            )
+        )
+        # An answer, not a TCP connect: published ports accept connections even when CoreDNS is down.
+        steps.append(
+            {
+                "op": "wait_dns",
+                "host": "127.0.0.1",
+                "port": int(dns["port"]),
+                "name": f"{index['services'][0]['name']}.service.consul",
+                "timeout_s": 30,
+                "component": dns["container"],
+            }
+        )
+
+    if socket_users:
+        steps.append({"op": "mkdir", "path": socket_dir})
+
+    envoy_extra = env.get("ENVOY_EXTRA_ARGS", "")
+    for sc in sidecars:
+        name, service_id, sidecar_port, admin_port = sc["name"], sc["service_id"], sc["sidecar_port"], sc["admin_port"]
+        # Same path inside and outside the container so the host apps can connect to it.
+        # Envoy runs as container root (the invoking user under rootless Podman) so the socket stays host-accessible.
+        socket_args = ["-e", "ENVOY_UID=0", "-v", f"{socket_dir}:{socket_dir}"] if name in socket_users else []
+        bootstrap_vol = sc["bootstrap_volume"]
+        steps.append({"op": "volume", "name": bootstrap_vol})
+        envoy_container = sc["container"]
+        steps.append(podman_step(["rm", "-f", envoy_container], envoy_container, check=False))
+
+        steps.append(
+            podman_step(
+                [
+                    "run",
+                    *pull_policy(env),
+                    "--rm",
+                    "--pod",
+                    pod_name,
+                    "-e",
+                    "CONSUL_HTTP_ADDR=http://127.0.0.1:8500",
+                    "-e",
+                    "CONSUL_GRPC_ADDR=http://127.0.0.1:8502",
+                    "-e",
+                    f"SERVICE_ID={service_id}",
+                    "-e",
+                    f"ENVOY_ADMIN_BIND={local_bind}:{admin_port}",
+                    "-v",
+                    f"{bootstrap_vol}:/bootstrap",
+                    consul_image,
+                    "sh",
+                    "-ec",
+                    (
+                        "for i in $(seq 1 240); do "
+                        "wget -qO- \"http://127.0.0.1:8500/v1/agent/service/${SERVICE_ID}\" >/dev/null 2>&1 && break; "
+                        "sleep 1; "
+                        "done\n"
+                        "wget -qO- \"http://127.0.0.1:8500/v1/agent/service/${SERVICE_ID}\" >/dev/null\n"
+                        "consul connect envoy -sidecar-for \"${SERVICE_ID}\" -admin-bind \"${ENVOY_ADMIN_BIND}\" -bootstrap >/bootstrap/bootstrap.json\n"
+                    ),
+                ],
+                envoy_container,
+            )
+        )
+
+        steps.append(
+            podman_step(
+                [
+                    "run",
+                    *pull_policy(env),
+                    "-d",
+                    "--name",
+                    envoy_container,
+                    "--pod",
+                    pod_name,
+                    "--restart",
+                    "unless-stopped",
+                    *envoy_profile_args(profiles.get(name)),
+                    *socket_args,
+                    "-e",
+                    f"ENVOY_DRAIN_TIME_S={env.get('ENVOY_DRAIN_TIME_S', DEFAULT_DRAIN_TIME_S)}",
+                    "-e",
+                    f"ENVOY_EXTRA_ARGS={envoy_extra}",
+                    "-v",
+                    f"{bootstrap_vol}:/bootstrap:ro",
+                    envoy_image,
+                    "sh",
+                    "-ec",
+                    ENVOY_CMD,
+                ],
+                envoy_container,
+                cpuset=envoy_container,
+            )
+        )
+
+        # Ensure sidecar port is actually listening before we return success.
+        # This prevents Consul's "Connect Sidecar Listening" check from immediately failing.
+        steps.append(
+            {
+                "op": "wait_sidecar",
+                "mode": mode,
+                "sidecar_port": int(sidecar_port),
+                "admin_port": int(admin_port),
+                "timeout_s": 60,
+                "component": envoy_container,
+            }
+        )
+    # Maintenance set by a drained `down-app` survives in the agent data volume; lift it once the sidecars are ready.
+    steps.append({"op": "maintenance_off", "url": "http://127.0.0.1:8500", "service_ids": [svc["id"] for svc in index["services"]]})
+    return steps
+
+
+def stack_env(bundle: dict, out_root: Path) -> dict:
+    env = {k: str(v) for k, v in (bundle.get("env", {}) or {}).items()}
+    env.update(read_env(out_root / "runtime.env"))
+    if bundle.get("role") == "server":
+        env["CONSUL_CONFIG_ENTRIES_DIR"] = str((out_root / "config-entries").as_posix())
+    else:
+        env["CONSUL_SERVICE_TEMPLATES_DIR"] = str((out_root / "services").as_posix())
+    return env
+
+
+def write_plan(bundle: dict, out_root: Path) -> Path:
+    env = stack_env(bundle, out_root)
+    steps = server_plan(bundle, env, out_root) if bundle.get("role") == "server" else app_plan(bundle, env, out_root)
+    plan = {
+        "version": PLAN_VERSION,
+        "host": bundle.get("host"),
+        "role": bundle.get("role"),
+        "files_sha256": bundle_index(bundle)["files_sha256"],
+        # Checked against the local cores and NUMA topology each time the plan runs (resolve_plan).
+        "host_checks": {
+            "envoy_profiles": bundle.get("envoy_profiles") or {},
+            "placement": bundle.get("placement") or {},
+            "owners": placement_owners(bundle),
+        },
+        "steps": steps,
+    }
+    path = out_root / "plan.json"
+    write_text(path, json.dumps(plan, indent=2) + "\n")
+    return path
+
+
+def read_plan_file(path: Path) -> dict:
+    if not path.is_file():
+        die(f"Missing execution plan: {path.as_posix()}. Run `python tools/meshctl.py expand --force --bundle <bundle>`.")
+    plan = json.loads(path.read_text(encoding="utf-8"))
+    if plan.get("version") != PLAN_VERSION:
+        die(f"{path.as_posix()}: plan version {plan.get('version')} (expected {PLAN_VERSION}); re-run expand --force")
+    return plan
+
+
+def load_plan(bundle: dict, out_root: Path) -> dict:
+    path = out_root / "plan.json"
+    plan = read_plan_file(path)
+    if plan.get("files_sha256") != bundle_index(bundle)["files_sha256"]:
+        die(f"{path.as_posix()} was expanded from a different bundle; re-run expand --force")
+    return plan
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from .common import die, run, run_proc
+
+NETWORK_MODES = ("publish", "pasta", "host")
+
+
+def podman(args: list[str], *, capture: bool = False, check: bool = True) -> str:
+    return run(["podman", *args], capture=capture, check=check)
+
+
+def pull_policy(env: dict) -> list[str]:
+    # Images pinned by `prefetch` are already local; never fall back to a registry pull at start time.
+    return ["--pull=never"] if env.get("MESH_IMAGES_PINNED") == "1" else []
+
+
+def podman_exists(kind: str, name: str) -> bool:
+    if kind == "pod":
+        return run_proc(["podman", "pod", "exists", name], check=False).returncode == 0
+    if kind == "container":
+        return run_proc(["podman", "container", "exists", name], check=False).returncode == 0
+    if kind == "volume":
+        return run_proc(["podman", "volume", "exists", name], check=False).returncode == 0
+    if kind == "image":
+        return run_proc(["podman", "image", "exists", name], check=False).returncode == 0
+    die(f"Unknown podman kind: {kind}")
+
+
+def ensure_volume(name: str) -> None:
+    if podman_exists("volume", name):
+        return
+    podman(["volume", "create", name], capture=False)
+
+
+def network_mode(env: dict) -> str:
+    mode = env.get("MESH_NETWORK_MODE", "publish") or "publish"
+    if mode not in NETWORK_MODES:
+        die(f"Unsupported MESH_NETWORK_MODE: {mode} (expected one of {', '.join(NETWORK_MODES)})")
+    return mode
+
+
+def pod_create_args(name: str, port_args: list[str], mode: str = "publish") -> list[str]:
+    if mode == "host":
+        # Containers share the host network namespace; nothing to publish.
+        return ["pod", "create", "--name", name, "--network", "host"]
+    if mode == "pasta":
+        return ["pod", "create", "--name", name, "--network", "pasta", *port_args]
+    return ["pod", "create", "--name", name, *port_args]
+
+
+def ensure_pod(name: str, create_args: list[str]) -> None:
+    if podman_exists("pod", name):
+        return
+    podman(create_args, capture=False)
+
+
+def rm_pod(name: str) -> None:
+    podman(["pod", "rm", "-f", name], check=False)
+
+
+def podman_tail_logs(container: str, lines: int = 200) -> str:
+    try:
+        return podman(["logs", "--tail", str(lines), container], capture=True, check=False)
+    except Exception as e:
+        return f"<failed to read podman logs for {container}: {e}>"
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from .bundle import expanded_root, load_bundle
+from .common import die, read_env, require_cmd, write_env
+from .plan import write_plan
+from .podman import podman, podman_exists
+
+
+def bundle_images(bundle: dict, env: dict) -> dict[str, str]:
+    images = (bundle.get("images") or {})
+    refs = {
+        "CONSUL_IMAGE": env.get("CONSUL_IMAGE") or images.get("consul") or "docker.io/hashicorp/consul:1.17",
+        "ENVOY_IMAGE": env.get("ENVOY_IMAGE") or images.get("envoy") or "docker.io/envoyproxy/envoy:v1.29-latest",
+    }
+    if (bundle.get("index") or {}).get("dns"):
+        refs["DNS_CACHE_IMAGE"] = env.get("DNS_CACHE_IMAGE") or "docker.io/coredns/coredns:1.11.1"
+    return refs
+
+
+def image_repo(ref: str) -> str:
+    if "@" in ref:
+        return ref.split("@", 1)[0]
+    name, sep, tag = ref.rpartition(":")
+    return name if sep and "/" not in tag else ref
+
+
+def pull_and_pin(ref: str) -> tuple[str, float]:
+    t0 = time.perf_counter()
+    podman(["pull", "--quiet", ref], capture=True)
+    elapsed = time.perf_counter() - t0
+    if "@sha256:" in ref:
+        return ref, elapsed
+    digests = json.loads(podman(["image", "inspect", "--format", "{{json .RepoDigests}}", ref], capture=True) or "[]") or []
+    repo = image_repo(ref)
+    for d in digests:
+        if d.split("@", 1)[0] == repo:
+            return d, elapsed
+    if digests:
+        return digests[0], elapsed
+    die(f"No repo digest for {ref} after pull")
+
+
+def cmd_prefetch(args) -> int:
+    from concurrent.futures import ThreadPoolExecutor
+
+    bundle_path = Path(args.bundle)
+    bundle = load_bundle(bundle_path)
+    out_root = expanded_root(bundle)
+    env_path = out_root / "runtime.env"
+    if not env_path.is_file():
+        die(f"Missing expanded runtime env: {env_path.as_posix()}. Run expand first.")
+    require_cmd("podman")
+    env = read_env(env_path)
+
+    if not args.verify:
+        # Resolve from the original tags so a re-run picks up a moved tag.
+        sources = {key: env.get(f"{key}_SOURCE") or ref for key, ref in bundle_images(bundle, bundle.get("env") or {}).items()}
+        with ThreadPoolExecutor(max_workers=args.jobs or len(sources)) as pool:
+            pinned = dict(zip(sources, pool.map(pull_and_pin, sources.values())))
+        for key, (digest_ref, elapsed) in pinned.items():
+            env[key] = digest_ref
+            env[f"{key}_SOURCE"] = sources[key]
+            print(f"{key}: {sources[key]} -> {digest_ref} ({elapsed:.1f}s)")
+        env["MESH_IMAGES_PINNED"] = "1"
+        write_env(env_path, env)
+        # The plan embeds image refs and the pull policy.
+        write_plan(bundle, out_root)
+
+    missing = [ref for ref in bundle_images(bundle, env).values() if not podman_exists("image", ref)]
+    if missing:
+        die(f"Images not in the local store: {', '.join(missing)} (run prefetch)")
+    if env.get("MESH_IMAGES_PINNED") != "1":
+        die("Images are present but not pinned to digests; run prefetch without --verify")
+    print(f"Prefetch: OK ({len(bundle_images(bundle, env))} images pinned and local)")
+    return 0
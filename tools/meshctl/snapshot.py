@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from .common import die, fetch_json, parse_csv
+
+SNAPSHOT_COLUMNS = ("dc", "service", "service_id", "node", "check_id", "status", "tags")
+STATUS_RANK = {"passing": 0, "warning": 1, "critical": 2, "": 3}
+
+
+def snapshot_dc(base: str, dc: str) -> list[tuple]:
+    checks = fetch_json(f"{base}/v1/health/state/any?dc={dc}")
+    services = fetch_json(f"{base}/v1/catalog/services?dc={dc}")
+    rows = []
+    seen = set()
+    for c in checks:
+        name = c.get("ServiceName") or ""
+        seen.add(name)
+        tags = ";".join(sorted(services.get(name) or [])) if name else ""
+        rows.append((dc, name, c.get("ServiceID") or "", c.get("Node") or "", c.get("CheckID") or "", c.get("Status") or "", tags))
+    # Services without any check still count as catalog entries (status left empty).
+    for name, tags in services.items():
+        if name not in seen:
+            rows.append((dc, name, "", "", "", "", ";".join(sorted(tags or []))))
+    return rows
+
+
+def open_snapshot(path: Path, mode: str):
+    if path.suffix == ".gz":
+        import gzip
+
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return path.open(mode, encoding="utf-8", newline="")
+
+
+def read_snapshot(path: Path) -> list[tuple]:
+    import csv
+
+    with open_snapshot(path, "r") as f:
+        reader = csv.reader(f)
+        header = tuple(next(reader, ()))
+        if header != SNAPSHOT_COLUMNS:
+            die(f"{path}: not a meshctl snapshot (header {header})")
+        return [tuple(row) for row in reader]
+
+
+def instance_health(rows: list[tuple]) -> dict[tuple, str]:
+    # (dc, service, service_id, node) -> worst status over the instance's checks.
+    worst: dict[tuple, str] = {}
+    for dc, service, service_id, node, _, status, _ in rows:
+        if not service_id:
+            continue
+        key = (dc, service, service_id, node)
+        if key not in worst or STATUS_RANK.get(status, 3) > STATUS_RANK.get(worst[key], 3):
+            worst[key] = status
+    return worst
+
+
+def passing_by_service(rows: list[tuple]) -> dict[tuple, tuple[int, int]]:
+    counts: dict[tuple, list[int]] = {}
+    for (dc, service, _, _), status in instance_health(rows).items():
+        c = counts.setdefault((dc, service), [0, 0])
+        c[1] += 1
+        if status == "passing":
+            c[0] += 1
+    return {k: (v[0], v[1]) for k, v in counts.items()}
+
+
+def diff_snapshots(a_rows: list[tuple], b_rows: list[tuple]) -> dict:
+    a = {r[:5]: r[5] for r in a_rows}
+    b = {r[:5]: r[5] for r in b_rows}
+    changed = sorted((k, a[k], b[k]) for k in a.keys() & b.keys() if a[k] != b[k])
+    a_svc = passing_by_service(a_rows)
+    b_svc = passing_by_service(b_rows)
+    services = []
+    for key in sorted(a_svc.keys() | b_svc.keys()):
+        before, after = a_svc.get(key, (0, 0)), b_svc.get(key, (0, 0))
+        if before != after:
+            services.append({"dc": key[0], "service": key[1], "passing_before": before[0], "passing_after": after[0], "instances_before": before[1], "instances_after": after[1]})
+    return {
+        "checks_added": len(b.keys() - a.keys()),
+        "checks_removed": len(a.keys() - b.keys()),
+        "checks_changed": [{"dc": k[0], "service": k[1], "service_id": k[2], "node": k[3], "check_id": k[4], "before": sa, "after": sb} for k, sa, sb in changed],
+        "services": services,
+        # Services that had passing instances in a DC and now have none: callers must fail over.
+        "lost_dc": [f"{s['service']}@{s['dc']}" for s in services if s["passing_before"] > 0 and s["passing_after"] == 0],
+    }
+
+
+def cmd_snapshot(args) -> int:
+    import csv
+    from concurrent.futures import ThreadPoolExecutor
+
+    if args.diff:
+        a_path, b_path = (Path(p) for p in args.diff)
+        result = diff_snapshots(read_snapshot(a_path), read_snapshot(b_path))
+        if args.json:
+            print(json.dumps(result, indent=2))
+            return 0
+        print(f"Checks: +{result['checks_added']} -{result['checks_removed']} ~{len(result['checks_changed'])}")
+        for s in result["services"]:
+            print(f"  {s['service']}@{s['dc']}: passing {s['passing_before']}/{s['instances_before']} -> {s['passing_after']}/{s['instances_after']}")
+        if result["lost_dc"]:
+            print(f"No passing instances left: {', '.join(result['lost_dc'])}")
+        return 0
+
+    if not args.out:
+        die("snapshot: --out is required unless --diff is used")
+    base = args.consul_addr.rstrip("/")
+    dcs = parse_csv(args.dcs) or fetch_json(f"{base}/v1/catalog/datacenters")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, len(dcs))) as pool:
+        per_dc = list(pool.map(lambda dc: snapshot_dc(base, dc), dcs))
+    rows = sorted(row for dc_rows in per_dc for row in dc_rows)
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open_snapshot(out, "w") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(SNAPSHOT_COLUMNS)
+        writer.writerows(rows)
+    elapsed = (time.perf_counter() - t0) * 1000
+    instances = instance_health(rows)
+    passing = sum(1 for status in instances.values() if status == "passing")
+    print(f"Snapshot: {out.as_posix()} ({len(dcs)} DCs, {len(rows)} rows, {passing}/{len(instances)} instances passing, {elapsed:.0f} ms)")
+    return 0
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from .bundle import bundle_index, expanded_root, load_bundle
+from .common import die, http_get, http_send, warn
+from .consul import agent_node_name, drain_targets, set_maintenance
+from .expand import expand_bundle
+from .plan import DEFAULT_DRAIN_TIME_S, load_plan, read_plan_file, resolve_plan, run_plan
+from .podman import podman, podman_exists, rm_pod
+
+
+def wait_deregistered(base: str, targets: dict[str, str], timeout_s: float) -> bool:
+    # The servers must stop returning these instances as passing before other proxies drop them. Until the
+    # agent names its node nothing counts as deregistered; if it never does, stop before the pod is removed.
+    node = None
+    pending = dict(targets)
+    deadline = time.perf_counter() + timeout_s
+    while pending:
+        node = node or agent_node_name(base)
+        for name in sorted(set(pending.values())) if node else []:
+            code, body = http_get(f"{base}/v1/health/service/{name}?passing=1", timeout_s=2.0)
+            try:
+                entries = json.loads(body or "[]") if code == 200 else None
+                passing = {e["Service"]["ID"] for e in entries if e["Node"]["Node"] == node} if isinstance(entries, list) else None
+            except (KeyError, TypeError, ValueError):
+                passing = None
+            if passing is None:
+                continue
+            for sid in [sid for sid, n in pending.items() if n == name and sid not in passing]:
+                del pending[sid]
+        if not pending or time.perf_counter() >= deadline:
+            break
+        time.sleep(0.5)
+    if pending and node is None:
+        die(f"Consul agent at {base} did not report its node within {timeout_s:.0f}s; the pod is still running, in maintenance (re-run, or use --no-drain)")
+    return not pending
+
+
+def envoy_active_connections(host: str, admin_port: int, listener_port: int) -> int | None:
+    code, body = http_get(f"http://{host}:{admin_port}/stats?filter=downstream_cx_active$", timeout_s=2.0)
+    if code != 200:
+        return None
+    total = 0
+    for line in body.splitlines():
+        name, _, value = line.partition(": ")
+        # listener.<addr>_<port>.downstream_cx_active; the admin listener is listener.admin.*.
+        if name.startswith("listener.") and name.endswith(f"_{listener_port}.downstream_cx_active"):
+            total += int(value)
+    return total
+
+
+def drain_stack(base: str, service_ids: set[str], listeners: list[dict], args, bundle: dict, *, reason: str) -> None:
+    # listeners: {"name", "host", "admin_port", "port", "inbound_only"} per Envoy.
+    drain_timeout = args.drain_timeout
+    if drain_timeout is None:
+        drain_timeout = float((bundle.get("env") or {}).get("ENVOY_DRAIN_TIME_S", DEFAULT_DRAIN_TIME_S))
+    t0 = time.perf_counter()
+    targets = drain_targets(base, service_ids)
+    if targets is None:
+        warn(f"Consul agent not reachable at {base}; removing the pod without draining")
+        return
+    set_maintenance(base, service_ids, enable=True, reason=reason)
+    print(f"Drain: {len(targets)} services in maintenance")
+    if not wait_deregistered(base, targets, args.propagation_timeout):
+        warn(f"Servers still list some instances as passing after {args.propagation_timeout:.0f}s; draining anyway")
+    # Other proxies get the endpoint removal over xDS right after the catalog changes.
+    time.sleep(args.settle)
+    print(f"Drain: catalog updated ({time.perf_counter() - t0:.1f}s)")
+
+    for lst in listeners:
+        # Sidecars drain only their inbound (public) listener: the local app may still finish outbound calls.
+        url = f"http://{lst['host']}:{lst['admin_port']}/drain_listeners?graceful" + ("&inboundonly" if lst["inbound_only"] else "")
+        code, _ = http_send("POST", url, "", timeout_s=2.0)
+        if code != 200:
+            warn(f"{lst['name']}: POST /drain_listeners -> {code}")
+    deadline = time.perf_counter() + drain_timeout
+    while True:
+        active = {lst["name"]: envoy_active_connections(lst["host"], lst["admin_port"], lst["port"]) for lst in listeners}
+        busy = {name: n for name, n in active.items() if n}
+        if not busy:
+            print(f"Drain: no active connections ({time.perf_counter() - t0:.1f}s)")
+            return
+        if time.perf_counter() >= deadline:
+            warn(f"Still active after {drain_timeout:.0f}s: " + ", ".join(f"{name}={n}" for name, n in sorted(busy.items())))
+            return
+        time.sleep(0.5)
+
+
+def down_stack(*, dc: str, pod_name: str, volumes: list[str], remove_volumes: bool) -> None:
+    rm_pod(pod_name)
+    if remove_volumes:
+        for v in volumes:
+            podman(["volume", "rm", "-f", v], check=False)
+
+
+def cmd_up_server(args) -> int:
+    if args.plan:
+        plan = read_plan_file(Path(args.plan))
+        run_plan(resolve_plan(plan))
+        print(f"Up(server): {plan.get('host')} (from {args.plan})")
+        return 0
+    if not args.bundle:
+        die("up-server: --bundle or --plan is required")
+    bundle_path = Path(args.bundle)
+    bundle = load_bundle(bundle_path)
+    out_root = expanded_root(bundle)
+    if not out_root.exists():
+        if args.auto_expand:
+            bundle, out_root, env = expand_bundle(bundle, bundle_path=bundle_path, force=False)
+        else:
+            die(f"Missing expanded directory: {out_root}. Run `python tools/meshctl.py expand --bundle {bundle_path}` during deployment.")
+    run_plan(resolve_plan(load_plan(bundle, out_root)))
+    print(f"Up(server): {bundle.get('host')} ({bundle.get('dc')})")
+    return 0
+
+
+def cmd_down_server(args) -> int:
+    bundle_path = Path(args.bundle)
+    bundle = load_bundle(bundle_path)
+    index = bundle_index(bundle)
+    if not args.no_drain and podman_exists("pod", index["pod"]):
+        mgmt_bind = (bundle.get("env") or {}).get("MGMT_BIND_ADDR", "127.0.0.1")
+        listeners = [
+            {"name": gw["container"], "host": mgmt_bind, "admin_port": gw["admin_port"], "port": gw["port"], "inbound_only": False}
+            for gw in index["gateways"]
+        ]
+        service_ids = {gw["proxy_id"] for gw in index["gateways"]}
+        drain_stack(f"http://{mgmt_bind}:8500", service_ids, listeners, args, bundle, reason="meshctl down-server")
+    down_stack(
+        dc=bundle.get("dc") or "",
+        pod_name=index["pod"],
+        volumes=index["volumes"],
+        remove_volumes=args.remove_volumes,
+    )
+    print(f"Down(server): {bundle.get('host')} ({bundle.get('dc')})")
+    return 0
+
+
+def cmd_up_app(args) -> int:
+    if args.plan:
+        plan = read_plan_file(Path(args.plan))
+        run_plan(resolve_plan(plan))
+        print(f"Up(app): {plan.get('host')} (from {args.plan})")
+        return 0
+    if not args.bundle:
+        die("up-app: --bundle or --plan is required")
+    bundle_path = Path(args.bundle)
+    bundle = load_bundle(bundle_path)
+    out_root = expanded_root(bundle)
+    if not out_root.exists():
+        if args.auto_expand:
+            bundle, out_root, env = expand_bundle(bundle, bundle_path=bundle_path, force=False)
+        else:
+            die(f"Missing expanded directory: {out_root}. Run `python tools/meshctl.py expand --bundle {bundle_path}` during deployment.")
+    run_plan(resolve_plan(load_plan(bundle, out_root)))
+    print(f"Up(app): {bundle.get('host')} ({bundle.get('dc')})")
+    return 0
+
+
+def cmd_down_app(args) -> int:
+    bundle_path = Path(args.bundle)
+    bundle = load_bundle(bundle_path)
+    index = bundle_index(bundle)
+    if not args.no_drain and podman_exists("pod", index["pod"]):
+        listeners = [
+            {"name": sc["container"], "host": "127.0.0.1", "admin_port": sc["admin_port"], "port": sc["sidecar_port"], "inbound_only": True}
+            for sc in index.get("sidecars") or []
+        ]
+        service_ids = {svc["id"] for svc in index["services"]}
+        drain_stack("http://127.0.0.1:8500", service_ids, listeners, args, bundle, reason="meshctl down-app")
+    # Agent data + sidecar bootstrap volumes come from the index (no filesystem required).
+    down_stack(dc=bundle.get("dc") or "", pod_name=index["pod"], volumes=index["volumes"], remove_volumes=args.remove_volumes)
+    print(f"Down(app): {bundle.get('host')} ({bundle.get('dc')})")
+    return 0
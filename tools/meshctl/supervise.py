@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .bundle import bundle_index, expanded_root, load_bundle
+from .common import die, http_get, require_cmd, write_text
+from .dns import dns_probe
+from .plan import load_plan, resolve_plan, run_plan, stack_env
+from .podman import podman, podman_exists
+
+if TYPE_CHECKING:
+    import queue
+    import subprocess
+
+
+def supervise_checks(bundle: dict, env: dict) -> dict[str, object]:
+    # container name -> health check returning "" when healthy, else a reason.
+    index = bundle_index(bundle)
+    checks: dict[str, object] = {}
+    if bundle.get("role") == "server":
+        mgmt_bind = env.get("MGMT_BIND_ADDR", "127.0.0.1")
+
+        def server_agent() -> str:
+            # Only this server's own agent: a lost quorum is not fixed by restarting healthy servers.
+            code, _ = http_get(f"http://{mgmt_bind}:8500/v1/agent/self", timeout_s=2.0)
+            return "" if code == 200 else f"agent unreachable ({code})"
+
+        checks[index["containers"]["consul"]] = server_agent
+        for gw in index["gateways"]:
+            checks[gw["container"]] = envoy_ready_check(mgmt_bind, gw["admin_port"])
+        return checks
+
+    expected = {svc["id"] for svc in index.get("services") or []}
+
+    def agent_services() -> str:
+        code, body = http_get("http://127.0.0.1:8500/v1/agent/services", timeout_s=2.0)
+        if code != 200:
+            return f"agent unreachable ({code})"
+        try:
+            missing = sorted(expected - set(json.loads(body).keys()))
+        except (json.JSONDecodeError, AttributeError):
+            return "failed to parse /v1/agent/services response"
+        return f"services missing: {', '.join(missing)}" if missing else ""
+
+    checks[index["containers"]["agent"]] = agent_services
+    for sc in index.get("sidecars") or []:
+        checks[sc["container"]] = envoy_ready_check("127.0.0.1", sc["admin_port"])
+    dns = index.get("dns")
+    if dns:
+        name = f"{index['services'][0]['name']}.service.consul"
+        checks[dns["container"]] = lambda: dns_probe(("127.0.0.1", int(dns["port"])), name, 1.0)
+    return checks
+
+
+def envoy_ready_check(host: str, admin_port: int):
+    def check() -> str:
+        code, _ = http_get(f"http://{host}:{admin_port}/ready", timeout_s=2.0)
+        return "" if code == 200 else f"envoy not ready ({code})"
+
+    return check
+
+
+def podman_events(pod_name: str, events: queue.Queue) -> subprocess.Popen:
+    import subprocess
+    import threading
+
+    proc = subprocess.Popen(
+        ["podman", "events", "--format", "json", "--filter", "type=container", "--filter", f"pod={pod_name}"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+
+    def pump() -> None:
+        for line in proc.stdout:
+            try:
+                ev = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            events.put((time.monotonic(), ev.get("Name") or "", ev.get("Status") or ""))
+
+    threading.Thread(target=pump, daemon=True).start()
+    return proc
+
+
+def write_supervise_metrics(path: Path, stats: dict[str, dict]) -> None:
+    lines = []
+    for metric, key, help_text, kind in (
+        ("mesh_supervise_healthy", "healthy", "1 if the component passed its last health check", "gauge"),
+        ("mesh_supervise_failures_total", "failures", "Failures detected (events or health checks)", "counter"),
+        ("mesh_supervise_restarts_total", "restarts", "Reconciles performed by the supervisor", "counter"),
+        ("mesh_supervise_last_recovery_seconds", "last_recovery_s", "Time from detection to healthy for the last failure", "gauge"),
+        ("mesh_supervise_recovery_seconds_sum", "recovery_sum_s", "Total time to recover", "counter"),
+        ("mesh_supervise_recovery_seconds_count", "recoveries", "Number of recoveries", "counter"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for component, st in sorted(stats.items()):
+            lines.append(f'{metric}{{component="{component}"}} {float(st[key]):.6g}')
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    write_text(tmp, "\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+
+def cmd_supervise(args) -> int:
+    import queue
+
+    bundle_path = Path(args.bundle)
+    bundle = load_bundle(bundle_path)
+    out_root = expanded_root(bundle)
+    if not out_root.is_dir():
+        die(f"Missing expanded directory: {out_root}. Run expand first.")
+    require_cmd("podman")
+    env = stack_env(bundle, out_root)
+    index = bundle_index(bundle)
+    role = bundle.get("role")
+    steps = resolve_plan(load_plan(bundle, out_root))
+    checks = supervise_checks(bundle, env)
+    stats = {c: {"healthy": 1, "failures": 0, "restarts": 0, "last_recovery_s": 0, "recovery_sum_s": 0, "recoveries": 0} for c in checks}
+    failing_since: dict[str, float] = {}
+    acted_at: dict[str, float] = {}
+    reloaded: set[str] = set()
+    metrics = Path(args.metrics_file) if args.metrics_file else None
+
+    def log(msg: str) -> None:
+        print(f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {msg}", flush=True)
+
+    def reconcile(container: str, reason: str) -> None:
+        agent = index["containers"].get("agent")
+        # An agent that lost its registrations usually only needs to re-read its config dir.
+        if container == agent and reason.startswith("services missing") and container not in reloaded:
+            reloaded.add(container)
+            log(f"{container}: {reason}; consul reload")
+            podman(["exec", container, "consul", "reload"], check=False)
+            acted_at[container] = time.monotonic()
+            return
+        log(f"{container}: {reason}; restarting")
+        stats[container]["restarts"] += 1
+        try:
+            run_plan(steps, only={container})
+        except SystemExit:
+            log(f"{container}: restart failed; retrying after {args.grace}s")
+        finally:
+            acted_at[container] = time.monotonic()
+
+    events: queue.Queue = queue.Queue()
+    proc = podman_events(index["pod"], events)
+    log(f"Supervising {len(checks)} components in pod {index['pod']} ({role})")
+    next_check = 0.0
+    try:
+        while True:
+            timeout = max(0.0, next_check - time.monotonic())
+            try:
+                seen_at, name, status = events.get(timeout=timeout)
+                # Events caused by our own restart of the container are not new failures.
+                if name in checks and status in ("died", "oom", "remove") and seen_at > acted_at.get(name, 0.0):
+                    # Give the restart policy a moment, then let the health check decide.
+                    if name not in failing_since:
+                        failing_since[name] = seen_at
+                        stats[name]["failures"] += 1
+                    log(f"{name}: event {status}")
+                    next_check = min(next_check, time.monotonic() + 1.0)
+                continue
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            next_check = now + (1.0 if failing_since else args.interval)
+            if not podman_exists("pod", index["pod"]):
+                # down-* removed the stack; nothing to heal until it is started again.
+                failing_since.clear()
+                continue
+            for container, check in checks.items():
+                reason = check()
+                st = stats[container]
+                if not reason:
+                    if container in failing_since:
+                        took = now - failing_since.pop(container)
+                        st["last_recovery_s"] = took
+                        st["recovery_sum_s"] += took
+                        st["recoveries"] += 1
+                        log(f"{container}: healthy again after {took:.1f}s")
+                    reloaded.discard(container)
+                    st["healthy"] = 1
+                    continue
+                st["healthy"] = 0
+                if container not in failing_since:
+                    failing_since[container] = now
+                    st["failures"] += 1
+                    log(f"{container}: {reason}")
+                elif now - max(failing_since[container], acted_at.get(container, 0.0)) >= args.grace:
+                    # failing_since keeps the original detection time, so time-to-recover includes the restart.
+                    reconcile(container, reason)
+            if metrics:
+                write_supervise_metrics(metrics, stats)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        proc.terminate()
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from .bundle import bundle_index, expanded_root, load_bundle, read_entry_store
+from .common import die
+from .config_entries import UNNAMED_ENTRY_KINDS, entry_drift, parse_config_entries
+from .dns import dns_probe
+
+
+class HttpPool:
+    # Keep-alive HTTP connections per host:port, shared by verify's worker threads. At most
+    # max_conns requests per endpoint are in flight, so workers queue for a warm connection
+    # instead of each opening a new one.
+    def __init__(self, timeout_s: float, max_conns: int = 4):
+        self._timeout_s = timeout_s
+        self._max_conns = max_conns
+        self._idle: dict[tuple[str, int], list] = {}
+        self._slots: dict[tuple[str, int], threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> tuple[int, str]:
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        key = (parts.hostname or "127.0.0.1", parts.port or 80)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        with self._lock:
+            if key not in self._slots:
+                self._slots[key] = threading.BoundedSemaphore(self._max_conns)
+            slot = self._slots[key]
+        with slot:
+            return self._request(key, path)
+
+    def _request(self, key: tuple[str, int], path: str) -> tuple[int, str]:
+        from http.client import HTTPConnection, HTTPException
+
+        while True:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                conn = idle.pop() if idle else None
+            reused = conn is not None
+            if conn is None:
+                conn = HTTPConnection(*key, timeout=self._timeout_s)
+            try:
+                conn.request("GET", path)
+                resp = conn.getresponse()
+                body = resp.read().decode("utf-8", errors="replace")
+            except (OSError, HTTPException) as e:
+                conn.close()
+                if reused:
+                    # The server closed an idle connection; retry on another (or a new) one.
+                    continue
+                return 0, str(e)
+            if resp.will_close:
+                conn.close()
+            else:
+                with self._lock:
+                    self._idle[key].append(conn)
+            return resp.status, body
+
+    def close(self) -> None:
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+def bundle_config_entries(bundle: dict, bundle_path: Path) -> dict[str, str]:
+    # The entries `up-server` applies: embedded ones plus hash references from the entry store
+    # (next to the bundle, or the copies `expand` wrote).
+    files = bundle.get("files") or {}
+    entries = dict(files.get("config_entries") or {})
+    refs = files.get("config_entry_refs") or {}
+    if refs:
+        store = bundle_path.parent / "entries"
+        if store.is_dir():
+            entries.update(read_entry_store(refs, store))
+        else:
+            expanded = expanded_root(bundle) / "config-entries"
+            for name in refs:
+                path = expanded / name
+                if not path.is_file():
+                    die(f"Config entry {name} is neither in {store.as_posix()} nor in {expanded.as_posix()}")
+                entries[name] = path.read_text(encoding="utf-8")
+    return entries
+
+
+def local_host_names() -> set[str]:
+    import socket
+
+    name = socket.gethostname()
+    return {name, name.split(".")[0], socket.getfqdn()}
+
+
+def verify_base(bundle: dict, addresses: dict[str, str], local_names: set[str]) -> str:
+    # The Consul HTTP API a bundle is checked against: an explicit --address, loopback (or the management
+    # bind) for this host's own bundle, else the host's address. App agents only publish their API on
+    # loopback, so other app hosts need --address (e.g. a tunnel) or verify run on the host itself.
+    host = bundle.get("host") or ""
+    if host in addresses:
+        address = addresses[host]
+        return f"http://{address}" if ":" in address else f"http://{address}:8500"
+    bind = (bundle.get("env") or {}).get("MGMT_BIND_ADDR", "127.0.0.1") if bundle.get("role") == "server" else "127.0.0.1"
+    if host in local_names or bind not in ("127.0.0.1", "localhost", "0.0.0.0"):
+        return f"http://{bind}:8500"
+    return f"http://{bundle.get('host_ip')}:8500"
+
+
+def verify_checks(bundle: dict, bundle_path: Path, pool: HttpPool, timeout_s: float, base: str) -> list[tuple[str, object]]:
+    # (check name, check returning "" when it passes, else a reason, optionally with details for --json);
+    # checks are independent so they can run concurrently.
+    from urllib.parse import urlsplit
+
+    index = bundle_index(bundle)
+    checks: list[tuple[str, object]] = []
+    if bundle.get("role") == "server":
+
+        def leader() -> str:
+            code, body = pool.get(f"{base}/v1/status/leader")
+            return "" if code == 200 and body.strip().strip('"') else f"Consul not ready at {base} (code={code})"
+
+        def config_kind(kind: str, expected: dict[str, dict]) -> tuple[str, dict]:
+            # One list call per kind, however many entries it has.
+            code, body = pool.get(f"{base}/v1/config/{kind}?dc={bundle.get('dc') or ''}")
+            if code != 200:
+                return f"GET /v1/config/{kind} -> {code}", {}
+            try:
+                live = {e.get("Name") or (kind if kind in UNNAMED_ENTRY_KINDS else None): e for e in json.loads(body) or []}
+            except (json.JSONDecodeError, AttributeError):
+                return f"failed to parse /v1/config/{kind} response", {}
+            missing = sorted(name for name in expected if name not in live)
+            drifted = {}
+            for name, want in sorted(expected.items()):
+                if name in live:
+                    drift = entry_drift(want, live[name])
+                    if drift:
+                        drifted[name] = drift
+            problems = [f"missing: {', '.join(missing)}"] if missing else []
+            problems += [f"drifted: {name} ({'; '.join(d)})" for name, d in drifted.items()]
+            return " | ".join(problems), {"entries": len(expected), "missing": missing, "drifted": drifted}
+
+        def peerings() -> tuple[str, dict]:
+            code, body = pool.get(f"{base}/v1/peerings")
+            if code != 200:
+                return f"GET /v1/peerings -> {code}", {}
+            try:
+                states = {p.get("Name"): p.get("State") for p in json.loads(body) or []}
+            except (json.JSONDecodeError, AttributeError):
+                return "failed to parse /v1/peerings response", {}
+            peers = {p["peer"]: states.get(p["peer"], "MISSING") for p in bundle["peering"]}
+            inactive = [f"{peer} ({state})" for peer, state in peers.items() if state != "ACTIVE"]
+            return (f"not active: {', '.join(inactive)}" if inactive else ""), {"peers": peers}
+
+        checks.append(("leader", leader))
+        if bundle.get("peering"):
+            checks.append(("peerings", peerings))
+        for kind, expected in sorted(parse_config_entries(bundle_config_entries(bundle, bundle_path)).items()):
+            checks.append((f"config-entries {kind}", lambda k=kind, e=expected: config_kind(k, e)))
+        return checks
+
+    if bundle.get("role") != "app":
+        die("Unknown role in bundle")
+    expected_ids = {svc["id"] for svc in index.get("services") or []}
+
+    def agent() -> str:
+        code, _ = pool.get(f"{base}/v1/agent/self")
+        return "" if code == 200 else f"Consul agent not ready at {base} (code={code})"
+
+    def services() -> str:
+        code, body = pool.get(f"{base}/v1/agent/services")
+        if code != 200:
+            return f"failed to read agent services (code={code})"
+        try:
+            missing = sorted(expected_ids - set(json.loads(body).keys()))
+        except json.JSONDecodeError:
+            return "failed to parse /v1/agent/services response"
+        return f"missing registered services: {', '.join(missing)}" if missing else ""
+
+    checks += [("agent", agent), ("services", services)]
+    dns = index.get("dns")
+    if dns:
+        name = f"{index['services'][0]['name']}.service.consul"
+        # The forwarder is published next to the agent API.
+        dns_addr = (urlsplit(base).hostname or "127.0.0.1", int(dns["port"]))
+
+        checks.append(("dns", lambda: dns_probe(dns_addr, name, timeout_s)))
+    return checks
+
+
+def run_check(check) -> tuple[str, dict, float]:
+    t0 = time.perf_counter()
+    try:
+        detail = check()
+    except SystemExit:
+        detail = "check aborted (see ERROR above)"
+    detail, extra = detail if isinstance(detail, tuple) else (detail, {})
+    return detail, extra, round((time.perf_counter() - t0) * 1000, 3)
+
+
+def bundle_paths(bundles_dir: Path) -> list[Path]:
+    # One file per host; when a host has both formats, the zip (cheaper to load) wins.
+    paths = sorted(bundles_dir.glob("*.bundle.zip"))
+    hosts = {p.name[: -len(".bundle.zip")] for p in paths}
+    paths += [p for p in sorted(bundles_dir.glob("*.bundle.json")) if p.name[: -len(".bundle.json")] not in hosts]
+    return sorted(paths)
+
+
+def cmd_verify(args) -> int:
+    from concurrent.futures import ThreadPoolExecutor
+
+    paths = [Path(p) for p in args.bundle or []]
+    for d in args.bundles or []:
+        found = bundle_paths(Path(d))
+        if not found:
+            die(f"No *.bundle.json or *.bundle.zip files in {d}")
+        paths += found
+    if not paths:
+        die("Pass --bundle and/or --bundles")
+    addresses: dict[str, str] = {}
+    for item in args.address or []:
+        host, sep, address = item.partition("=")
+        if not sep or not host or not address:
+            die(f"--address must be HOST=ADDR[:PORT], got {item!r}")
+        addresses[host] = address
+    local_names = local_host_names()
+
+    t0 = time.perf_counter()
+    pool = HttpPool(args.timeout)
+    reports: list[dict] = []
+    jobs: list[tuple[dict, str, object]] = []
+    for path in paths:
+        report = {"bundle": path.as_posix(), "host": "", "role": "", "ok": True, "checks": []}
+        reports.append(report)
+        try:
+            bundle = load_bundle(path)
+            report["host"], report["role"] = bundle["host"], bundle["role"]
+            report["consul"] = verify_base(bundle, addresses, local_names)
+            jobs += [(report, name, check) for name, check in verify_checks(bundle, path, pool, args.timeout, report["consul"])]
+        except SystemExit:
+            # die() already printed the reason.
+            report["ok"] = False
+            report["checks"].append({"name": "load", "ok": False, "ms": 0.0, "detail": "bundle rejected (see ERROR above)"})
+    # Checks of all bundles share one pool of workers and one set of keep-alive connections.
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as ex:
+        results = list(ex.map(lambda job: run_check(job[2]), jobs))
+    pool.close()
+    for (report, name, _), (detail, extra, ms) in zip(jobs, results):
+        report["checks"].append({"name": name, "ok": not detail, "ms": ms, "detail": detail, **extra})
+        report["ok"] = report["ok"] and not detail
+
+    failed = sum(1 for r in reports if not r["ok"])
+    summary = {
+        "ok": not failed,
+        "bundles": len(reports),
+        "failed": failed,
+        "checks": len(jobs),
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 3),
+        "results": reports,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for r in reports:
+            for c in r["checks"]:
+                status = "OK" if c["ok"] else "FAIL"
+                detail = f": {c['detail']}" if c["detail"] else ""
+                print(f"{status}: {r['host'] or r['bundle']}/{r['role']} {c['name']} ({c['ms']:.1f}ms){detail}")
+        print(f"{len(reports) - failed}/{len(reports)} bundles verified, {len(jobs)} checks in {summary['elapsed_ms']:.0f}ms")
+    return 1 if failed else 0
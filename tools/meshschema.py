@@ -0,0 +1,351 @@
+# Declared schemas for the inventory service catalog and bundle version 1, shared by
+# tools/render-mesh-bundles.py and tools/meshctl.py.
+#
+# A schema is a tree of plain dicts built by string()/integer()/list_of()/map_of()/obj()/any_of(). Each node
+# also carries "ok", a closure compiled once from its children's closures when the tree is built, that only
+# answers valid/invalid. validate() runs it first and walks the tree with report() only when it fails, to
+# report every error with its path.
+import re
+
+NAME = r"[a-z0-9][a-z0-9-]*"
+HOST = r"[A-Za-z0-9][A-Za-z0-9.-]*"
+FILE_NAME = r"[A-Za-z0-9][A-Za-z0-9._-]*"
+ENV_NAME = r"[A-Z_][A-Z0-9_]*"
+DURATION = r"([0-9]+(\.[0-9]+)?(ns|us|µs|ms|s|m|h))+"
+HEX64 = r"[0-9a-f]{64}"
+BUNDLE_VERSION = 1
+
+
+def anything() -> dict:
+    return {"kind": "any", "ok": lambda value: True}
+
+
+def string(pattern: str | None = None, *, choices: tuple[str, ...] | None = None) -> dict:
+    match = re.compile(pattern).fullmatch if pattern else None
+    if choices is not None:
+        allowed = frozenset(choices)
+
+        def ok(value) -> bool:
+            return type(value) is str and value in allowed and (match is None or match(value) is not None)
+
+    elif match is not None:
+
+        def ok(value) -> bool:
+            return type(value) is str and match(value) is not None
+
+    else:
+
+        def ok(value) -> bool:
+            return type(value) is str
+
+    return {"kind": "str", "pattern": pattern, "match": match, "choices": choices, "ok": ok}
+
+
+def integer(lo: int | None = None, hi: int | None = None, *, digits: bool = False) -> dict:
+    # digits: also accept a string of digits (inventory values that went through Jinja/ansible).
+    def ok(value) -> bool:
+        if type(value) is not int:
+            if not (digits and type(value) is str and value.isdigit()):
+                return False
+            value = int(value)
+        return (lo is None or value >= lo) and (hi is None or value <= hi)
+
+    return {"kind": "int", "lo": lo, "hi": hi, "digits": digits, "ok": ok}
+
+
+def any_of(*schemas: dict, what: str) -> dict:
+    checks = tuple(s["ok"] for s in schemas)
+
+    def ok(value) -> bool:
+        for check in checks:
+            if check(value):
+                return True
+        return False
+
+    return {"kind": "any_of", "schemas": schemas, "what": what, "ok": ok}
+
+
+def list_of(item: dict) -> dict:
+    item_ok = item["ok"]
+    return {"kind": "list", "item": item, "ok": lambda value: type(value) is list and all(map(item_ok, value))}
+
+
+def map_of(value: dict, key: dict | None = None) -> dict:
+    key = key or anything()
+    key_ok, value_ok = key["ok"], value["ok"]
+    if key["kind"] == "any":
+
+        def ok(v) -> bool:
+            return type(v) is dict and all(map(value_ok, v.values()))
+
+    else:
+
+        def ok(v) -> bool:
+            return type(v) is dict and all(map(key_ok, v)) and all(map(value_ok, v.values()))
+
+    return {"kind": "map", "value": value, "key": key, "ok": ok}
+
+
+def obj(
+    required: dict[str, dict],
+    optional: dict[str, dict] | None = None,
+    *,
+    extra: bool = False,
+    exactly_one: tuple[tuple[str, ...], ...] = (),
+) -> dict:
+    # Optional keys may be null (the renderer treats null as unset); unknown keys are errors unless extra.
+    optional = optional or {}
+    required_ok = {k: s["ok"] for k, s in required.items()}
+    optional_ok = {k: s["ok"] for k, s in optional.items() if k not in required}
+
+    def ok(value) -> bool:
+        if type(value) is not dict:
+            return False
+        for k in required_ok:
+            if k not in value:
+                return False
+        for k, v in value.items():
+            check = required_ok.get(k)
+            if check is None:
+                check = optional_ok.get(k)
+                if check is None:
+                    if not extra:
+                        return False
+                    continue
+                if v is None:
+                    continue
+            if not check(v):
+                return False
+        for group in exactly_one:
+            if sum(1 for k in group if value.get(k) is not None) != 1:
+                return False
+        return True
+
+    return {"kind": "obj", "required": required, "optional": optional, "extra": extra, "exactly_one": exactly_one, "ok": ok}
+
+
+def report(node: dict, value, path: str, errors: list[str]) -> None:
+    kind = node["kind"]
+    if kind == "str":
+        if type(value) is not str:
+            errors.append(f"{path}: expected a string, got {type(value).__name__}")
+        elif node["choices"] is not None and value not in node["choices"]:
+            errors.append(f"{path}: must be one of {', '.join(node['choices'])}, got {value!r}")
+        elif node["match"] is not None and node["match"](value) is None:
+            errors.append(f"{path}: {value!r} does not match {node['pattern']}")
+    elif kind == "int":
+        n = value if type(value) is int else int(value) if node["digits"] and type(value) is str and value.isdigit() else None
+        lo, hi = node["lo"], node["hi"]
+        if n is None:
+            errors.append(f"{path}: expected an integer, got {value!r}")
+        elif (lo is not None and n < lo) or (hi is not None and n > hi):
+            errors.append(f"{path}: {n} is out of range {'' if lo is None else lo}..{'' if hi is None else hi}")
+    elif kind == "any_of":
+        for s in node["schemas"]:
+            probe: list[str] = []
+            report(s, value, path, probe)
+            if not probe:
+                return
+        errors.append(f"{path}: expected {node['what']}, got {value!r}")
+    elif kind == "list":
+        if type(value) is not list:
+            errors.append(f"{path}: expected a list, got {type(value).__name__}")
+            return
+        for i, v in enumerate(value):
+            report(node["item"], v, f"{path}[{i}]", errors)
+    elif kind == "map":
+        if type(value) is not dict:
+            errors.append(f"{path}: expected a mapping, got {type(value).__name__}")
+            return
+        for k, v in value.items():
+            report(node["key"], k, f"{path} key {k!r}", errors)
+            report(node["value"], v, f"{path}.{k}", errors)
+    elif kind == "obj":
+        if type(value) is not dict:
+            errors.append(f"{path}: expected a mapping, got {type(value).__name__}")
+            return
+        fields = {**node["required"], **node["optional"]}
+        for k in node["required"]:
+            if k not in value:
+                errors.append(f"{path}: missing {k}")
+        for k, v in value.items():
+            if k not in fields:
+                if not node["extra"]:
+                    errors.append(f"{path}: unknown key {k!r}")
+            elif v is not None or k in node["required"]:
+                report(fields[k], v, f"{path}.{k}", errors)
+        for group in node["exactly_one"]:
+            if sum(1 for k in group if value.get(k) is not None) != 1:
+                errors.append(f"{path}: set exactly one of {', '.join(group)}")
+
+
+def validate(schema: dict, value, path: str) -> list[str]:
+    if schema["ok"](value):
+        return []
+    errors: list[str] = []
+    report(schema, value, path, errors)
+    return errors
+
+
+PORT = integer(1, 65535, digits=True)
+PORT_OR_AUTO = any_of(PORT, string(choices=("auto",)), what='a port (1-65535) or "auto"')
+
+UPSTREAM = obj(
+    {"destination_name": string(NAME)},
+    {
+        "local_bind_port": PORT_OR_AUTO,
+        "local_bind_address": string(),
+        "local_bind_socket_path": string(),
+        "local_bind_socket_mode": string(r"0?[0-7]{3}"),
+    },
+    exactly_one=(("local_bind_port", "local_bind_socket_path"),),
+)
+PERMISSION = obj(
+    {"sources": list_of(string(NAME))},
+    {
+        "action": string(choices=("allow", "deny")),
+        "path_exact": string(r"/.*"),
+        "path_prefix": string(r"/.*"),
+        "path_regex": string(),
+        "methods": list_of(string(r"[A-Za-z]+")),
+    },
+)
+CHECK = obj(
+    {},
+    {
+        "type": string(choices=("http", "tcp")),
+        "path": string(r"/.*"),
+        "interval": string(DURATION),
+        "timeout": string(DURATION),
+        "failures_before_critical": integer(0, digits=True),
+        "success_before_passing": integer(0, digits=True),
+    },
+)
+SERVICE = obj(
+    {"name": string(NAME), "port": PORT},
+    {
+        "protocol": string(choices=("http", "tcp", "grpc", "http2")),
+        "tags": list_of(string()),
+        "meta": map_of(string()),
+        "check": CHECK,
+        "sidecar_port": PORT_OR_AUTO,
+        "upstreams": list_of(UPSTREAM),
+        "permissions": list_of(PERMISSION),
+        "namespace": string(NAME),
+        "envoy_profile": string(),
+    },
+)
+SERVICE_CATALOG = list_of(SERVICE)
+
+
+def catalog_errors(catalog) -> list[str]:
+    # Schema errors plus cross-references (duplicate names, unknown upstream destinations), all in one pass.
+    errors = validate(SERVICE_CATALOG, catalog, "service_catalog")
+    if not errors:
+        names = {s["name"] for s in catalog}
+        if len(names) == len(catalog) and all(u["destination_name"] in names for s in catalog for u in s.get("upstreams") or ()):
+            return []
+    elif type(catalog) is not list:
+        return errors
+    seen: dict[str, int] = {}
+    for i, s in enumerate(catalog):
+        if isinstance(s, dict) and isinstance(s.get("name"), str):
+            if s["name"] in seen:
+                errors.append(f"service_catalog[{i}]: duplicate service {s['name']} (also service_catalog[{seen[s['name']]}])")
+            seen.setdefault(s["name"], i)
+    for i, s in enumerate(catalog):
+        upstreams = s.get("upstreams") if isinstance(s, dict) else None
+        for j, u in enumerate(upstreams if isinstance(upstreams, list) else []):
+            dest = u.get("destination_name") if isinstance(u, dict) else None
+            if isinstance(dest, str) and dest not in seen:
+                errors.append(f"service_catalog[{i}].upstreams[{j}]: unknown destination {dest}")
+    return errors
+
+
+# all:vars.datacenters: lower priority = preferred (the lowest is the primary DC); latency_ms is the
+# round-trip time to other DCs (declared on either side).
+DATACENTERS = map_of(obj({"priority": integer(0)}, {"latency_ms": map_of(integer(0), key=string(NAME))}), key=string(NAME))
+
+
+INDEX = obj(
+    {
+        "version": integer(1),
+        "files_sha256": string(HEX64),
+        "pod": string(NAME),
+        "containers": map_of(string(NAME)),
+        "consul_config": string(FILE_NAME),
+        "volumes": list_of(string(NAME)),
+    },
+    {
+        "gateways": list_of(
+            obj(
+                {
+                    "container": string(NAME),
+                    "bootstrap_volume": string(NAME),
+                    "proxy_id": string(NAME),
+                    "port": PORT,
+                    "admin_port": PORT,
+                }
+            )
+        ),
+        "config_entries": list_of(string(FILE_NAME)),
+        "prepared_queries": list_of(string(FILE_NAME)),
+        "services": list_of(obj({"name": string(NAME), "id": string(NAME), "template": string(FILE_NAME)})),
+        "sidecars": list_of(
+            obj(
+                {
+                    "name": string(NAME),
+                    "service_id": string(NAME),
+                    "sidecar_port": PORT,
+                    "admin_port": PORT,
+                    "upstream_ports": list_of(PORT),
+                    "upstream_sockets": list_of(string()),
+                    "container": string(NAME),
+                    "bootstrap_volume": string(NAME),
+                }
+            )
+        ),
+        "dns": obj({"container": string(NAME), "port": PORT, "corefile": string(FILE_NAME)}),
+    },
+)
+FILES = map_of(map_of(string(), key=string(FILE_NAME)), key=string(r"[a-z_]+"))
+# Normalized by the renderer (every key present); app_cpus may be empty.
+PLACEMENT = obj(
+    {},
+    {
+        "numa_node": any_of(integer(0), string(choices=("auto",)), what='a NUMA node number or "auto"'),
+        "app_cpus": string(r"([0-9]+(-[0-9]+)?(,[0-9]+(-[0-9]+)?)*)?"),
+        "agent_cores": integer(1),
+        "sidecar_cores": integer(1),
+    },
+)
+
+
+def bundle_schema(files: dict) -> dict:
+    return obj(
+        {
+            "version": integer(BUNDLE_VERSION, BUNDLE_VERSION),
+            "host": string(HOST),
+            "dc": string(NAME),
+            "role": string(choices=("server", "app")),
+            "env": map_of(string(), key=string(ENV_NAME)),
+            "index": INDEX,
+        },
+        {
+            "host_ip": string(),
+            "images": map_of(string()),
+            "envoy_profiles": map_of(obj({}, extra=True)),
+            "placement": PLACEMENT,
+            "peering": list_of(obj({"peer": string(NAME), "role": string(choices=("acceptor", "dialer"))})),
+            "files": files,
+        },
+    )
+
+
+BUNDLE = bundle_schema(FILES)
+# Header only: zip bundles decode file sections lazily, so commands that do not need them skip them.
+BUNDLE_HEADER = bundle_schema(anything())
+
+
+def bundle_errors(bundle, *, files: bool = True) -> list[str]:
+    return validate(BUNDLE if files else BUNDLE_HEADER, bundle, "bundle")
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 import argparse
+import bisect
+import copy
+import hashlib
 import json
 import re
-import subprocess
 from pathlib import Path
 
+import meshbundle
+import meshschema
+
 
 PROXY_DEFAULTS_HCL = """Kind = "proxy-defaults"
 Name = "global"
@@ -14,8 +19,77 @@ MeshGateway = {
 }
 """
 
+ENVOY_PROFILE_KEYS = {
+    "concurrency",
+    "cpus",
+    "memory",
+    "max_heap_bytes",
+    "buffer_limit_bytes",
+    "stats_flush_interval",
+}
+
+# publish: podman -p (rootlessport), pasta: pasta port forwarding, host: host network namespace.
+NETWORK_MODES = ("publish", "pasta", "host")
+
+# How DCs are joined: wan (WAN gossip federation between all servers) or peering (cluster peering; each
+# pair of DCs shares one stream through the mesh gateways and only exported services cross it).
+FEDERATION_MODES = ("wan", "peering")
+
+DEFAULT_SOCKET_DIR = "/tmp/consul-mesh/sockets"
+
+GATEWAY_PORT_MODES = ("distinct", "reuseport")
+# Mesh gateway instance i listens on GATEWAY_PORT + i (distinct mode) or GATEWAY_PORT (reuseport), admin on GATEWAY_ADMIN_PORT + i.
+GATEWAY_PORT = 8443
+GATEWAY_ADMIN_PORT = 29100
+# Mirrors docker/consul/client.hcl; rendered agent configs start from this and add tuning on top.
+CONSUL_AGENT_BASE = {
+    "data_dir": "/consul/data",
+    "client_addr": "0.0.0.0",
+    "connect": {"enabled": True},
+    "ports": {"grpc": 8502},
+    "enable_central_service_config": True,
+}
+CONSUL_TUNING_KEYS = {
+    "raft_multiplier": ("performance", "raft_multiplier", int),
+    "http_max_conns_per_client": ("limits", "http_max_conns_per_client", int),
+    "rpc_max_conns_per_client": ("limits", "rpc_max_conns_per_client", int),
+    "rpc_rate": ("limits", "rpc_rate", float),
+    "rpc_max_burst": ("limits", "rpc_max_burst", int),
+    "dns_allow_stale": ("dns_config", "allow_stale", bool),
+    "dns_max_stale": ("dns_config", "max_stale", str),
+    "dns_node_ttl": ("dns_config", "node_ttl", str),
+    "dns_service_ttl": ("dns_config", "service_ttl", str),
+    "dns_use_cache": ("dns_config", "use_cache", bool),
+    "dns_cache_max_age": ("dns_config", "cache_max_age", str),
+    "use_streaming_backend": (None, "use_streaming_backend", bool),
+    "cache_entry_fetch_rate": ("cache", "entry_fetch_rate", float),
+    "cache_entry_fetch_max_burst": ("cache", "entry_fetch_max_burst", int),
+    "prometheus_retention_time": ("telemetry", "prometheus_retention_time", str),
+}
+# Ports the server pod always publishes (Consul RPC/Serf LAN/WAN, HTTP, gRPC, DNS); gateway ports come from fixed_ports().
+FIXED_PORTS = [
+    (8300, 8302, "consul serf/rpc"),
+    (8500, 8500, "consul http"),
+    (8502, 8502, "consul grpc"),
+    (8600, 8600, "consul dns"),
+]
+DEFAULT_PORT_RANGES = {"sidecar": [21000, 21999], "upstream": [18000, 19999]}
+
+PLACEMENT_KEYS = {"numa_node", "app_cpus", "agent_cores", "sidecar_cores"}
+DNS_CACHE_KEYS = {"enabled", "port", "image", "max_ttl", "min_ttl", "prefetch", "failover_services", "query_ttl"}
+DNS_CACHE_DEFAULTS = {
+    "port": 8653,
+    "image": "docker.io/coredns/coredns:1.11.1",
+    "max_ttl": 30,
+    "min_ttl": 5,
+    "prefetch": {"amount": 10, "duration": "1m", "percentage": 10},
+    "query_ttl": "5s",
+}
+
 
 def run_inventory(inventory_path: str) -> dict:
+    import subprocess
+
     proc = subprocess.run(
         ["ansible-inventory", "-i", inventory_path, "--list"],
         check=True,
@@ -31,6 +105,8 @@ def load_inventory(args) -> dict:
         return json.loads(Path(args.inventory_json).read_text(encoding="utf-8"))
     if not args.inventory:
         raise RuntimeError("Missing --inventory or --inventory-json")
+    import subprocess
+
     try:
         subprocess.run(
             ["ansible-inventory", "--version"],
@@ -64,8 +140,28 @@ def normalize_csv(value: str) -> list[str]:
     return parts
 
 
-def default_instance_role(dc: str) -> str:
-    return "primary" if dc == "dc1" else "secondary"
+def primary_dc(datacenters: dict[str, dict]) -> str:
+    return min(datacenters, key=lambda dc: (datacenters[dc]["priority"], dc))
+
+
+def failover_order(datacenters: dict[str, dict], dc: str) -> list[str]:
+    # Nearest first (latency_ms declared on either side), then priority; DCs without latency data go last.
+    def cost(other: str) -> tuple:
+        latency = (datacenters[dc].get("latency_ms") or {}).get(other)
+        if latency is None:
+            latency = (datacenters[other].get("latency_ms") or {}).get(dc)
+        return (latency is None, latency or 0, datacenters[other]["priority"], other)
+
+    return sorted((other for other in datacenters if other != dc), key=cost)
+
+
+def failover_targets(datacenters: dict[str, dict], dc: str, *, peering: bool) -> list[str]:
+    # Where dc's resolvers send traffic. Peered clusters each keep their own resolvers (nearest first);
+    # under WAN federation config entries replicate from the primary DC, so one resolver per service lists
+    # every DC in priority order and Consul skips the caller's own DC.
+    if peering:
+        return failover_order(datacenters, dc)
+    return [other for other in sorted(datacenters, key=lambda d: (datacenters[d]["priority"], d)) if other != dc]
 
 
 def ensure_dir(path: Path) -> None:
@@ -77,22 +173,217 @@ def write_json(path: Path, data: dict) -> None:
     path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
 
 
+def normalize_envoy_profile(name: str, profile: dict) -> dict:
+    if not isinstance(profile, dict):
+        raise SystemExit(f"envoy_resource_profiles.{name} must be a dict")
+    unknown = sorted(set(profile.keys()) - ENVOY_PROFILE_KEYS)
+    if unknown:
+        raise SystemExit(f"envoy_resource_profiles.{name}: unknown keys: {', '.join(unknown)}")
+    out: dict = {}
+    if profile.get("concurrency") is not None:
+        out["concurrency"] = int(profile["concurrency"])
+        if out["concurrency"] < 1:
+            raise SystemExit(f"envoy_resource_profiles.{name}.concurrency must be >= 1")
+    if profile.get("cpus") is not None:
+        if float(profile["cpus"]) <= 0:
+            raise SystemExit(f"envoy_resource_profiles.{name}.cpus must be > 0")
+        out["cpus"] = str(profile["cpus"])
+    if profile.get("memory") is not None:
+        if not re.match(r"^[0-9]+[bkmg]?$", str(profile["memory"]).lower()):
+            raise SystemExit(f"envoy_resource_profiles.{name}.memory must look like 256m/1g")
+        out["memory"] = str(profile["memory"]).lower()
+    for key in ("max_heap_bytes", "buffer_limit_bytes"):
+        if profile.get(key) is not None:
+            out[key] = int(profile[key])
+    if "buffer_limit_bytes" in out and "max_heap_bytes" not in out:
+        # Buffer tracking is enforced by the overload manager, which needs a heap monitor.
+        raise SystemExit(f"envoy_resource_profiles.{name}: buffer_limit_bytes requires max_heap_bytes")
+    if profile.get("stats_flush_interval") is not None:
+        out["stats_flush_interval"] = str(profile["stats_flush_interval"])
+    return out
+
+
+def consul_tuning(setting: str, tuning: dict, dc: str) -> dict:
+    if not isinstance(tuning, dict):
+        raise SystemExit(f"{setting} must be a dict keyed by DC (or '*')")
+    merged: dict = {}
+    for key in ("*", dc):
+        values = tuning.get(key) or {}
+        if not isinstance(values, dict):
+            raise SystemExit(f"{setting}.{key} must be a dict")
+        unknown = sorted(set(values.keys()) - CONSUL_TUNING_KEYS.keys())
+        if unknown:
+            raise SystemExit(f"{setting}.{key}: unknown keys: {', '.join(unknown)}")
+        merged.update(values)
+    if merged.get("raft_multiplier") is not None and not 1 <= int(merged["raft_multiplier"]) <= 10:
+        raise SystemExit(f"{setting}: raft_multiplier must be between 1 and 10")
+    return merged
+
+
+def consul_agent_hcl(tuning: dict) -> str:
+    config: dict = {k: (dict(v) if isinstance(v, dict) else v) for k, v in CONSUL_AGENT_BASE.items()}
+    for key, value in tuning.items():
+        if value is None:
+            continue
+        block, name, cast = CONSUL_TUNING_KEYS[key]
+        if cast is bool:
+            value = str(value).lower() in ("1", "true", "yes")
+        elif key == "dns_service_ttl":
+            # A plain TTL applies to every service.
+            value = {f'"{k}"': str(v) for k, v in value.items()} if isinstance(value, dict) else {'"*"': str(value)}
+        else:
+            value = cast(value)
+        if block is None:
+            config[name] = value
+        else:
+            config.setdefault(block, {})[name] = value
+    return hcl_body(config)
+
+
+def resolve_envoy_profiles(profiles: dict, wanted: dict[str, str | None], *, host: str, host_cpus) -> dict[str, dict]:
+    resolved: dict[str, dict] = {}
+    for owner, profile_name in wanted.items():
+        if not profile_name:
+            continue
+        if profile_name not in profiles:
+            raise SystemExit(f"{host}: unknown envoy profile for {owner}: {profile_name}")
+        resolved[owner] = normalize_envoy_profile(profile_name, profiles[profile_name])
+
+    if host_cpus is not None:
+        cores = int(host_cpus)
+        total_cpus = 0.0
+        for owner, profile in resolved.items():
+            if profile.get("concurrency", 0) > cores:
+                raise SystemExit(f"{host}: {owner} concurrency={profile['concurrency']} exceeds host_cpus={cores}")
+            total_cpus += float(profile.get("cpus", 0))
+        if total_cpus > cores:
+            raise SystemExit(f"{host}: sidecar cpus add up to {total_cpus:g}, more than host_cpus={cores}")
+    return resolved
+
+
+def normalize_dns_cache(host: str, cfg: dict) -> dict | None:
+    if not isinstance(cfg, dict):
+        raise SystemExit(f"{host}: dns_cache must be a dict")
+    unknown = sorted(set(cfg.keys()) - DNS_CACHE_KEYS)
+    if unknown:
+        raise SystemExit(f"{host}: dns_cache: unknown keys: {', '.join(unknown)}")
+    if str(cfg.get("enabled", False)).lower() not in ("1", "true", "yes"):
+        return None
+    out = {**DNS_CACHE_DEFAULTS, **{k: v for k, v in cfg.items() if k != "enabled" and v is not None}}
+    out["port"] = int(out["port"])
+    out["max_ttl"] = int(out["max_ttl"])
+    out["min_ttl"] = int(out["min_ttl"])
+    if out["min_ttl"] > out["max_ttl"]:
+        raise SystemExit(f"{host}: dns_cache.min_ttl must be <= max_ttl")
+    out["prefetch"] = {**DNS_CACHE_DEFAULTS["prefetch"], **(out.get("prefetch") or {})}
+    out["failover_services"] = sorted(out.get("failover_services") or [])
+    return out
+
+
+def host_dns_cache(host: str, hv: dict, defaults: dict) -> dict | None:
+    # Failover services are fleet-wide (all.vars only); hosts may override the rest.
+    host_dns = {k: v for k, v in (get_var(hv, "dns_cache") or {}).items() if k != "failover_services"}
+    return normalize_dns_cache(host, {**defaults, **host_dns})
+
+
+def dns_corefile(cfg: dict, bind: str) -> str:
+    # Failover services are answered from their prepared query (<svc>.query.consul), which
+    # fails over to the other DCs when the local DC has no passing instances.
+    rewrites = "".join(
+        f"    rewrite stop {{\n"
+        f"        name exact {svc}.service.consul. {svc}.query.consul.\n"
+        f"        answer name {svc}.query.consul. {svc}.service.consul.\n"
+        f"    }}\n"
+        for svc in cfg["failover_services"]
+    )
+    prefetch = cfg["prefetch"]
+    return (
+        f"consul:{cfg['port']} {{\n"
+        f"    bind {bind}\n"
+        f"{rewrites}"
+        f"    cache {cfg['max_ttl']} {{\n"
+        f"        success 9984 {cfg['max_ttl']} {cfg['min_ttl']}\n"
+        f"        denial 9984 {cfg['min_ttl']} {cfg['min_ttl']}\n"
+        f"        prefetch {prefetch['amount']} {prefetch['duration']} {prefetch['percentage']}%\n"
+        f"    }}\n"
+        f"    forward . 127.0.0.1:8600\n"
+        f"    errors\n"
+        f"}}\n"
+    )
+
+
+def prepared_query(service: str, failover_dcs: list[str], ttl: str, *, peering: bool = False) -> str:
+    failover = {"Targets": [{"Peer": dc} for dc in failover_dcs]} if peering else {"Datacenters": failover_dcs}
+    query = {
+        "Name": service,
+        "Service": {"Service": service, "OnlyPassing": True, "Failover": failover},
+        "DNS": {"TTL": ttl},
+    }
+    return json.dumps(query, indent=2) + "\n"
+
+
+def normalize_placement(host: str, placement) -> dict:
+    if not isinstance(placement, dict):
+        raise SystemExit(f"{host}: placement must be a dict")
+    unknown = sorted(set(placement.keys()) - PLACEMENT_KEYS)
+    if unknown:
+        raise SystemExit(f"{host}: placement has unknown keys: {', '.join(unknown)}")
+    out: dict = {}
+    numa_node = placement.get("numa_node", "auto")
+    if str(numa_node) != "auto":
+        numa_node = int(numa_node)
+    out["numa_node"] = numa_node
+    app_cpus = str(placement.get("app_cpus", "") or "")
+    if app_cpus and not re.match(r"^[0-9]+(-[0-9]+)?(,[0-9]+(-[0-9]+)?)*$", app_cpus):
+        raise SystemExit(f"{host}: placement.app_cpus must be a cpulist like 0-7,16-23")
+    out["app_cpus"] = app_cpus
+    for key in ("agent_cores", "sidecar_cores"):
+        out[key] = int(placement.get(key, 1))
+        if out[key] < 1:
+            raise SystemExit(f"{host}: placement.{key} must be >= 1")
+    return out
+
+
+def socket_path(owner: str, path: str, socket_dir: str) -> str:
+    if "/" not in path:
+        path = f"{socket_dir.rstrip('/')}/{path}"
+    if not path.startswith(socket_dir.rstrip("/") + "/"):
+        # Only the socket dir is shared between the host apps and the Envoy containers.
+        raise SystemExit(f"{owner}: local_bind_socket_path must live under mesh_socket_dir ({socket_dir}): {path}")
+    return path
+
+
+def upstream_json(u: dict, *, owner: str, socket_dir: str, upstream_bind_address: str) -> dict:
+    if u.get("local_bind_socket_path"):
+        mode = str(u.get("local_bind_socket_mode", "0660"))
+        if not re.match(r"^0?[0-7]{3}$", mode):
+            raise SystemExit(f"{owner}: invalid local_bind_socket_mode for {u['destination_name']}: {mode}")
+        return {
+            "destination_name": u["destination_name"],
+            "local_bind_socket_path": socket_path(owner, str(u["local_bind_socket_path"]), socket_dir),
+            "local_bind_socket_mode": mode,
+        }
+    return {
+        "destination_name": u["destination_name"],
+        "local_bind_address": u.get("local_bind_address", upstream_bind_address),
+        "local_bind_port": int(u["local_bind_port"]),
+    }
+
+
 def service_template_json(
     *,
     dc: str,
     host_ip_placeholder: str,
     instance_role: str,
     service: dict,
+    upstream_bind_address: str = "0.0.0.0",
+    socket_dir: str = DEFAULT_SOCKET_DIR,
 ) -> str:
     name = service["name"]
     port = int(service["port"])
     protocol = service.get("protocol", "http")
     tags = service.get("tags", []) or []
     meta = service.get("meta", {}) or {}
-    if not isinstance(tags, list):
-        raise ValueError(f"service.tags must be a list for {name}")
-    if not isinstance(meta, dict):
-        raise ValueError(f"service.meta must be a dict for {name}")
 
     check = service.get("check", {})
     check_type = check.get("type", "http" if protocol in ("http", "grpc", "http2") else "tcp")
@@ -134,14 +425,7 @@ def service_template_json(
         upstreams = service.get("upstreams", [])
         if upstreams:
             connect["sidecar_service"]["proxy"] = {
-                "upstreams": [
-                    {
-                        "destination_name": u["destination_name"],
-                        "local_bind_address": u.get("local_bind_address", "0.0.0.0"),
-                        "local_bind_port": int(u["local_bind_port"]),
-                    }
-                    for u in upstreams
-                ]
+                "upstreams": [upstream_json(u, owner=name, socket_dir=socket_dir, upstream_bind_address=upstream_bind_address) for u in upstreams]
             }
         svc["service"]["connect"] = connect
 
@@ -154,16 +438,120 @@ def hcl_service_defaults(name: str, protocol: str) -> str:
     return f'Kind = "service-defaults"\nName = "{name}"\nProtocol = "{protocol}"\n'
 
 
-def hcl_intentions(dest: str, sources: list[str]) -> str:
-    sources_hcl = ",\n".join([f'  {{\n    Name   = "{s}"\n    Action = "allow"\n  }}' for s in sources])
-    return f'Kind = "service-intentions"\nName = "{dest}"\nSources = [\n{sources_hcl}\n]\n'
+def hcl_value(value, indent: int) -> str:
+    pad = "  " * indent
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, list):
+        if all(not isinstance(v, (dict, list)) for v in value):
+            return "[" + ", ".join(hcl_value(v, indent) for v in value) + "]"
+        items = ",\n".join(f"{pad}  {hcl_value(v, indent + 1)}" for v in value)
+        return f"[\n{items}\n{pad}]"
+    if isinstance(value, dict):
+        return "{\n" + hcl_body(value, indent + 1) + f"{pad}}}"
+    raise ValueError(f"Unsupported HCL value: {value!r}")
+
+
+def hcl_body(data: dict, indent: int = 0) -> str:
+    pad = "  " * indent
+    return "".join(f"{pad}{key} = {hcl_value(value, indent)}\n" for key, value in data.items())
+
+
+def hcl_intentions(dest: str, sources: list[dict]) -> str:
+    return f'Kind = "service-intentions"\nName = "{dest}"\n' + hcl_body({"Sources": sources})
+
+
+def http_permission(rule: dict, *, dest: str) -> dict:
+    http: dict = {}
+    for key, hcl_key in (("path_exact", "PathExact"), ("path_prefix", "PathPrefix"), ("path_regex", "PathRegex")):
+        if rule.get(key):
+            http[hcl_key] = str(rule[key])
+    if len(http) > 1:
+        raise SystemExit(f"{dest}: a permission may set only one of path_exact/path_prefix/path_regex")
+    if rule.get("methods"):
+        http["Methods"] = [str(m).upper() for m in rule["methods"]]
+    if not http:
+        raise SystemExit(f"{dest}: permission needs a path_* or methods")
+    return {"Action": str(rule.get("action", "allow")), "HTTP": http}
+
+
+def build_intention_sources(dest: str, callers: set[str], services_by_name: dict[str, dict], *, allow_wildcard: bool) -> list[dict]:
+    svc = services_by_name.get(dest, {})
+    permissions: dict[str, list[dict]] = {}
+    for rule in svc.get("permissions") or []:
+        if svc.get("protocol", "http") != "http":
+            raise SystemExit(f"{dest}: L7 permissions need protocol http")
+        for caller in rule.get("sources") or []:
+            if caller not in callers:
+                raise SystemExit(f"{dest}: permission source {caller} has no upstream to {dest}")
+            permissions.setdefault(caller, []).append(http_permission(rule, dest=dest))
+
+    sources: list[dict] = []
+    plain = sorted(callers - set(permissions))
+    others = set(services_by_name) - {dest}
+    if allow_wildcard and plain and set(plain) == others:
+        # Every other service may call dest: one wildcard rule instead of one per caller.
+        sources.append({"Name": "*", "Action": "allow"})
+        plain = []
 
+    # Collapse a whole (Enterprise) namespace into one rule when every service in it is a caller.
+    by_namespace: dict[str, set[str]] = {}
+    for name in others:
+        ns = services_by_name[name].get("namespace")
+        if ns:
+            by_namespace.setdefault(ns, set()).add(name)
+    for ns, members in sorted(by_namespace.items()):
+        if allow_wildcard and len(members) > 1 and members <= set(plain):
+            sources.append({"Name": "*", "Namespace": ns, "Action": "allow"})
+            plain = [c for c in plain if c not in members]
 
-def hcl_resolver_dc1(name: str) -> str:
-    return f'Kind = "service-resolver"\nName = "{name}"\n\nFailover = {{\n  "*" = {{\n    Datacenters = ["dc2"]\n  }}\n}}\n'
+    for caller in plain:
+        source = {"Name": caller, "Action": "allow"}
+        if services_by_name[caller].get("namespace"):
+            source["Namespace"] = services_by_name[caller]["namespace"]
+        sources.append(source)
+    for caller, rules in sorted(permissions.items()):
+        source = {"Name": caller, "Permissions": rules}
+        if services_by_name[caller].get("namespace"):
+            source["Namespace"] = services_by_name[caller]["namespace"]
+        sources.append(source)
+    return sources
 
 
-def hcl_resolver_dc2_prefer_dc1(name: str) -> str:
+def peer_sources(sources: list[dict], peers: list[str]) -> list[dict]:
+    # Cluster peering: a caller failing over from a peer arrives as that peer's service, so every local
+    # rule is repeated once per peer.
+    return sources + [{"Name": s["Name"], "Peer": peer, **{k: v for k, v in s.items() if k != "Name"}} for peer in peers for s in sources]
+
+
+def rbac_rule_count(sources: list[dict]) -> int:
+    return sum(len(s.get("Permissions") or []) or 1 for s in sources)
+
+
+def hcl_resolver(name: str, failover_dcs: list[str], *, peering: bool = False) -> str:
+    if peering:
+        # Peers are named after their DC.
+        failover = {'"*"': {"Targets": [{"Peer": dc} for dc in failover_dcs]}}
+        return f'Kind = "service-resolver"\nName = "{name}"\n\n' + hcl_body({"Failover": failover})
+    dcs = ", ".join(f'"{dc}"' for dc in failover_dcs)
+    return f'Kind = "service-resolver"\nName = "{name}"\n\nFailover = {{\n  "*" = {{\n    Datacenters = [{dcs}]\n  }}\n}}\n'
+
+
+def hcl_resolver_prefer_primary(name: str, primary: str, secondary_dcs: list[str], *, peering: bool = False) -> str:
+    # Primary instances in the primary DC first, then secondary instances. With peering, secondary_dcs[0] is
+    # the local DC and the rest are peers.
+    targets = "".join(
+        f"""      {{
+        {"Peer" if peering and dc != secondary_dcs[0] else "Datacenter":<13} = "{dc}"
+        ServiceSubset = "{subset}"
+      }},
+"""
+        for dc, subset in [(primary, "primary"), *((dc, "secondary") for dc in secondary_dcs)]
+    ).rstrip(",\n")
     return f"""Kind = "service-resolver"
 Name = "{name}"
 
@@ -181,20 +569,453 @@ Subsets = {{
 Failover = {{
   "primary" = {{
     Targets = [
-      {{
-        Datacenter    = "dc1"
-        ServiceSubset = "primary"
-      }},
-      {{
-        Datacenter    = "dc2"
-        ServiceSubset = "secondary"
-      }}
+{targets}
     ]
   }}
 }}
 """
 
 
+MESH_PEERING_HCL = """Kind = "mesh"
+
+Peering {
+  PeerThroughMeshGateways = true
+}
+"""
+
+
+def hcl_exported_services(services: list[str], peers: list[str]) -> str:
+    exported = [{"Name": name, "Consumers": [{"Peer": peer} for peer in peers]} for name in services]
+    return 'Kind = "exported-services"\nName = "default"\n\n' + hcl_body({"Services": exported})
+
+
+def entries_for_dc(entries: dict[str, str], dc: str) -> dict[str, str]:
+    # up-server only applies its own DC's resolvers and exports (peering); don't ship the other DCs' copies.
+    # WAN-mode resolvers (<svc>-resolver.hcl) are global and go to every DC.
+    def wanted(name: str) -> bool:
+        if "-resolver-" in name:
+            return name.endswith(f"-resolver-{dc}.hcl")
+        if name.startswith("exported-services-"):
+            return name == f"exported-services-{dc}.hcl"
+        return True
+
+    return {name: content for name, content in entries.items() if wanted(name)}
+
+
+def store_entries(entries: dict[str, str], store_dir: Path) -> dict[str, str]:
+    refs: dict[str, str] = {}
+    for name, content in sorted(entries.items()):
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        path = store_dir / f"{digest}.hcl"
+        if not path.exists():
+            ensure_dir(store_dir)
+            path.write_text(content, encoding="utf-8")
+        refs[name] = digest
+    return refs
+
+
+def gateway_settings(host: str, hv: dict, all_vars: dict) -> tuple[int, str]:
+    instances = int(get_var(hv, "mesh_gateway_instances", get_var(all_vars, "mesh_gateway_instances", 1)))
+    port_mode = str(get_var(hv, "mesh_gateway_port_mode", get_var(all_vars, "mesh_gateway_port_mode", "distinct")))
+    if instances < 1 or instances > 16:
+        raise SystemExit(f"{host}: mesh_gateway_instances must be between 1 and 16")
+    if port_mode not in GATEWAY_PORT_MODES:
+        raise SystemExit(f"{host}: mesh_gateway_port_mode must be one of {', '.join(GATEWAY_PORT_MODES)}")
+    return instances, port_mode
+
+
+def fixed_ports(instances: int, port_mode: str) -> list[tuple[int, int, str]]:
+    last = instances - 1
+    return [
+        *FIXED_PORTS,
+        (GATEWAY_PORT, GATEWAY_PORT if port_mode == "reuseport" else GATEWAY_PORT + last, "mesh-gateway"),
+        (GATEWAY_ADMIN_PORT, GATEWAY_ADMIN_PORT + last, "mesh-gateway admin"),
+    ]
+
+
+def mesh_gateways(dc: str, instances: int, port_mode: str) -> list[dict]:
+    gateways = []
+    for i in range(instances):
+        # Instance 0 keeps the single-gateway names so existing pods/volumes are reused.
+        suffix = "" if i == 0 else f"-{i}"
+        gateways.append(
+            {
+                "container": f"mesh-gateway-{dc}{suffix}",
+                "bootstrap_volume": f"mesh-gateway-bootstrap-{dc}{suffix}",
+                "proxy_id": f"mesh-gateway{suffix}",
+                "port": GATEWAY_PORT if port_mode == "reuseport" else GATEWAY_PORT + i,
+                "admin_port": GATEWAY_ADMIN_PORT + i,
+            }
+        )
+    return gateways
+
+
+def server_index(dc: str, files: dict, *, gateways: list[dict]) -> dict:
+    index = {
+        "version": meshbundle.INDEX_VERSION,
+        "files_sha256": meshbundle.files_digest(files),
+        "pod": f"mesh-server-{dc}",
+        "containers": {"consul": f"consul-server-{dc}"},
+        "consul_config": "server.hcl",
+        "gateways": gateways,
+        "volumes": [f"consul-server-data-{dc}", *(gw["bootstrap_volume"] for gw in gateways)],
+        "config_entries": sorted({*(files.get("config_entries") or {}), *(files.get("config_entry_refs") or {})}),
+    }
+    if files.get("prepared_queries"):
+        index["prepared_queries"] = sorted(files["prepared_queries"])
+    return index
+
+
+def app_index(dc: str, files: dict, *, admin_port_offset: int, dns_port: int | None = None) -> dict:
+    services = []
+    sidecars = []
+    volumes = [f"consul-agent-data-{dc}"]
+    for template_name, template in sorted((files.get("service_templates") or {}).items()):
+        svc = json.loads(template)["service"]
+        services.append({"name": svc["name"], "id": svc["id"], "template": template_name})
+        sidecar = (svc.get("connect") or {}).get("sidecar_service")
+        if not sidecar:
+            continue
+        upstreams = (sidecar.get("proxy") or {}).get("upstreams") or []
+        bootstrap_volume = f"{svc['name']}-envoy-bootstrap-{dc}"
+        volumes.append(bootstrap_volume)
+        sidecars.append(
+            {
+                "name": svc["name"],
+                "service_id": svc["id"],
+                "sidecar_port": int(sidecar["port"]),
+                "admin_port": int(sidecar["port"]) + admin_port_offset,
+                "upstream_ports": [int(u["local_bind_port"]) for u in upstreams if "local_bind_port" in u],
+                "upstream_sockets": [u["local_bind_socket_path"] for u in upstreams if "local_bind_socket_path" in u],
+                "container": f"{svc['name']}-envoy-{dc}",
+                "bootstrap_volume": bootstrap_volume,
+            }
+        )
+    index = {
+        "version": meshbundle.INDEX_VERSION,
+        "files_sha256": meshbundle.files_digest(files),
+        "pod": f"mesh-app-{dc}",
+        "containers": {"agent": f"consul-agent-{dc}"},
+        "consul_config": "agent.hcl",
+        "volumes": volumes,
+        "services": services,
+        "sidecars": sidecars,
+    }
+    if dns_port is not None:
+        index["dns"] = {"container": f"consul-dns-{dc}", "port": dns_port, "corefile": "Corefile"}
+    return index
+
+
+class PortIndex:
+    # Sorted, non-overlapping [lo, hi] intervals with owners; lookups are O(log n) via bisect.
+    def __init__(self, host: str):
+        self.host = host
+        self._starts: list[int] = []
+        self._spans: list[tuple[int, int, str]] = []
+
+    def conflict(self, lo: int, hi: int) -> tuple[int, int, str] | None:
+        i = bisect.bisect_right(self._starts, hi) - 1
+        if i >= 0 and self._spans[i][1] >= lo:
+            return self._spans[i]
+        return None
+
+    def add(self, lo: int, hi: int, owner: str) -> None:
+        hit = self.conflict(lo, hi)
+        if hit:
+            port = max(lo, hit[0])
+            raise SystemExit(f"{self.host}: port {port} is assigned to both {hit[2]} and {owner}")
+        i = bisect.bisect_left(self._starts, lo)
+        self._starts.insert(i, lo)
+        self._spans.insert(i, (lo, hi, owner))
+
+
+def host_services(host: str, hv: dict, all_vars: dict, services_by_name: dict[str, dict]) -> list[str]:
+    enabled_services = normalize_csv(get_var(hv, "enabled_services", get_var(all_vars, "enabled_services", "")))
+    enable_itch_consumer = str(get_var(hv, "enable_itch_consumer", get_var(all_vars, "enable_itch_consumer", "0")))
+    if not enabled_services:
+        enabled_services = list(services_by_name.keys())
+    names = []
+    for name in enabled_services:
+        if name == "itch-consumer" and enable_itch_consumer != "1":
+            continue
+        if name not in services_by_name:
+            raise SystemExit(f"{host}: enabled service not found in service_catalog: {name}")
+        names.append(name)
+    return names
+
+
+def allocate_ports(
+    all_vars: dict, hosts: dict[str, tuple[list[str], int, list[tuple[int, int, str]]]], services_by_name: dict[str, dict]
+) -> dict[str, dict]:
+    # hosts: host -> (services on the host, envoy admin port offset, reserved port ranges). Ports are fleet-wide
+    # per service, so an "auto" port is the lowest one that is free on every host running that service.
+    ranges = {**DEFAULT_PORT_RANGES, **(all_vars.get("port_ranges") or {})}
+    services = copy.deepcopy(services_by_name)
+    indexes: dict[str, PortIndex] = {}
+    for host, (_, _, reserved) in hosts.items():
+        indexes[host] = PortIndex(host)
+        for lo, hi, owner in reserved:
+            indexes[host].add(lo, hi, owner)
+
+    def is_auto(value) -> bool:
+        return str(value).lower() == "auto"
+
+    def reserve(host: str, port: int, owner: str) -> None:
+        indexes[host].add(port, port, owner)
+
+    def pin(name: str, host: str, offset: int) -> None:
+        svc = services[name]
+        reserve(host, int(svc["port"]), f"{name} (service port)")
+        sidecar = svc.get("sidecar_port")
+        if sidecar is not None and not is_auto(sidecar):
+            reserve(host, int(sidecar), f"{name} (sidecar_port)")
+            reserve(host, int(sidecar) + offset, f"{name} (envoy admin = sidecar_port + {offset})")
+        for u in svc.get("upstreams", []) or []:
+            if u.get("local_bind_socket_path") or is_auto(u.get("local_bind_port")):
+                continue
+            reserve(host, int(u["local_bind_port"]), f"{name} (upstream {u['destination_name']})")
+
+    def first_free(kind: str, on_hosts: list[tuple[str, int]], with_admin: bool) -> int:
+        lo, hi = (int(v) for v in ranges[kind])
+        for port in range(lo, hi + 1):
+            if all(
+                indexes[h].conflict(port, port) is None and (not with_admin or indexes[h].conflict(port + off, port + off) is None)
+                for h, off in on_hosts
+            ):
+                return port
+        raise SystemExit(f"port_ranges.{kind} {lo}-{hi} has no port free on {', '.join(h for h, _ in on_hosts)}")
+
+    for host, (names, offset, _) in hosts.items():
+        for name in names:
+            pin(name, host, offset)
+
+    for name, svc in services.items():
+        on_hosts = [(h, off) for h, (names, off, _) in hosts.items() if name in names]
+        if svc.get("sidecar_port") is not None and is_auto(svc["sidecar_port"]):
+            port = first_free("sidecar", on_hosts, with_admin=True)
+            svc["sidecar_port"] = port
+            for h, off in on_hosts:
+                reserve(h, port, f"{name} (sidecar_port)")
+                reserve(h, port + off, f"{name} (envoy admin = sidecar_port + {off})")
+        for u in svc.get("upstreams", []) or []:
+            if u.get("local_bind_socket_path") or not is_auto(u.get("local_bind_port")):
+                continue
+            port = first_free("upstream", on_hosts, with_admin=False)
+            u["local_bind_port"] = port
+            for h, _ in on_hosts:
+                reserve(h, port, f"{name} (upstream {u['destination_name']})")
+    return services
+
+
+def load_service_catalog(all_vars: dict) -> tuple[list[dict], dict[str, dict]]:
+    service_catalog = all_vars.get("service_catalog") or []
+    if not isinstance(service_catalog, list) or not service_catalog:
+        raise SystemExit("Inventory is missing all:vars.service_catalog (list of services).")
+
+    errors = meshschema.catalog_errors(service_catalog)
+    if errors:
+        raise SystemExit("Invalid service_catalog:\n  " + "\n  ".join(errors))
+    services_by_name = {s["name"]: s for s in service_catalog}
+    return service_catalog, services_by_name
+
+
+def prefer_primary_services(all_vars: dict) -> set[str]:
+    # dc2_prefer_dc1_services is the two-DC spelling of prefer_primary_services.
+    return set(all_vars.get("prefer_primary_services") or all_vars.get("dc2_prefer_dc1_services") or [])
+
+
+def load_datacenters(all_vars: dict, host_dcs: set[str]) -> dict[str, dict]:
+    declared = all_vars.get("datacenters")
+    if not declared:
+        # Two-DC inventories predate all:vars.datacenters: rank the hosts' DCs by name (dc1 is the primary).
+        return {dc: {"priority": i} for i, dc in enumerate(sorted(host_dcs))}
+
+    errors = meshschema.validate(meshschema.DATACENTERS, declared, "datacenters")
+    if not errors:
+        for dc, cfg in declared.items():
+            for other in sorted(cfg.get("latency_ms") or {}):
+                if other not in declared:
+                    errors.append(f"datacenters.{dc}.latency_ms: unknown datacenter {other}")
+        by_priority: dict[int, str] = {}
+        for dc, cfg in declared.items():
+            if cfg["priority"] in by_priority:
+                errors.append(f"datacenters.{dc}.priority: {cfg['priority']} is also used by {by_priority[cfg['priority']]}")
+            by_priority.setdefault(cfg["priority"], dc)
+        for dc in sorted(host_dcs - declared.keys()):
+            errors.append(f"datacenters: missing {dc} (used by hosts)")
+    if errors:
+        raise SystemExit("Invalid datacenters:\n  " + "\n  ".join(errors))
+    return declared
+
+
+def service_edges(services_by_name: dict[str, dict]) -> dict[str, list[str]]:
+    edges: dict[str, list[str]] = {name: [] for name in services_by_name}
+    for name, s in services_by_name.items():
+        for u in s.get("upstreams", []) or []:
+            dest = u["destination_name"]
+            edges.setdefault(dest, [])
+            if dest not in edges[name]:
+                edges[name].append(dest)
+    return edges
+
+
+def find_cycles(edges: dict[str, list[str]]) -> list[list[str]]:
+    # Tarjan's SCC; every SCC with more than one node (or a self-loop) is a cycle.
+    index: dict[str, int] = {}
+    low: dict[str, int] = {}
+    stack: list[str] = []
+    on_stack: set[str] = set()
+    cycles: list[list[str]] = []
+    counter = [0]
+
+    def visit(v: str) -> None:
+        index[v] = low[v] = counter[0]
+        counter[0] += 1
+        stack.append(v)
+        on_stack.add(v)
+        for w in edges[v]:
+            if w not in index:
+                visit(w)
+                low[v] = min(low[v], low[w])
+            elif w in on_stack:
+                low[v] = min(low[v], index[w])
+        if low[v] == index[v]:
+            scc = []
+            while True:
+                w = stack.pop()
+                on_stack.discard(w)
+                scc.append(w)
+                if w == v:
+                    break
+            if len(scc) > 1 or v in edges[v]:
+                cycles.append(sorted(scc))
+
+    for v in sorted(edges):
+        if v not in index:
+            visit(v)
+    return cycles
+
+
+def resolve_dc(
+    service: str, from_dc: str, *, failed: set[str], prefer_primary: set[str], datacenters: dict[str, dict], peering: bool
+) -> str:
+    # Mirrors the generated resolvers: the primary DC fails over to its first failover target; the other
+    # DCs stay local, except prefer-primary services, which go to the primary DC while it is healthy.
+    primary = primary_dc(datacenters)
+    if from_dc == primary:
+        return (failover_targets(datacenters, primary, peering=peering) or [primary])[0] if service in failed else primary
+    if service in prefer_primary and service not in failed:
+        return primary
+    return from_dc
+
+
+def call_chains(edges: dict[str, list[str]], entries: list[str], *, limit: int) -> list[list[str]]:
+    chains: list[list[str]] = []
+
+    def walk(path: list[str]) -> None:
+        if len(chains) >= limit:
+            return
+        nexts = [w for w in edges[path[-1]] if w not in path]
+        if not nexts:
+            chains.append(list(path))
+            return
+        for w in nexts:
+            walk(path + [w])
+
+    for entry in entries:
+        walk([entry])
+    return chains
+
+
+def chain_hops(
+    chain: list[str], origin_dc: str, *, failed: set[str], prefer_primary: set[str], datacenters: dict[str, dict], peering: bool = False
+) -> tuple[int, list[str]]:
+    kw = {"failed": failed, "prefer_primary": prefer_primary, "datacenters": datacenters, "peering": peering}
+    dcs = [resolve_dc(chain[0], origin_dc, **kw) if chain[0] in failed else origin_dc]
+    for svc in chain[1:]:
+        dcs.append(resolve_dc(svc, dcs[-1], **kw))
+    hops = sum(1 for a, b in zip([origin_dc, *dcs], dcs) if a != b)
+    return hops, dcs
+
+
+def render_graph(args, all_vars: dict, services_by_name: dict[str, dict], datacenters: dict[str, dict], *, peering: bool) -> int:
+    edges = service_edges(services_by_name)
+    fan_in: dict[str, int] = {name: 0 for name in edges}
+    for name, dests in edges.items():
+        for dest in dests:
+            fan_in[dest] += 1
+    cycles = find_cycles(edges)
+
+    depth_cache: dict[str, int] = {}
+
+    def depth(v: str, seen: frozenset) -> int:
+        if v in depth_cache:
+            return depth_cache[v]
+        d = 1 + max([depth(w, seen | {v}) for w in edges[v] if w not in seen | {v}] or [0])
+        if not cycles:
+            depth_cache[v] = d
+        return d
+
+    entries = sorted(name for name in edges if fan_in[name] == 0) or sorted(edges)
+    failed = set(args.failover or [])
+    unknown = sorted(failed - set(edges))
+    if unknown:
+        raise SystemExit(f"--failover: unknown services: {', '.join(unknown)}")
+    prefer_primary = prefer_primary_services(all_vars)
+    origin_dc = args.origin_dc or primary_dc(datacenters)
+    if origin_dc not in datacenters:
+        raise SystemExit(f"--origin-dc: unknown datacenter: {origin_dc}")
+
+    chains = []
+    for chain in call_chains(edges, entries, limit=args.max_chains):
+        hops, dcs = chain_hops(chain, origin_dc, failed=failed, prefer_primary=prefer_primary, datacenters=datacenters, peering=peering)
+        chains.append({"chain": chain, "dcs": dcs, "cross_dc_hops": hops})
+    chains.sort(key=lambda c: (-c["cross_dc_hops"], c["chain"]))
+
+    graph = {
+        "services": {
+            name: {"fan_out": len(edges[name]), "fan_in": fan_in[name], "depth": depth(name, frozenset())}
+            for name in sorted(edges)
+        },
+        "edges": [[src, dest] for src in sorted(edges) for dest in edges[src]],
+        "cycles": cycles,
+        "critical_path_depth": max([depth(e, frozenset()) for e in entries] or [0]),
+        "origin_dc": origin_dc,
+        "failover": sorted(failed),
+        "chains": chains,
+        "max_cross_dc_hops": max([c["cross_dc_hops"] for c in chains] or [0]),
+    }
+
+    if args.graph_format == "dot":
+        crossing = set()
+        for c in chains:
+            for (a, b), (da, db) in zip(zip(c["chain"], c["chain"][1:]), zip(c["dcs"], c["dcs"][1:])):
+                if da != db:
+                    crossing.add((a, b))
+        lines = ["digraph mesh {", "  rankdir=LR;"]
+        for name, info in graph["services"].items():
+            color = ', color="red"' if name in failed else ""
+            lines.append(f'  "{name}" [label="{name}\\nin={info["fan_in"]} out={info["fan_out"]}"{color}];')
+        for src, dest in graph["edges"]:
+            style = ' [color="red", label="WAN"]' if (src, dest) in crossing else ""
+            lines.append(f'  "{src}" -> "{dest}"{style};')
+        lines.append("}")
+        out = "\n".join(lines) + "\n"
+    else:
+        out = json.dumps(graph, indent=2) + "\n"
+
+    if args.graph_out:
+        ensure_dir(Path(args.graph_out).parent)
+        Path(args.graph_out).write_text(out, encoding="utf-8")
+    else:
+        print(out, end="")
+    if args.max_hops is not None and graph["max_cross_dc_hops"] > args.max_hops:
+        # chains are sorted by hop count, so the first one is the worst.
+        worst = chains[0]
+        raise SystemExit(f"{' -> '.join(worst['chain'])} crosses DCs {worst['cross_dc_hops']} times (--max-hops {args.max_hops})")
+    return 0
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(
         description=(
@@ -202,10 +1023,47 @@ def main() -> int:
             "Bundles are the single runtime input for starting/stopping the mesh with tools/meshctl.py."
         )
     )
+    ap.add_argument(
+        "mode",
+        nargs="?",
+        choices=("bundles", "graph"),
+        default="bundles",
+        help="bundles (default): write per-host bundles; graph: analyse the service dependency graph.",
+    )
     g = ap.add_mutually_exclusive_group(required=True)
     g.add_argument("--inventory", "-i", help="Path to YAML inventory (used with ansible-inventory).")
     g.add_argument("--inventory-json", help="Path to ansible-inventory JSON output.")
     ap.add_argument("--out-dir", "-o", default="run/mesh/bundles", help="Output directory (default: run/mesh/bundles).")
+    ap.add_argument(
+        "--intentions-report",
+        action="store_true",
+        help="Print callers and RBAC rule count per intention destination.",
+    )
+    ap.add_argument(
+        "--ports-report",
+        action="store_true",
+        help="Print the resolved service, sidecar and upstream ports (after auto allocation).",
+    )
+    ap.add_argument(
+        "--entry-store",
+        action="store_true",
+        help=(
+            "Write config entries once to <out-dir>/entries/<sha256>.hcl and reference them by hash from server bundles "
+            "(deploy the entries/ directory next to the bundles)."
+        ),
+    )
+    ap.add_argument(
+        "--format",
+        choices=("json", "zip"),
+        default="json",
+        help="Bundle container: json (<host>.bundle.json) or zip (<host>.bundle.zip, sections loaded lazily).",
+    )
+    ap.add_argument("--failover", action="append", help="graph: service whose primary instance has failed (repeatable).")
+    ap.add_argument("--origin-dc", help="graph: datacenter user requests enter (default: the primary DC).")
+    ap.add_argument("--graph-format", choices=("json", "dot"), default="json", help="graph: output format (default: json).")
+    ap.add_argument("--graph-out", help="graph: write output to this file instead of stdout.")
+    ap.add_argument("--max-chains", type=int, default=10000, help="graph: cap on enumerated call chains (default: 10000).")
+    ap.add_argument("--max-hops", type=int, help="graph: exit non-zero if a call chain crosses DCs more often than this.")
     args = ap.parse_args()
 
     inv = load_inventory(args)
@@ -216,18 +1074,14 @@ def main() -> int:
     consul_servers = set(inv.get("consul_servers", {}).get("hosts", []))
     app_hosts = set(inv.get("app_hosts", {}).get("hosts", []))
 
-    service_catalog = all_vars.get("service_catalog") or []
-    if not isinstance(service_catalog, list) or not service_catalog:
-        raise SystemExit("Inventory is missing all:vars.service_catalog (list of services).")
-
-    services_by_name: dict[str, dict] = {}
-    for s in service_catalog:
-        if not isinstance(s, dict) or "name" not in s or "port" not in s:
-            raise SystemExit("Invalid service_catalog entry (need at least name, port).")
-        name = s["name"]
-        if not re.match(r"^[a-z0-9][a-z0-9\\-]*$", name):
-            raise SystemExit(f"Invalid service name: {name}")
-        services_by_name[name] = s
+    service_catalog, services_by_name = load_service_catalog(all_vars)
+    datacenters = load_datacenters(all_vars, {str(get_var(hv, "dc")) for hv in hostvars.values() if get_var(hv, "dc")})
+    federation = str(all_vars.get("mesh_federation") or "wan")
+    if federation not in FEDERATION_MODES:
+        raise SystemExit(f"mesh_federation must be one of {', '.join(FEDERATION_MODES)}")
+    peering = federation == "peering"
+    if args.mode == "graph":
+        return render_graph(args, all_vars, services_by_name, datacenters, peering=peering)
 
     # Derive intentions from upstream relationships
     dest_sources: dict[str, set[str]] = {}
@@ -241,14 +1095,73 @@ def main() -> int:
     common_config_entries: dict[str, str] = {"proxy-defaults.hcl": PROXY_DEFAULTS_HCL}
     for name, s in services_by_name.items():
         common_config_entries[f"service-defaults-{name}.hcl"] = hcl_service_defaults(name, s.get("protocol", "http"))
-    for dest, sources in sorted(dest_sources.items()):
-        common_config_entries[f"intentions-{dest}.hcl"] = hcl_intentions(dest, sorted(sources))
-    for name in services_by_name.keys():
-        common_config_entries[f"{name}-resolver-dc1.hcl"] = hcl_resolver_dc1(name)
-    prefer_primary = set(all_vars.get("dc2_prefer_dc1_services") or [])
-    for name in prefer_primary:
-        if name in services_by_name:
-            common_config_entries[f"{name}-resolver-dc2.hcl"] = hcl_resolver_dc2_prefer_dc1(name)
+    allow_wildcard = bool(all_vars.get("intentions_allow_wildcard", False))
+    intentions_report: list[tuple[str, int, int]] = []
+    intention_sources: dict[str, list[dict]] = {}
+    for dest, callers in sorted(dest_sources.items()):
+        sources = build_intention_sources(dest, callers, services_by_name, allow_wildcard=allow_wildcard)
+        intention_sources[dest] = sources
+        if not peering:
+            common_config_entries[f"intentions-{dest}.hcl"] = hcl_intentions(dest, sources)
+        # With peering every DC peers with all the others, so each rule is repeated per peer.
+        intentions_report.append((dest, len(callers), rbac_rule_count(sources) * (len(datacenters) if peering else 1)))
+
+    primary = primary_dc(datacenters)
+    prefer_primary = prefer_primary_services(all_vars)
+    # Entries whose content differs per DC under the same name (peering intentions).
+    dc_config_entries: dict[str, dict[str, str]] = {dc: {} for dc in datacenters}
+    if peering:
+        # Each cluster has its own config entries: one resolver per service and DC, nearest DC first.
+        for dc in sorted(datacenters):
+            order = failover_order(datacenters, dc)
+            for dest, sources in intention_sources.items():
+                dc_config_entries[dc][f"intentions-{dest}.hcl"] = hcl_intentions(dest, peer_sources(sources, order))
+            for name in services_by_name.keys():
+                if dc != primary and name in prefer_primary:
+                    common_config_entries[f"{name}-resolver-{dc}.hcl"] = hcl_resolver_prefer_primary(
+                        name, primary, [dc, *(other for other in order if other != primary)], peering=True
+                    )
+                elif order:
+                    common_config_entries[f"{name}-resolver-{dc}.hcl"] = hcl_resolver(name, order, peering=True)
+            if order:
+                # Every service can be a failover target, so every DC exports all of them to all of its peers.
+                common_config_entries[f"exported-services-{dc}.hcl"] = hcl_exported_services(sorted(services_by_name), sorted(order))
+        common_config_entries["mesh.hcl"] = MESH_PEERING_HCL
+    elif len(datacenters) > 1:
+        # WAN federation replicates config entries from the primary DC, so there is one resolver per service
+        # for all DCs (a per-DC copy would overwrite the others).
+        by_priority = [primary, *failover_targets(datacenters, primary, peering=False)]
+        for name in services_by_name.keys():
+            if name in prefer_primary:
+                common_config_entries[f"{name}-resolver.hcl"] = hcl_resolver_prefer_primary(name, primary, by_priority[1:])
+            else:
+                common_config_entries[f"{name}-resolver.hcl"] = hcl_resolver(name, by_priority)
+
+    # Prepared queries live on the servers, so failover services are fleet-wide (all.vars only).
+    dns_defaults = all_vars.get("dns_cache") or {}
+
+    # Validate pinned ports and resolve "auto" ones before anything is rendered.
+    port_hosts: dict[str, tuple[list[str], int, list[tuple[int, int, str]]]] = {}
+    for host, hv in hostvars.items():
+        if host in app_hosts and get_var(hv, "dc") and get_var(hv, "host_ip"):
+            offset = int(get_var(hv, "envoy_admin_port_offset", get_var(all_vars, "envoy_admin_port_offset", 8000)))
+            reserved = fixed_ports(*gateway_settings(host, hv, all_vars))
+            dns_cache = host_dns_cache(host, hv, dns_defaults)
+            if dns_cache:
+                reserved.append((dns_cache["port"], dns_cache["port"], "dns_cache"))
+            port_hosts[host] = (host_services(host, hv, all_vars, services_by_name), offset, reserved)
+    services_by_name = allocate_ports(all_vars, port_hosts, services_by_name)
+    if args.ports_report:
+        for name, svc in services_by_name.items():
+            upstreams = ", ".join(
+                f"{u['destination_name']}={u.get('local_bind_port') or u.get('local_bind_socket_path')}" for u in svc.get("upstreams", []) or []
+            )
+            print(f"{name:<32} port={svc['port']} sidecar_port={svc.get('sidecar_port', '-')} upstreams=[{upstreams}]")
+
+    dns_failover_services = sorted(dns_defaults.get("failover_services") or [])
+    for name in dns_failover_services:
+        if name not in services_by_name:
+            raise SystemExit(f"dns_cache.failover_services: unknown service: {name}")
 
     # Bundles per host
     for host, hv in hostvars.items():
@@ -264,10 +1177,25 @@ def main() -> int:
         enable_itch_consumer = str(get_var(hv, "enable_itch_consumer", get_var(all_vars, "enable_itch_consumer", "0")))
         mgmt_bind_addr = get_var(hv, "mgmt_bind_addr", get_var(all_vars, "mgmt_bind_addr", "127.0.0.1"))
 
-        instance_role = str(get_var(hv, "instance_role", default_instance_role(dc)))
+        instance_role = str(get_var(hv, "instance_role", "primary" if dc == primary else "secondary"))
+
+        envoy_profiles = {**(all_vars.get("envoy_resource_profiles") or {}), **(get_var(hv, "envoy_resource_profiles") or {})}
+        envoy_default_profile = get_var(hv, "envoy_default_profile", get_var(all_vars, "envoy_default_profile"))
+        host_cpus = get_var(hv, "host_cpus")
+        placement = get_var(hv, "placement", get_var(all_vars, "placement"))
+        network_mode = str(get_var(hv, "mesh_network_mode", get_var(all_vars, "mesh_network_mode", "publish")))
+        if network_mode not in NETWORK_MODES:
+            raise SystemExit(f"{host}: mesh_network_mode must be one of {', '.join(NETWORK_MODES)}")
+        admin_port_offset = int(get_var(hv, "envoy_admin_port_offset", get_var(all_vars, "envoy_admin_port_offset", 8000)))
+        drain_time_s = str(get_var(hv, "envoy_drain_time_s", get_var(all_vars, "envoy_drain_time_s", 15)))
+        if not drain_time_s.isdigit():
+            raise SystemExit(f"{host}: envoy_drain_time_s must be a whole number of seconds")
+        socket_dir = str(get_var(hv, "mesh_socket_dir", get_var(all_vars, "mesh_socket_dir", DEFAULT_SOCKET_DIR)))
+        if not socket_dir.startswith("/"):
+            raise SystemExit(f"{host}: mesh_socket_dir must be an absolute path")
 
         bundle: dict = {
-            "version": 1,
+            "version": meshschema.BUNDLE_VERSION,
             "host": host,
             "dc": dc,
             "host_ip": host_ip,
@@ -277,9 +1205,13 @@ def main() -> int:
                 "HOST_IP": host_ip,
                 "CONSUL_IMAGE": consul_image,
                 "ENVOY_IMAGE": envoy_image,
+                "MESH_NETWORK_MODE": network_mode,
+                "ENVOY_DRAIN_TIME_S": drain_time_s,
             },
             "files": {},
         }
+        if placement:
+            bundle["placement"] = normalize_placement(host, placement)
 
         if host in consul_servers:
             bundle["role"] = "server"
@@ -287,13 +1219,39 @@ def main() -> int:
                 {
                     "CONSUL_BOOTSTRAP_EXPECT": str(get_var(hv, "consul_bootstrap_expect", "1")),
                     "CONSUL_RETRY_JOIN": str(get_var(hv, "consul_retry_join", "")),
-                    "CONSUL_RETRY_JOIN_WAN": str(get_var(hv, "consul_retry_join_wan", "")),
+                    # Peered DCs never gossip over the WAN.
+                    "CONSUL_RETRY_JOIN_WAN": "" if peering else str(get_var(hv, "consul_retry_join_wan", "")),
+                    "CONSUL_FEDERATION": federation,
                     "CONSUL_ENABLE_UI": str(get_var(hv, "consul_enable_ui", "1")),
                     "ENVOY_EXTRA_ARGS": str(get_var(hv, "envoy_extra_args", "")),
                     "MGMT_BIND_ADDR": str(mgmt_bind_addr),
                 }
             )
-            bundle["files"]["config_entries"] = common_config_entries
+            bundle["files"]["consul_config"] = {
+                "server.hcl": consul_agent_hcl(consul_tuning("consul_server_tuning", all_vars.get("consul_server_tuning") or {}, dc))
+            }
+            if dns_failover_services:
+                ttl = str(dns_defaults.get("query_ttl") or DNS_CACHE_DEFAULTS["query_ttl"])
+                bundle["files"]["prepared_queries"] = {
+                    f"{name}.json": prepared_query(name, failover_order(datacenters, dc), ttl, peering=peering) for name in dns_failover_services
+                }
+            if peering:
+                # The DC that comes first in priority generates the peering token; the other one dials.
+                bundle["peering"] = [
+                    {"peer": other, "role": "acceptor" if datacenters[dc]["priority"] < datacenters[other]["priority"] else "dialer"}
+                    for other in failover_order(datacenters, dc)
+                ]
+            dc_entries = {**entries_for_dc(common_config_entries, dc), **dc_config_entries.get(dc, {})}
+            if args.entry_store:
+                bundle["files"]["config_entry_refs"] = store_entries(dc_entries, out_dir / "entries")
+            else:
+                bundle["files"]["config_entries"] = dc_entries
+            bundle["envoy_profiles"] = resolve_envoy_profiles(
+                envoy_profiles,
+                {"mesh-gateway": get_var(hv, "mesh_gateway_envoy_profile", envoy_default_profile)},
+                host=host,
+                host_cpus=host_cpus,
+            )
 
         if host in app_hosts:
             bundle["role"] = "app"
@@ -303,31 +1261,62 @@ def main() -> int:
                     "ENVOY_EXTRA_ARGS": str(get_var(hv, "envoy_extra_args", "")),
                     "ENABLED_SERVICES": ",".join(enabled_services),
                     "ENABLE_ITCH_CONSUMER": enable_itch_consumer,
+                    "MESH_SOCKET_DIR": socket_dir,
+                    "ENVOY_ADMIN_PORT_OFFSET": str(admin_port_offset),
                 }
             )
 
-            if not enabled_services:
-                enabled_services = list(services_by_name.keys())
-
             templates: dict[str, str] = {}
-            for name in enabled_services:
-                if name == "itch-consumer" and enable_itch_consumer != "1":
-                    continue
-                svc = services_by_name.get(name)
-                if not svc:
-                    raise SystemExit(f"{host}: enabled service not found in service_catalog: {name}")
+            for name in host_services(host, hv, all_vars, services_by_name):
+                svc = services_by_name[name]
                 templates[f"{name}.json"] = service_template_json(
                     dc=dc,
                     host_ip_placeholder="__HOST_IP__",
                     instance_role=instance_role,
                     service=svc,
+                    # With host networking, upstream listeners must not be exposed on every interface.
+                    upstream_bind_address="127.0.0.1" if network_mode == "host" else "0.0.0.0",
+                    socket_dir=socket_dir,
                 )
             bundle["files"]["service_templates"] = templates
+            bundle["files"]["consul_config"] = {
+                "agent.hcl": consul_agent_hcl(consul_tuning("consul_agent_tuning", all_vars.get("consul_agent_tuning") or {}, dc))
+            }
+            dns_cache = host_dns_cache(host, hv, dns_defaults)
+            if dns_cache:
+                bind = "127.0.0.1" if network_mode == "host" else "0.0.0.0"
+                bundle["files"]["dns_cache"] = {"Corefile": dns_corefile(dns_cache, bind)}
+                bundle["env"]["DNS_CACHE_IMAGE"] = str(dns_cache["image"])
+            bundle["envoy_profiles"] = resolve_envoy_profiles(
+                envoy_profiles,
+                {
+                    name: services_by_name[name].get("envoy_profile", envoy_default_profile)
+                    for name in host_services(host, hv, all_vars, services_by_name)
+                    if services_by_name[name].get("sidecar_port") is not None
+                },
+                host=host,
+                host_cpus=host_cpus,
+            )
 
         if "role" not in bundle:
             continue
 
-        write_json(out_dir / f"{host}.bundle.json", bundle)
+        if bundle["role"] == "server":
+            gateways = mesh_gateways(dc, *gateway_settings(host, hv, all_vars))
+            bundle["index"] = server_index(dc, bundle["files"], gateways=gateways)
+        else:
+            dns_port = dns_cache["port"] if dns_cache else None
+            bundle["index"] = app_index(dc, bundle["files"], admin_port_offset=admin_port_offset, dns_port=dns_port)
+
+        errors = meshschema.bundle_errors(bundle)
+        if errors:
+            raise SystemExit(f"{host}: rendered bundle does not match the bundle schema:\n  " + "\n  ".join(errors))
+        meshbundle.write_bundle(out_dir / f"{host}.bundle.{args.format}", bundle)
+
+    if args.intentions_report:
+        print(f"{'destination':<32} {'callers':>8} {'rbac_rules':>10}")
+        for dest, callers, rules in intentions_report:
+            print(f"{dest:<32} {callers:>8} {rules:>10}")
 
     print(f"Wrote bundles under: {out_dir}")
     return 0
@@ -0,0 +1,113 @@
+import copy
+import importlib.util
+import json
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+TOOLS = Path(__file__).resolve().parents[1]
+REPO_ROOT = TOOLS.parent
+sys.path.insert(0, str(TOOLS))
+
+
+def load_script(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def render():
+    # render-mesh-bundles.py is a script (dashes in the name), so it is loaded by path.
+    return load_script("render_mesh_bundles", TOOLS / "render-mesh-bundles.py")
+
+
+@pytest.fixture
+def inventory():
+    return copy.deepcopy(json.loads((REPO_ROOT / "config" / "inventory.example.json").read_text(encoding="utf-8")))
+
+
+@pytest.fixture
+def render_bundles(tmp_path):
+    # Runs the renderer like a deploy would; returns (exit code, stderr, {host: bundle}).
+    def run(inventory: dict, *extra: str) -> tuple[int, str, dict]:
+        inv_path = tmp_path / "inventory.json"
+        inv_path.write_text(json.dumps(inventory), encoding="utf-8")
+        out_dir = tmp_path / "bundles"
+        proc = subprocess.run(
+            [sys.executable, str(TOOLS / "render-mesh-bundles.py"), "--inventory-json", str(inv_path), "-o", str(out_dir), *extra],
+            capture_output=True,
+            text=True,
+        )
+        bundles = {p.name[: -len(".bundle.json")]: json.loads(p.read_text(encoding="utf-8")) for p in out_dir.glob("*.bundle.json")}
+        return proc.returncode, proc.stderr, bundles
+
+    return run
+
+
+class FakeHttp(ThreadingHTTPServer):
+    # Consul agent / Envoy admin stand-in. routes: "METHOD /path" (no query) -> (code, body), or a callable
+    # taking the query dict and returning one. Other paths get .default; every request is recorded.
+    def __init__(self):
+        self.routes: dict[str, object] = {}
+        self.default: tuple[int, object] = (404, "not found")
+        self.requests: list[tuple[str, str, dict]] = []
+        self.bodies: list[tuple[str, str, str]] = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle_one(self):
+                url = urlsplit(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+                fake.requests.append((self.command, url.path, query))
+                length = int(self.headers.get("Content-Length") or 0)
+                fake.bodies.append((self.command, url.path, self.rfile.read(length).decode() if length else ""))
+                route = fake.routes.get(f"{self.command} {url.path}", fake.default)
+                code, body = route(query) if callable(route) else route
+                data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_PUT = do_POST = handle_one
+
+            def log_message(self, *args):
+                pass
+
+        super().__init__(("127.0.0.1", 0), Handler)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def seen(self, method: str, path: str) -> list[dict]:
+        return [q for m, p, q in self.requests if (m, p) == (method, path)]
+
+    def posted(self, path: str) -> list[dict]:
+        return [json.loads(b) for m, p, b in self.bodies if (m, p) == ("POST", path)]
+
+
+@pytest.fixture
+def fake_http():
+    # Starts FakeHttp servers on loopback; all are shut down after the test.
+    started: list[FakeHttp] = []
+
+    def start(routes: dict | None = None, default: tuple[int, object] = (404, "not found")) -> FakeHttp:
+        server = FakeHttp()
+        server.routes.update(routes or {})
+        server.default = default
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started.append(server)
+        return server
+
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,117 @@
+import pytest
+
+from meshctl.config_entries import entry_drift, parse_config_entries, parse_hcl
+
+RESOLVER = """
+# Rendered by render-mesh-bundles.py
+Kind = "service-resolver"
+Name = "web"
+ConnectTimeout = "5s"
+
+Failover = {
+  "*" = {
+    Datacenters = ["dc2", "dc3"]
+  }
+}
+"""
+
+
+def test_parse_hcl_attributes_blocks_and_lists():
+    assert parse_hcl(RESOLVER) == {
+        "Kind": "service-resolver",
+        "Name": "web",
+        "ConnectTimeout": "5s",
+        "Failover": {"*": {"Datacenters": ["dc2", "dc3"]}},
+    }
+    text = (
+        'Sources { Name = "a" }\n/* block */ Sources { Name = "b", Precedence = 9 }\n'
+        "// line\nLimits = { x: 1.5, on: true, off: false, none: null }\n"
+    )
+    assert parse_hcl(text) == {
+        "Sources": [{"Name": "a"}, {"Name": "b", "Precedence": 9}],
+        "Limits": {"x": 1.5, "on": True, "off": False, "none": None},
+    }
+    assert parse_hcl('Path = "/a\\"b"') == {"Path": '/a"b'}
+
+
+@pytest.mark.parametrize(
+    "text, error",
+    [
+        ('Kind = "a"\nName ~ "b"', "line 2: unexpected '~'"),
+        ('Kind "a"', "line 1: expected '=' after Kind"),
+        ("= 1", "line 1: expected a key"),
+        ("Failover = {", "unexpected end of input"),
+        ("Name = bare", "line 1: unexpected 'bare'"),
+    ],
+)
+def test_parse_hcl_errors(text, error):
+    with pytest.raises(ValueError, match=error):
+        parse_hcl(text)
+
+
+def test_rendered_entries_parse(inventory, render_bundles):
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    entries = bundles["dc1-consul-01"]["files"]["config_entries"]
+    by_kind = parse_config_entries(entries)
+    assert sum(len(names) for names in by_kind.values()) == len(entries)
+    assert "service-resolver" in by_kind
+
+
+def test_parse_config_entries():
+    entries = {"web.hcl": RESOLVER, "mesh.hcl": 'Kind = "mesh"\nPeering { PeerThroughMeshGateways = true }\n'}
+    by_kind = parse_config_entries(entries)
+    # Singleton kinds have no Name and are keyed by their kind.
+    assert sorted(by_kind) == ["mesh", "service-resolver"]
+    assert by_kind["mesh"]["mesh"]["Peering"] == {"PeerThroughMeshGateways": True}
+    assert by_kind["service-resolver"]["web"]["Failover"]["*"]["Datacenters"] == ["dc2", "dc3"]
+
+
+@pytest.mark.parametrize(
+    "entries, error",
+    [
+        ({"a.hcl": RESOLVER, "b.hcl": RESOLVER}, "b.hcl: duplicate config entry service-resolver/web"),
+        ({"a.hcl": 'Kind = "service-resolver"\n'}, "a.hcl: config entry has no Kind/Name"),
+        ({"a.hcl": "Kind = {"}, "a.hcl: cannot parse config entry"),
+    ],
+)
+def test_parse_config_entries_errors(entries, error, capsys):
+    with pytest.raises(SystemExit):
+        parse_config_entries(entries)
+    assert error in capsys.readouterr().err
+
+
+def test_entry_drift_ignores_what_consul_adds():
+    want = parse_hcl(RESOLVER)
+    live = {
+        "Kind": "service-resolver",
+        "Name": "web",
+        "connect_timeout": "5000ms",
+        "Failover": {"*": {"Datacenters": ["dc2", "dc3"]}},
+        "CreateIndex": 10,
+        "ModifyIndex": 12,
+    }
+    assert entry_drift(want, live) == []
+    # Zero values are dropped by Consul, so their absence is not drift.
+    assert entry_drift({"Name": "web", "Meta": {}, "Precedence": 0}, {"Name": "web"}) == []
+
+
+def test_entry_drift_reports_changes():
+    want = parse_hcl(RESOLVER)
+    live = {"Kind": "service-resolver", "Name": "web", "ConnectTimeout": "10s", "Failover": {"*": {"Datacenters": ["dc3", "dc2"]}}}
+    assert entry_drift(want, live) == [
+        'ConnectTimeout: want "5s", got "10s"',
+        'Failover.*.Datacenters[0]: want "dc2", got "dc3"',
+        'Failover.*.Datacenters[1]: want "dc3", got "dc2"',
+    ]
+    assert entry_drift({"Name": "web", "Protocol": "http"}, {"Name": "web"}) == ["Protocol: missing"]
+    assert entry_drift({"Failover": {"*": {}}}, {"Failover": "x"}) == ['Failover: want an object, got "x"']
+
+
+def test_entry_drift_matches_object_lists_in_any_order():
+    want = {"Sources": [{"Name": "a", "Action": "allow"}, {"Name": "b", "Action": "deny"}]}
+    live = {"Sources": [{"Name": "b", "Action": "deny", "Precedence": 9}, {"Name": "a", "Action": "allow", "Precedence": 9}]}
+    assert entry_drift(want, live) == []
+    live["Sources"][0]["Action"] = "allow"
+    assert entry_drift(want, live) == ['Sources[1]: no live match for {"Name": "b", "Action": "deny"}']
+    assert entry_drift(want, {"Sources": live["Sources"][:1]})[0].startswith("Sources: want [")
@@ -0,0 +1,113 @@
+import pytest
+
+from meshctl.config_entries import parse_hcl
+
+# The runbook's three-region example.
+DATACENTERS = {
+    "dc1": {"priority": 1, "latency_ms": {"dc2": 40, "dc3": 12}},
+    "dc2": {"priority": 2, "latency_ms": {"dc3": 25}},
+    "dc3": {"priority": 3},
+}
+
+
+def test_failover_order_nearest_first(render):
+    assert render.primary_dc(DATACENTERS) == "dc1"
+    # Latency declared on either side counts.
+    assert render.failover_order(DATACENTERS, "dc1") == ["dc3", "dc2"]
+    assert render.failover_order(DATACENTERS, "dc2") == ["dc3", "dc1"]
+    assert render.failover_order(DATACENTERS, "dc3") == ["dc1", "dc2"]
+
+
+def test_failover_order_without_latency_falls_back_to_priority(render):
+    dcs = {"eu": {"priority": 2, "latency_ms": {"us": 80}}, "us": {"priority": 0}, "ap": {"priority": 1}, "sa": {"priority": 3}}
+    assert render.primary_dc(dcs) == "us"
+    # eu knows its latency to us; ap and sa have none and follow by priority.
+    assert render.failover_order(dcs, "eu") == ["us", "ap", "sa"]
+    assert render.failover_order(dcs, "ap") == ["us", "eu", "sa"]
+    assert render.failover_order({"dc1": {"priority": 0}}, "dc1") == []
+
+
+def test_two_dc_inventories_need_no_declaration(render):
+    dcs = render.load_datacenters({}, {"dc2", "dc1"})
+    assert dcs == {"dc1": {"priority": 0}, "dc2": {"priority": 1}}
+    assert render.failover_order(dcs, "dc1") == ["dc2"]
+    assert render.failover_order(dcs, "dc2") == ["dc1"]
+
+
+def test_load_datacenters_errors(render):
+    declared = {
+        "dc1": {"priority": 1, "latency_ms": {"dc9": 5}},
+        "dc2": {"priority": 1},
+    }
+    with pytest.raises(SystemExit) as e:
+        render.load_datacenters({"datacenters": declared}, {"dc1", "dc2", "dc3"})
+    assert str(e.value).splitlines()[1:] == [
+        "  datacenters.dc1.latency_ms: unknown datacenter dc9",
+        "  datacenters.dc2.priority: 1 is also used by dc1",
+        "  datacenters: missing dc3 (used by hosts)",
+    ]
+
+
+def add_dc3(inventory: dict) -> dict:
+    hostvars = inventory["_meta"]["hostvars"]
+    inventory["all"]["vars"]["datacenters"] = DATACENTERS
+    inventory["consul_servers"]["hosts"].append("dc3-consul-01")
+    inventory["app_hosts"]["hosts"].append("dc3-app-01")
+    hostvars["dc3-consul-01"] = {**hostvars["dc2-consul-01"], "dc": "dc3", "host_ip": "10.0.2.21", "consul_retry_join": "10.0.2.21"}
+    hostvars["dc3-app-01"] = {"dc": "dc3", "host_ip": "10.0.2.10", "consul_retry_join": "10.0.2.21"}
+    return inventory
+
+
+def resolvers(bundle: dict) -> dict[str, dict]:
+    entries = bundle["files"]["config_entries"]
+    return {name: parse_hcl(text) for name, text in entries.items() if "-resolver" in name}
+
+
+def test_wan_resolvers_are_global(inventory, render_bundles):
+    code, err, bundles = render_bundles(add_dc3(inventory))
+    assert code == 0, err
+    servers = [bundles[f"{dc}-consul-01"] for dc in ("dc1", "dc2", "dc3")]
+    # Config entries replicate from the primary DC: every DC must write the same, single resolver per service.
+    shipped = [resolvers(b) for b in servers]
+    assert shipped[0] == shipped[1] == shipped[2]
+    names = [r["Name"] for r in shipped[0].values()]
+    assert sorted(names) == sorted(set(names)) == sorted(inventory["all"]["vars"]["enabled_services"].split(","))
+    assert shipped[0]["refdata-resolver.hcl"]["Failover"]["*"]["Datacenters"] == ["dc1", "dc2", "dc3"]
+    targets = shipped[0]["ordermanager-resolver.hcl"]["Failover"]["primary"]["Targets"]
+    assert [(t["Datacenter"], t["ServiceSubset"]) for t in targets] == [("dc1", "primary"), ("dc2", "secondary"), ("dc3", "secondary")]
+
+
+def test_two_dc_wan_failover_both_ways(inventory, render_bundles):
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    # Consul drops the caller's own DC from the list: dc1 fails over to dc2 and dc2 to dc1.
+    assert resolvers(bundles["dc2-consul-01"])["refdata-resolver.hcl"]["Failover"]["*"]["Datacenters"] == ["dc1", "dc2"]
+
+
+def test_peering_resolvers_fail_over_nearest_first(inventory, render_bundles):
+    inventory = add_dc3(inventory)
+    inventory["all"]["vars"]["mesh_federation"] = "peering"
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    for dc, order in (("dc1", ["dc3", "dc2"]), ("dc2", ["dc3", "dc1"]), ("dc3", ["dc1", "dc2"])):
+        shipped = resolvers(bundles[f"{dc}-consul-01"])
+        assert all(name.endswith(f"-resolver-{dc}.hcl") for name in shipped)
+        assert [t["Peer"] for t in shipped[f"refdata-resolver-{dc}.hcl"]["Failover"]["*"]["Targets"]] == order
+
+
+def test_graph_follows_the_resolvers(render):
+    kw = {"failed": {"web"}, "prefer_primary": set(), "datacenters": DATACENTERS}
+    assert render.resolve_dc("web", "dc1", peering=False, **kw) == "dc2"
+    assert render.resolve_dc("web", "dc1", peering=True, **kw) == "dc3"
+    assert render.failover_targets(DATACENTERS, "dc3", peering=False) == ["dc1", "dc2"]
+
+
+def test_three_dc_peering_roles(inventory, render_bundles):
+    inventory = add_dc3(inventory)
+    inventory["all"]["vars"]["mesh_federation"] = "peering"
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    # Every pair is peered once: the higher-priority DC accepts, the other dials.
+    assert bundles["dc1-consul-01"]["peering"] == [{"peer": "dc3", "role": "acceptor"}, {"peer": "dc2", "role": "acceptor"}]
+    assert bundles["dc2-consul-01"]["peering"] == [{"peer": "dc3", "role": "acceptor"}, {"peer": "dc1", "role": "dialer"}]
+    assert bundles["dc3-consul-01"]["peering"] == [{"peer": "dc1", "role": "dialer"}, {"peer": "dc2", "role": "dialer"}]
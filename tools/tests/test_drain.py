@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pytest
+
+from meshctl.consul import set_maintenance
+from meshctl.stack import drain_stack, wait_deregistered
+
+SERVICES = {
+    "web-dc1": {"ID": "web-dc1", "Service": "web"},
+    "web-dc1-sidecar-proxy": {"ID": "web-dc1-sidecar-proxy", "Service": "web-sidecar-proxy", "Proxy": {"DestinationServiceID": "web-dc1"}},
+    "other-dc1": {"ID": "other-dc1", "Service": "other"},
+}
+
+
+def health(node: str, *service_ids: str) -> list[dict]:
+    return [{"Node": {"Node": node}, "Service": {"ID": sid}} for sid in service_ids]
+
+
+@pytest.fixture
+def agent(fake_http):
+    # Local agent on node app-01 with web, its sidecar and an unrelated service registered and passing.
+    return fake_http(
+        {
+            "GET /v1/agent/services": (200, SERVICES),
+            "GET /v1/agent/self": (200, {"Config": {"NodeName": "app-01"}}),
+            "PUT /v1/agent/service/maintenance/web-dc1": (200, ""),
+            "PUT /v1/agent/service/maintenance/web-dc1-sidecar-proxy": (200, ""),
+            "GET /v1/health/service/web": (200, health("app-01", "web-dc1") + health("app-02", "web-dc2")),
+            "GET /v1/health/service/web-sidecar-proxy": (200, health("app-01", "web-dc1-sidecar-proxy")),
+        }
+    )
+
+
+def test_set_maintenance_covers_services_and_their_sidecars(agent):
+    targets = set_maintenance(agent.url, {"web-dc1"}, enable=True, reason="meshctl down-app")
+    assert targets == {"web-dc1": "web", "web-dc1-sidecar-proxy": "web-sidecar-proxy"}
+    assert agent.seen("PUT", "/v1/agent/service/maintenance/web-dc1") == [{"enable": "true", "reason": "meshctl down-app"}]
+    assert agent.seen("PUT", "/v1/agent/service/maintenance/web-dc1-sidecar-proxy") == [{"enable": "true", "reason": "meshctl down-app"}]
+    set_maintenance(agent.url, {"web-dc1"}, enable=False)
+    assert agent.seen("PUT", "/v1/agent/service/maintenance/web-dc1")[-1] == {"enable": "false"}
+
+
+def test_set_maintenance_fails_loudly(agent, capsys):
+    agent.routes["PUT /v1/agent/service/maintenance/web-dc1-sidecar-proxy"] = (403, "Permission denied")
+    with pytest.raises(SystemExit):
+        set_maintenance(agent.url, {"web-dc1"}, enable=True)
+    assert "Failed to enable maintenance for web-dc1-sidecar-proxy (403: Permission denied)" in capsys.readouterr().err
+    agent.routes["GET /v1/agent/services"] = (500, "")
+    with pytest.raises(SystemExit):
+        set_maintenance(agent.url, {"web-dc1"}, enable=True)
+
+
+def test_wait_deregistered(agent):
+    targets = {"web-dc1": "web", "web-dc1-sidecar-proxy": "web-sidecar-proxy"}
+    polls = iter([health("app-01", "web-dc1"), health("app-01", "web-dc1")])
+    # Passing twice more, then only the instance on the other node is left.
+    agent.routes["GET /v1/health/service/web"] = lambda query: (200, next(polls, health("app-02", "web-dc2")))
+    agent.routes["GET /v1/health/service/web-sidecar-proxy"] = (200, [])
+    assert wait_deregistered(agent.url, targets, timeout_s=10)
+    assert agent.seen("GET", "/v1/health/service/web")[0] == {"passing": "1"}
+    assert len(agent.seen("GET", "/v1/health/service/web")) == 3
+
+
+def test_wait_deregistered_times_out(agent):
+    assert not wait_deregistered(agent.url, {"web-dc1": "web"}, timeout_s=1)
+
+
+def test_wait_deregistered_needs_the_agent(agent, capsys):
+    # Without the node name nothing can be confirmed: keep waiting, then stop before the pod is removed.
+    agent.routes["GET /v1/agent/self"] = (500, "agent error")
+    with pytest.raises(SystemExit):
+        wait_deregistered(agent.url, {"web-dc1": "web"}, timeout_s=1)
+    assert "did not report its node" in capsys.readouterr().err
+    assert len(agent.seen("GET", "/v1/agent/self")) > 1
+    assert agent.seen("GET", "/v1/health/service/web") == []
+    # An agent that answers late is fine.
+    answers = iter([(500, ""), (200, "not json")])
+    agent.routes["GET /v1/agent/self"] = lambda query: next(answers, (200, {"Config": {"NodeName": "app-01"}}))
+    agent.routes["GET /v1/health/service/web"] = (200, [])
+    assert wait_deregistered(agent.url, {"web-dc1": "web"}, timeout_s=10)
+
+
+def drain_args(**kwargs) -> SimpleNamespace:
+    return SimpleNamespace(**{"drain_timeout": 5.0, "propagation_timeout": 5.0, "settle": 0.0, **kwargs})
+
+
+def envoy(fake_http, active: list[int]):
+    # Envoy admin whose sidecar listener on port 21000 reports the given active connection counts, then 0.
+    counts = iter(active)
+    stats = lambda query: (200, f"listener.admin.downstream_cx_active: 1\nlistener.0.0.0.0_21000.downstream_cx_active: {next(counts, 0)}\n")
+    return fake_http({"POST /drain_listeners": (200, "OK"), "GET /stats": stats})
+
+
+def test_drain_stack(agent, fake_http, capsys):
+    agent.routes["GET /v1/health/service/web"] = (200, health("app-02", "web-dc2"))
+    agent.routes["GET /v1/health/service/web-sidecar-proxy"] = (200, [])
+    admin = envoy(fake_http, [3, 1])
+    listeners = [{"name": "web-envoy", "host": "127.0.0.1", "admin_port": admin.server_address[1], "port": 21000, "inbound_only": True}]
+    drain_stack(agent.url, {"web-dc1"}, listeners, drain_args(), {"env": {}}, reason="meshctl down-app")
+    assert [q["enable"] for q in agent.seen("PUT", "/v1/agent/service/maintenance/web-dc1")] == ["true"]
+    assert admin.seen("POST", "/drain_listeners") == [{"graceful": "", "inboundonly": ""}]
+    assert len(admin.seen("GET", "/stats")) == 3
+    assert "Drain: no active connections" in capsys.readouterr().out
+
+
+def test_drain_stack_gives_up_on_open_connections(agent, fake_http, capsys):
+    agent.routes["GET /v1/health/service/web"] = (200, [])
+    agent.routes["GET /v1/health/service/web-sidecar-proxy"] = (200, [])
+    admin = envoy(fake_http, [2] * 100)
+    listeners = [{"name": "web-envoy", "host": "127.0.0.1", "admin_port": admin.server_address[1], "port": 21000, "inbound_only": False}]
+    drain_stack(agent.url, {"web-dc1"}, listeners, drain_args(drain_timeout=1.0), {"env": {}}, reason="r")
+    assert admin.seen("POST", "/drain_listeners") == [{"graceful": ""}]
+    assert "Still active after 1s: web-envoy=2" in capsys.readouterr().err
+
+
+def test_drain_stack_without_agent_skips_the_drain(agent, capsys):
+    agent.routes["GET /v1/agent/services"] = (0, "")
+    agent.shutdown()
+    agent.server_close()
+    drain_stack(agent.url, {"web-dc1"}, [], drain_args(), {"env": {}}, reason="r")
+    assert "removing the pod without draining" in capsys.readouterr().err
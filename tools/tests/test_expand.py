@@ -0,0 +1,163 @@
+import json
+import os
+import socket
+from pathlib import Path
+
+import pytest
+
+from meshbundle import PLAN_VERSION
+from meshctl.bundle import expanded_root
+from meshctl.common import die, read_env
+from meshctl.dns import dns_stub
+from meshctl.expand import expand_bundle
+from meshctl.plan import load_plan, read_plan_file, resolve_plan, run_plan, wait_dns_answer
+
+
+@pytest.fixture
+def bundles(inventory, render_bundles, tmp_path, monkeypatch):
+    # Expanded output goes under tmp_path/run instead of the repo.
+    monkeypatch.setattr("meshctl.bundle.REPO_ROOT", tmp_path)
+    code, err, rendered = render_bundles(inventory)
+    assert code == 0, err
+    return rendered
+
+
+def expand(bundle: dict, **kwargs) -> Path:
+    path = Path(f"/nonexistent/{bundle['host']}.bundle.json")
+    _, out_root, _ = expand_bundle(json.loads(json.dumps(bundle)), bundle_path=path, **kwargs)
+    return out_root
+
+
+def test_expand_app(bundles, tmp_path):
+    bundle = bundles["dc1-app-01"]
+    out_root = expand(bundle)
+    assert out_root == tmp_path / "run" / "mesh" / "expanded" / "dc1-app-01" / "app"
+    assert sorted(p.name for p in out_root.parent.iterdir()) == ["app"]
+    env = read_env(out_root / "runtime.env")
+    assert env["CONSUL_SERVICE_TEMPLATES_DIR"] == (out_root / "services").as_posix()
+    rendered = json.loads((out_root / "rendered" / "refdata.json").read_text())
+    assert rendered["service"]["address"] == "10.0.0.10"
+
+    plan = load_plan(bundle, out_root)
+    steps = plan["steps"]
+    assert steps[0]["op"] == "pod"
+    assert steps[-1]["op"] == "maintenance_off"
+    containers = {bundle["index"]["containers"]["agent"], *(sc["container"] for sc in bundle["index"]["sidecars"])}
+    assert {s["component"] for s in steps if s.get("component")} == containers
+    # Every host path the containers mount exists in the expansion.
+    for step in steps:
+        for arg in step.get("args", []):
+            if arg.startswith(out_root.as_posix()):
+                assert Path(arg.split(":")[0]).exists(), arg
+
+
+def test_expand_server(bundles):
+    bundle = bundles["dc1-consul-01"]
+    out_root = expand(bundle)
+    entries = {p.name for p in (out_root / "config-entries").iterdir()}
+    assert entries == set(bundle["files"]["config_entries"])
+    plan = load_plan(bundle, out_root)
+    assert [s["op"] for s in plan["steps"] if s["op"] != "podman"] == ["volume", "volume", "pod", "wait_leader", "maintenance_off"]
+
+
+def test_failed_expand_leaves_no_directory(bundles, monkeypatch):
+    bundle = bundles["dc1-app-01"]
+    with monkeypatch.context() as m:
+        m.setattr("meshctl.plan.app_plan", lambda *a: die("host check failed"))
+        with pytest.raises(SystemExit):
+            expand(bundle)
+        out_root = expanded_root(bundle)
+        assert not out_root.exists()
+        assert list(out_root.parent.iterdir()) == []
+    # A plain re-run (no --force) now expands instead of returning early.
+    assert (expand(bundle) / "plan.json").is_file()
+
+
+def test_failed_forced_expand_keeps_previous(bundles, monkeypatch):
+    bundle = bundles["dc1-app-01"]
+    out_root = expand(bundle)
+    before = (out_root / "plan.json").read_text()
+    monkeypatch.setattr("meshctl.plan.app_plan", lambda *a: die("host check failed"))
+    with pytest.raises(SystemExit):
+        expand(bundle, force=True)
+    assert (out_root / "plan.json").read_text() == before
+    assert sorted(p.name for p in out_root.parent.iterdir()) == ["app"]
+
+
+def test_expansion_without_plan_is_redone(bundles):
+    bundle = bundles["dc1-app-01"]
+    out_root = expanded_root(bundle)
+    (out_root / "services").mkdir(parents=True)
+    (out_root / "runtime.env").write_text("HOST_IP=10.0.0.10\n")
+    assert (expand(bundle) / "plan.json").is_file()
+
+
+def test_plan_must_match_bundle(bundles, tmp_path):
+    bundle = bundles["dc1-app-01"]
+    out_root = expand(bundle)
+    stale = {**bundle, "index": {**bundle["index"], "files_sha256": "0" * 64}}
+    with pytest.raises(SystemExit):
+        load_plan(stale, out_root)
+    old = tmp_path / "old-plan.json"
+    old.write_text(json.dumps({"version": PLAN_VERSION - 1, "steps": []}))
+    with pytest.raises(SystemExit):
+        read_plan_file(old)
+
+
+@pytest.fixture
+def replay(monkeypatch):
+    # Records what run_plan would do instead of calling Podman/Consul.
+    calls: list[tuple] = []
+    monkeypatch.setattr("meshctl.plan.ensure_pod", lambda name, args: calls.append(("pod", name)))
+    monkeypatch.setattr("meshctl.plan.ensure_volume", lambda name: calls.append(("volume", name)))
+
+    def podman(args: list[str], **kwargs) -> None:
+        # ("podman", "rm", container) / ("podman", "run", container or "--rm" for one-off runs)
+        target = args[args.index("--name") + 1] if "--name" in args else "--rm" if "--rm" in args else args[-1]
+        calls.append(("podman", args[0], target))
+
+    monkeypatch.setattr("meshctl.plan.podman", podman)
+    monkeypatch.setattr("meshctl.plan.wait_http_ok", lambda url, timeout_s: calls.append(("wait_http", url)))
+    monkeypatch.setattr("meshctl.plan.wait_sidecar_ready", lambda *a, **kw: calls.append(("wait_sidecar", a[1])))
+    monkeypatch.setattr("meshctl.plan.set_maintenance", lambda url, ids, enable: calls.append(("maintenance", enable)))
+    return calls
+
+
+def test_replay_one_component(bundles, replay, monkeypatch):
+    monkeypatch.setattr("meshctl.plan.read_numa_topology", lambda: {0: list(range(64))})
+    monkeypatch.setattr(os, "cpu_count", lambda: 64)
+    bundle = bundles["dc1-app-01"]
+    steps = resolve_plan(load_plan(bundle, expand(bundle)))
+    run_plan(steps, only={"refdata-envoy-dc1"})
+    podman_calls = [c for c in replay if c[0] == "podman"]
+    assert podman_calls == [("podman", "rm", "refdata-envoy-dc1"), ("podman", "run", "--rm"), ("podman", "run", "refdata-envoy-dc1")]
+    assert ("pod", "mesh-app-dc1") in replay
+    assert ("wait_sidecar", 21002) in replay
+
+    replay.clear()
+    run_plan(steps)
+    started = [c[2] for c in replay if c[:2] == ("podman", "run") and c[2].endswith("-dc1")]
+    assert started == ["consul-agent-dc1", "itch-feed-envoy-dc1", "ordermanager-envoy-dc1", "refdata-envoy-dc1", "webservice-envoy-dc1"]
+
+
+def test_dns_cache_waits_for_an_answer(inventory, render_bundles, tmp_path, monkeypatch):
+    monkeypatch.setattr("meshctl.bundle.REPO_ROOT", tmp_path)
+    inventory["all"]["vars"]["dns_cache"] = {"enabled": True, "port": 8653}
+    code, err, rendered = render_bundles(inventory)
+    assert code == 0, err
+    bundle = rendered["dc1-app-01"]
+    plan = load_plan(bundle, expand(bundle))
+    waits = [s for s in plan["steps"] if s.get("component") == "consul-dns-dc1" and s["op"].startswith("wait_")]
+    assert waits == [
+        {"op": "wait_dns", "host": "127.0.0.1", "port": 8653, "name": "itch-feed.service.consul", "timeout_s": 30, "component": "consul-dns-dc1"}
+    ]
+
+    with dns_stub() as (host, port):
+        wait_dns_answer(host, port, "itch-feed.service.consul", timeout_s=5)
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(("127.0.0.1", 0))
+    try:
+        with pytest.raises(SystemExit):
+            wait_dns_answer(*silent.getsockname(), "itch-feed.service.consul", timeout_s=1)
+    finally:
+        silent.close()
@@ -0,0 +1,39 @@
+import json
+
+from test_datacenters import DATACENTERS
+
+
+def test_find_cycles(render):
+    assert render.find_cycles({"a": ["b"], "b": ["c"], "c": []}) == []
+    assert render.find_cycles({"a": ["b"], "b": ["c"], "c": ["a"], "d": ["a"]}) == [["a", "b", "c"]]
+    # A service that calls itself is a cycle of one.
+    assert render.find_cycles({"a": ["a"], "b": []}) == [["a"]]
+
+
+def test_call_chains_stop_at_cycles(render):
+    edges = {"web": ["api", "cache"], "api": ["db", "web"], "cache": [], "db": ["db"]}
+    assert render.call_chains(edges, ["web"], limit=100) == [["web", "api", "db"], ["web", "cache"]]
+    assert render.call_chains(edges, ["web"], limit=1) == [["web", "api", "db"]]
+
+
+def test_chain_hops(render):
+    kw = {"prefer_primary": set(), "datacenters": DATACENTERS}
+    assert render.chain_hops(["web", "api"], "dc1", failed=set(), **kw) == (0, ["dc1", "dc1"])
+    # api fails over to its first target; db is called from there and stays local.
+    assert render.chain_hops(["web", "api", "db"], "dc1", failed={"api"}, **kw) == (1, ["dc1", "dc2", "dc2"])
+    assert render.chain_hops(["web", "api", "db"], "dc1", failed={"api"}, peering=True, **kw) == (1, ["dc1", "dc3", "dc3"])
+    assert render.chain_hops(["web", "api"], "dc2", failed=set(), prefer_primary={"api"}, datacenters=DATACENTERS) == (1, ["dc2", "dc1"])
+
+
+def test_max_hops(inventory, render_bundles, tmp_path):
+    graph_out = tmp_path / "graph.json"
+    argv = ["graph", "--failover", "refdata", "--graph-out", str(graph_out)]
+    code, err, _ = render_bundles(inventory, *argv, "--max-hops", "1")
+    assert code == 0, err
+    assert json.loads(graph_out.read_text())["max_cross_dc_hops"] == 1
+    # Over the limit: the report is still written, and the worst chain is named.
+    graph_out.unlink()
+    code, err, _ = render_bundles(inventory, *argv, "--max-hops", "0")
+    assert code == 1
+    assert "webservice -> ordermanager -> refdata crosses DCs 1 times (--max-hops 0)" in err
+    assert graph_out.exists()
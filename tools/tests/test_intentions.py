@@ -0,0 +1,125 @@
+import re
+
+import pytest
+
+from meshctl.config_entries import parse_hcl
+
+SERVICES = {
+    "web": {"name": "web", "protocol": "http"},
+    "api": {"name": "api", "protocol": "http"},
+    "batch": {"name": "batch", "namespace": "jobs"},
+    "report": {"name": "report", "namespace": "jobs"},
+    "feed": {"name": "feed", "protocol": "tcp"},
+}
+
+
+def with_permissions(*rules: dict) -> dict:
+    return {**SERVICES, "api": {**SERVICES["api"], "permissions": list(rules)}}
+
+
+def test_one_source_per_caller(render):
+    sources = render.build_intention_sources("api", {"web", "batch"}, SERVICES, allow_wildcard=False)
+    assert sources == [{"Name": "batch", "Action": "allow", "Namespace": "jobs"}, {"Name": "web", "Action": "allow"}]
+    assert render.rbac_rule_count(sources) == 2
+
+
+def test_every_other_service_collapses_into_a_wildcard(render):
+    callers = set(SERVICES) - {"api"}
+    assert render.build_intention_sources("api", callers, SERVICES, allow_wildcard=True) == [{"Name": "*", "Action": "allow"}]
+    # Opt-in only, and one missing caller keeps the per-caller rules.
+    assert len(render.build_intention_sources("api", callers, SERVICES, allow_wildcard=False)) == 4
+    sources = render.build_intention_sources("api", callers - {"feed"}, SERVICES, allow_wildcard=True)
+    assert {"Name": "*", "Action": "allow"} not in sources
+
+
+def test_a_whole_namespace_collapses_into_one_source(render):
+    sources = render.build_intention_sources("api", {"web", "batch", "report"}, SERVICES, allow_wildcard=True)
+    assert sources == [{"Name": "*", "Namespace": "jobs", "Action": "allow"}, {"Name": "web", "Action": "allow"}]
+    # Part of a namespace is listed caller by caller.
+    sources = render.build_intention_sources("api", {"web", "batch"}, SERVICES, allow_wildcard=True)
+    assert sources == [{"Name": "batch", "Action": "allow", "Namespace": "jobs"}, {"Name": "web", "Action": "allow"}]
+
+
+def test_l7_permissions(render):
+    services = with_permissions(
+        {"sources": ["web"], "path_prefix": "/v1/", "methods": ["get", "head"]},
+        {"sources": ["web", "batch"], "path_exact": "/admin", "action": "deny"},
+    )
+    callers = set(SERVICES) - {"api"}
+    sources = render.build_intention_sources("api", callers, services, allow_wildcard=True)
+    # Callers with permissions are never folded into a wildcard; the namespace rule no longer covers batch.
+    assert sources == [
+        {"Name": "feed", "Action": "allow"},
+        {"Name": "report", "Action": "allow", "Namespace": "jobs"},
+        {"Name": "batch", "Permissions": [{"Action": "deny", "HTTP": {"PathExact": "/admin"}}], "Namespace": "jobs"},
+        {
+            "Name": "web",
+            "Permissions": [
+                {"Action": "allow", "HTTP": {"PathPrefix": "/v1/", "Methods": ["GET", "HEAD"]}},
+                {"Action": "deny", "HTTP": {"PathExact": "/admin"}},
+            ],
+        },
+    ]
+    # One RBAC rule per permission, one per plain source.
+    assert render.rbac_rule_count(sources) == 5
+
+
+@pytest.mark.parametrize(
+    "dest, rule, error",
+    [
+        ("feed", {"sources": ["web"], "path_prefix": "/"}, "feed: L7 permissions need protocol http"),
+        ("api", {"sources": ["report"], "path_prefix": "/"}, "api: permission source report has no upstream to api"),
+        ("api", {"sources": ["web"], "path_prefix": "/", "path_exact": "/a"}, "api: a permission may set only one of"),
+        ("api", {"sources": ["web"], "action": "deny"}, "api: permission needs a path_* or methods"),
+    ],
+)
+def test_permission_errors(render, dest, rule, error):
+    services = {**SERVICES, dest: {**SERVICES[dest], "permissions": [rule]}}
+    with pytest.raises(SystemExit, match=re.escape(error)):
+        render.build_intention_sources(dest, {"web"}, services, allow_wildcard=False)
+
+
+def test_intentions_hcl(render):
+    services = with_permissions({"sources": ["web"], "methods": ["get"]})
+    sources = render.build_intention_sources("api", {"web", "batch"}, services, allow_wildcard=False)
+    text = render.hcl_intentions("api", sources)
+    # One space before "=": keys are no longer padded to a common width.
+    assert text == (
+        'Kind = "service-intentions"\n'
+        'Name = "api"\n'
+        "Sources = [\n"
+        "  {\n"
+        '    Name = "batch"\n'
+        '    Action = "allow"\n'
+        '    Namespace = "jobs"\n'
+        "  },\n"
+        "  {\n"
+        '    Name = "web"\n'
+        "    Permissions = [\n"
+        "      {\n"
+        '        Action = "allow"\n'
+        "        HTTP = {\n"
+        '          Methods = ["GET"]\n'
+        "        }\n"
+        "      }\n"
+        "    ]\n"
+        "  }\n"
+        "]\n"
+    )
+    assert parse_hcl(text) == {"Kind": "service-intentions", "Name": "api", "Sources": sources}
+
+
+def test_rendered_intentions(inventory, render_bundles):
+    all_vars = inventory["all"]["vars"]
+    all_vars["intentions_allow_wildcard"] = True
+    catalog = {s["name"]: s for s in all_vars["service_catalog"]}
+    catalog["itch-feed"]["upstreams"] = [{"destination_name": "refdata", "local_bind_port": 18282}]
+    catalog["ordermanager"]["permissions"] = [{"sources": ["webservice"], "path_prefix": "/orders/", "methods": ["GET", "POST"]}]
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    entries = bundles["dc1-consul-01"]["files"]["config_entries"]
+    # refdata is called by every other service.
+    assert parse_hcl(entries["intentions-refdata.hcl"])["Sources"] == [{"Name": "*", "Action": "allow"}]
+    assert parse_hcl(entries["intentions-ordermanager.hcl"])["Sources"] == [
+        {"Name": "webservice", "Permissions": [{"Action": "allow", "HTTP": {"PathPrefix": "/orders/", "Methods": ["GET", "POST"]}}]}
+    ]
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+import meshbundle
+from meshctl.bundle import bundle_index, load_bundle
+
+
+def test_meshctl_accepts_the_rendered_index(inventory, render_bundles, tmp_path, capsys):
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    for host in bundles:
+        assert bundle_index(load_bundle(tmp_path / "bundles" / f"{host}.bundle.json"))["version"] == meshbundle.INDEX_VERSION
+    # An index from another renderer version gets the re-render hint.
+    bundle = bundles["dc1-app-01"]
+    with pytest.raises(SystemExit):
+        bundle_index({**bundle, "index": {**bundle["index"], "version": meshbundle.INDEX_VERSION - 1}})
+    assert "re-render it with tools/render-mesh-bundles.py" in capsys.readouterr().err
+
+
+def test_zip_and_json_bundles_hold_the_same(inventory, render_bundles, tmp_path):
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    code, err, _ = render_bundles(inventory, "--format", "zip")
+    assert code == 0, err
+    for host, rendered in bundles.items():
+        loaded = load_bundle(tmp_path / "bundles" / f"{host}.bundle.zip")
+        # The renderer's digest is what meshctl recomputes from the lazily loaded sections.
+        assert meshbundle.files_digest(loaded["files"]) == rendered["index"]["files_sha256"]
+        assert {**loaded, "files": meshbundle.materialize_files(loaded["files"])} == rendered
+
+
+def test_write_bundle_round_trip(inventory, render_bundles, tmp_path):
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    bundle = bundles["dc1-app-01"]
+    meshbundle.write_bundle(tmp_path / "out" / "a.bundle.zip", bundle)
+    meshbundle.write_bundle(tmp_path / "out" / "b.bundle.json", load_bundle(tmp_path / "out" / "a.bundle.zip"))
+    assert json.loads((tmp_path / "out" / "b.bundle.json").read_text()) == bundle
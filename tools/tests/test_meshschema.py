@@ -0,0 +1,106 @@
+import pytest
+
+import meshschema
+
+
+def service(name: str, **extra) -> dict:
+    return {"name": name, "port": 8080, **extra}
+
+
+def test_valid_catalog():
+    catalog = [
+        service("web", sidecar_port="auto", upstreams=[{"destination_name": "refdata", "local_bind_port": 18082}]),
+        service("refdata", port="8082", check={"type": "http", "path": "/actuator/health", "interval": "1m30s"}),
+    ]
+    assert meshschema.catalog_errors(catalog) == []
+
+
+def test_catalog_errors_are_all_reported_with_paths():
+    catalog = [
+        service("Web", port=70000),
+        service("refdata", upstreams=[{"destination_name": "missing", "local_bind_port": "x"}], colour="red"),
+        service("refdata", check={"interval": "soon"}),
+    ]
+    errors = meshschema.catalog_errors(catalog)
+    assert errors == [
+        "service_catalog[0].name: 'Web' does not match [a-z0-9][a-z0-9-]*",
+        "service_catalog[0].port: 70000 is out of range 1..65535",
+        'service_catalog[1].upstreams[0].local_bind_port: expected a port (1-65535) or "auto", got \'x\'',
+        "service_catalog[1]: unknown key 'colour'",
+        "service_catalog[2].check.interval: 'soon' does not match " + meshschema.DURATION,
+        "service_catalog[2]: duplicate service refdata (also service_catalog[1])",
+        "service_catalog[1].upstreams[0]: unknown destination missing",
+    ]
+
+
+def test_exactly_one_bind():
+    both = {"destination_name": "web", "local_bind_port": 18000, "local_bind_socket_path": "web.sock"}
+    neither = {"destination_name": "web"}
+    assert meshschema.validate(meshschema.UPSTREAM, both, "u") == ["u: set exactly one of local_bind_port, local_bind_socket_path"]
+    assert meshschema.validate(meshschema.UPSTREAM, neither, "u") == ["u: set exactly one of local_bind_port, local_bind_socket_path"]
+    # Null optional keys count as unset.
+    assert meshschema.validate(meshschema.UPSTREAM, {**both, "local_bind_socket_path": None}, "u") == []
+
+
+def test_integer_digits_and_types():
+    assert meshschema.validate(meshschema.PORT, "8500", "p") == []
+    assert meshschema.validate(meshschema.PORT, True, "p") == ["p: expected an integer, got True"]
+    assert meshschema.validate(meshschema.integer(0), "1", "n") == ["n: expected an integer, got '1'"]
+
+
+def test_not_a_list():
+    assert meshschema.catalog_errors({"name": "web"}) == ["service_catalog: expected a list, got dict"]
+
+
+def test_bundle_header_skips_files():
+    bundle = {"version": 1, "host": "h", "dc": "dc1", "role": "app", "env": {}, "index": {}, "files": "not decoded"}
+    assert "bundle.files: expected a mapping, got str" in meshschema.bundle_errors(bundle)
+    assert not any(e.startswith("bundle.files") for e in meshschema.bundle_errors(bundle, files=False))
+
+
+def test_bundle_version_is_pinned():
+    bundle = {"version": 2, "host": "h", "dc": "dc1", "role": "app", "env": {"lower": "x"}, "index": {}}
+    errors = meshschema.bundle_errors(bundle, files=False)
+    assert "bundle.version: 2 is out of range 1..1" in errors
+    assert "bundle.env key 'lower': 'lower' does not match [A-Z_][A-Z0-9_]*" in errors
+
+
+def report(schema: dict, value) -> list[str]:
+    errors: list[str] = []
+    meshschema.report(schema, value, "v", errors)
+    return errors
+
+
+def test_fast_path_skips_the_walk_for_valid_values(monkeypatch):
+    catalog = [service(f"svc-{i}", sidecar_port="auto", upstreams=[{"destination_name": "svc-0", "local_bind_port": 18000}]) for i in range(50)]
+    monkeypatch.setattr(meshschema, "report", lambda *a: pytest.fail("report() ran for a valid catalog"))
+    assert meshschema.catalog_errors(catalog) == []
+
+
+@pytest.mark.parametrize(
+    "schema, value",
+    [
+        (meshschema.PORT, 8500),
+        (meshschema.PORT, "8500"),
+        (meshschema.PORT, 0),
+        (meshschema.PORT, True),
+        (meshschema.PORT, "85x"),
+        (meshschema.PORT_OR_AUTO, "auto"),
+        (meshschema.PORT_OR_AUTO, "manual"),
+        (meshschema.string(meshschema.NAME, choices=("web", "Api")), "Api"),
+        (meshschema.string(meshschema.NAME, choices=("web", "Api")), "web"),
+        (meshschema.UPSTREAM, {"destination_name": "web", "local_bind_port": 18000, "local_bind_address": None}),
+        (meshschema.UPSTREAM, {"destination_name": "web"}),
+        (meshschema.UPSTREAM, {"destination_name": "web", "local_bind_port": 18000, "colour": "red"}),
+        (meshschema.SERVICE, {"name": "web", "port": None}),
+        (meshschema.SERVICE, {"name": "web", "port": 1, "check": None, "meta": {"a": 1}}),
+        (meshschema.DATACENTERS, {"dc1": {"priority": 0, "latency_ms": {"dc2": 5}}}),
+        (meshschema.DATACENTERS, {"dc1": {"priority": 0, "latency_ms": {"DC2": 5}}}),
+        (meshschema.BUNDLE_HEADER, {"version": 1, "host": "h", "dc": "dc1", "role": "app", "env": {}, "index": {}, "files": 1}),
+        (meshschema.list_of(meshschema.integer(0)), (1, 2)),
+        (meshschema.obj({}, extra=True), {"anything": object()}),
+    ],
+)
+def test_fast_path_agrees_with_report(schema, value):
+    assert schema["ok"](value) is (report(schema, value) == [])
+    assert meshschema.validate(schema, value, "v") == report(schema, value)
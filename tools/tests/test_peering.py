@@ -0,0 +1,185 @@
+import json
+import os
+import sys
+
+import pytest
+
+from meshctl.cli import main
+from meshctl.common import http_get, http_send
+from meshctl.config_entries import parse_hcl
+
+
+@pytest.fixture
+def peered(inventory, render_bundles):
+    inventory["all"]["vars"]["mesh_federation"] = "peering"
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    return bundles
+
+
+def entries(bundle: dict) -> dict[str, dict]:
+    return {name: parse_hcl(text) for name, text in bundle["files"]["config_entries"].items()}
+
+
+def test_peering_config_entries(peered):
+    dc1, dc2 = entries(peered["dc1-consul-01"]), entries(peered["dc2-consul-01"])
+    assert dc1["mesh.hcl"] == {"Kind": "mesh", "Peering": {"PeerThroughMeshGateways": True}}
+    # Each DC exports every service to its peers, and ships only its own exports.
+    exported = dc1["exported-services-dc1.hcl"]
+    assert (exported["Kind"], exported["Name"]) == ("exported-services", "default")
+    assert {s["Name"]: s["Consumers"] for s in exported["Services"]} == {
+        name: [{"Peer": "dc2"}] for name in ("itch-feed", "ordermanager", "refdata", "webservice")
+    }
+    assert "exported-services-dc2.hcl" not in dc1
+    assert [s["Consumers"] for s in dc2["exported-services-dc2.hcl"]["Services"]][0] == [{"Peer": "dc1"}]
+
+
+def test_peering_resolvers(peered):
+    dc1, dc2 = entries(peered["dc1-consul-01"]), entries(peered["dc2-consul-01"])
+    assert dc1["refdata-resolver-dc1.hcl"]["Failover"] == {"*": {"Targets": [{"Peer": "dc2"}]}}
+    assert dc2["refdata-resolver-dc2.hcl"]["Failover"] == {"*": {"Targets": [{"Peer": "dc1"}]}}
+    # Prefer-primary: the primary's instances are reached through the peer, the local secondaries directly.
+    targets = dc2["ordermanager-resolver-dc2.hcl"]["Failover"]["primary"]["Targets"]
+    assert targets == [{"Peer": "dc1", "ServiceSubset": "primary"}, {"Datacenter": "dc2", "ServiceSubset": "secondary"}]
+
+
+def test_peering_intentions_allow_peer_callers(peered, inventory, render_bundles):
+    dc1, dc2 = entries(peered["dc1-consul-01"]), entries(peered["dc2-consul-01"])
+    assert dc1["intentions-refdata.hcl"]["Sources"] == [
+        {"Name": "ordermanager", "Action": "allow"},
+        {"Name": "webservice", "Action": "allow"},
+        {"Name": "ordermanager", "Peer": "dc2", "Action": "allow"},
+        {"Name": "webservice", "Peer": "dc2", "Action": "allow"},
+    ]
+    assert {s.get("Peer") for s in dc2["intentions-refdata.hcl"]["Sources"]} == {None, "dc1"}
+    # WAN federation: one identity space, no peer sources.
+    inventory["all"]["vars"]["mesh_federation"] = "wan"
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    wan = entries(bundles["dc1-consul-01"])
+    assert not any("Peer" in s for s in wan["intentions-refdata.hcl"]["Sources"])
+    assert "mesh.hcl" not in wan and not any(name.startswith("exported-services-") for name in wan)
+
+
+@pytest.fixture
+def agent(fake_http, monkeypatch):
+    # Server bundles talk to MGMT_BIND_ADDR:8500; send those requests to the fake agent instead.
+    fake = fake_http({"GET /v1/peerings": (200, [])})
+
+    def local(url: str) -> str:
+        return url.replace("http://127.0.0.1:8500", fake.url)
+
+    for module in ("common", "peering", "bench"):
+        monkeypatch.setattr(f"meshctl.{module}.http_get", lambda url, **kw: http_get(local(url), **kw))
+        monkeypatch.setattr(f"meshctl.{module}.http_send", lambda method, url, body, **kw: http_send(method, local(url), body, **kw), raising=False)
+    return fake
+
+
+def meshctl(monkeypatch, *argv: str) -> int:
+    monkeypatch.setattr(sys, "argv", ["meshctl", *argv])
+    return main()
+
+
+def test_peering_token_and_establish(peered, agent, tmp_path, monkeypatch, capsys):
+    tokens = tmp_path / "tokens"
+    dc1 = ["--bundle", str(tmp_path / "bundles" / "dc1-consul-01.bundle.json"), "--token-dir", str(tokens)]
+    dc2 = ["--bundle", str(tmp_path / "bundles" / "dc2-consul-01.bundle.json"), "--token-dir", str(tokens)]
+    agent.routes["POST /v1/peering/token"] = (200, {"PeeringToken": "c2VjcmV0"})
+    agent.routes["POST /v1/peering/establish"] = (200, {})
+    # dc1 has the lower priority value, so it accepts; dc2 dials.
+    assert meshctl(monkeypatch, "peering", "token", *dc1) == 0
+    token = tokens / "dc1-dc2.token"
+    assert token.read_text() == "c2VjcmV0\n"
+    assert token.stat().st_mode & 0o777 == 0o600
+    assert agent.posted("/v1/peering/token") == [{"PeerName": "dc2"}]
+    # The acceptor's bundle has no dialer side, and vice versa.
+    assert meshctl(monkeypatch, "peering", "establish", *dc1) == 0
+    assert agent.posted("/v1/peering/establish") == []
+
+    assert meshctl(monkeypatch, "peering", "establish", *dc2) == 0
+    assert agent.posted("/v1/peering/establish") == [{"PeerName": "dc1", "PeeringToken": "c2VjcmV0"}]
+
+    agent.routes["GET /v1/peerings"] = (200, [{"Name": "dc2", "State": "ACTIVE"}])
+    capsys.readouterr()
+    assert meshctl(monkeypatch, "peering", "token", *dc1) == 0
+    assert "dc2: already ACTIVE" in capsys.readouterr().out
+    assert len(agent.posted("/v1/peering/token")) == 1
+
+
+def test_peering_errors(peered, agent, tmp_path, monkeypatch, capsys):
+    bundle = str(tmp_path / "bundles" / "dc1-consul-01.bundle.json")
+    agent.routes["POST /v1/peering/token"] = (403, "ACL not found")
+    with pytest.raises(SystemExit):
+        meshctl(monkeypatch, "peering", "token", "--bundle", bundle, "--token-dir", str(tmp_path / "tokens"))
+    assert "Failed to generate a peering token for dc2 (403: ACL not found)" in capsys.readouterr().err
+    # The dialer needs the token file copied from the acceptor.
+    with pytest.raises(SystemExit):
+        meshctl(monkeypatch, "peering", "establish", "--bundle", bundle.replace("dc1-", "dc2-"), "--token-dir", str(tmp_path))
+    agent.routes["GET /v1/peerings"] = (500, "")
+    with pytest.raises(SystemExit):
+        meshctl(monkeypatch, "peering", "status", "--bundle", bundle)
+
+
+def test_peering_status(peered, agent, tmp_path, monkeypatch, capsys):
+    bundle = str(tmp_path / "bundles" / "dc1-consul-01.bundle.json")
+    assert meshctl(monkeypatch, "peering", "status", "--bundle", bundle) == 1
+    assert "MISSING" in capsys.readouterr().out
+    stream = {"ImportedServices": ["refdata", "webservice"], "ExportedServices": ["refdata"]}
+    agent.routes["GET /v1/peerings"] = (200, [{"Name": "dc2", "State": "ACTIVE", "StreamStatus": stream}])
+    assert meshctl(monkeypatch, "peering", "status", "--bundle", bundle) == 0
+    assert capsys.readouterr().out.splitlines()[1].split() == ["dc2", "acceptor", "ACTIVE", "2", "1"]
+
+
+def test_peering_needs_a_peering_bundle(inventory, render_bundles, tmp_path, monkeypatch):
+    code, err, _ = render_bundles(inventory)
+    assert code == 0, err
+    with pytest.raises(SystemExit):
+        meshctl(monkeypatch, "peering", "status", "--bundle", str(tmp_path / "bundles" / "dc1-consul-01.bundle.json"))
+
+
+def test_bench_federation(peered, agent, tmp_path, monkeypatch, capsys):
+    scrapes = iter(range(1, 100))
+
+    def metrics(query):
+        n = next(scrapes)
+        return 200, (
+            "# TYPE consul_memberlist_udp_sent counter\n"
+            f'consul_memberlist_udp_sent{{network="wan"}} {1000 * n}\n'
+            f'consul_memberlist_udp_sent{{network="lan"}} {5000 * n}\n'
+            f"consul_rpc_cross_dc {10 * n}\n"
+        )
+
+    # The primary serves the probe until the trigger fails it over, and again after the restore.
+    served = {"dc": "dc1"}
+    agent.routes["GET /v1/agent/metrics"] = metrics
+    agent.routes["GET /probe"] = lambda query: (200, json.dumps({"datacenter": served["dc"]}))
+    agent.routes["GET /trigger"] = lambda query: (served.update(dc="dc2"), (200, "ok"))[1]
+    agent.routes["GET /restore"] = lambda query: (served.update(dc="dc1"), (200, "ok"))[1]
+    # The server pod's traffic is read from /proc/<pid>/net/dev: use this process.
+    monkeypatch.setattr("meshctl.bench.podman", lambda args, **kw: str(os.getpid()))
+    out = tmp_path / "peering.json"
+    argv = ["bench-federation", "--bundle", str(tmp_path / "bundles" / "dc1-consul-01.bundle.json"), "--duration", "0.2", "--out", str(out)]
+    urls = ["--probe-url", f"{agent.url}/probe", "--expect", '"datacenter": "dc2"', "--trigger-url", f"{agent.url}/trigger"]
+    assert meshctl(monkeypatch, *argv, *urls, "--restore-url", f"{agent.url}/restore", "--timeout", "5") == 0
+    result = json.loads(out.read_text())
+    assert result["label"] == "peering"
+    assert result["rates"]["wan_gossip_bytes"] == pytest.approx(1000 / result["duration_s"], rel=0.01)
+    assert result["rates"]["cross_dc_rpc"] == pytest.approx(10 / result["duration_s"], rel=0.01)
+    assert "pod_net_bytes" in result["rates"]
+    assert 0 <= result["failover_s"] < 5 and 0 <= result["restore_s"] < 5
+
+    # A local probe can fail over within the rounding: compare fixed times.
+    out.write_text(json.dumps(dict(result, failover_s=1.0)))
+    (tmp_path / "wan.json").write_text(json.dumps(dict(result, label="wan", failover_s=2.0)))
+    capsys.readouterr()
+    assert meshctl(monkeypatch, "bench-federation", "--compare", str(tmp_path / "wan.json"), str(out)) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ["metric", "wan", "peering", "delta"]
+    assert [line.split()[-1] for line in lines if line.startswith("failover_s")] == ["-50.0%"]
+
+
+def test_bench_federation_without_metrics(peered, agent, tmp_path, monkeypatch, capsys):
+    agent.routes["GET /v1/agent/metrics"] = (403, "")
+    with pytest.raises(SystemExit):
+        meshctl(monkeypatch, "bench-federation", "--bundle", str(tmp_path / "bundles" / "dc1-consul-01.bundle.json"), "--duration", "0")
+    assert "prometheus_retention_time" in capsys.readouterr().err
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from meshbundle import PLAN_VERSION
+from meshctl.placement import format_cpulist, parse_cpulist, plan_placement, read_numa_topology
+from meshctl.plan import podman_step, resolve_plan
+
+
+def test_cpulist_round_trip():
+    assert parse_cpulist("0-3,8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+    assert format_cpulist([11, 10, 8, 3, 2, 1, 0, 2]) == "0-3,8,10-11"
+    assert parse_cpulist("") == []
+
+
+def test_numa_topology_from_sysfs(tmp_path):
+    for node, cpus in (("node0", "0-3"), ("node1", "4-7")):
+        (tmp_path / node).mkdir()
+        (tmp_path / node / "cpulist").write_text(cpus + "\n")
+    assert read_numa_topology(tmp_path) == {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+    assert list(read_numa_topology(tmp_path / "missing")) == [0]
+
+
+def test_placement_hands_out_top_cores_on_the_freest_node():
+    topology = {0: list(range(8)), 1: list(range(8, 16))}
+    placement = {"numa_node": "auto", "app_cpus": "8-13"}
+    plan = plan_placement(placement, [("agent", 1), ("envoy", 2)], topology)
+    assert plan == {"agent": ["--cpuset-cpus", "7", "--cpuset-mems", "0"], "envoy": ["--cpuset-cpus", "5-6", "--cpuset-mems", "0"]}
+
+
+def test_placement_shares_cores_when_oversubscribed(capsys):
+    plan = plan_placement({"numa_node": 0, "app_cpus": "0-5"}, [("agent", 1), ("envoy", 2)], {0: list(range(8))})
+    assert plan["agent"] == plan["envoy"] == ["--cpuset-cpus", "6-7", "--cpuset-mems", "0"]
+    assert "mesh containers will share them" in capsys.readouterr().err
+
+
+def test_placement_rejects_unknown_node():
+    with pytest.raises(SystemExit):
+        plan_placement({"numa_node": 3}, [("agent", 1)], {0: [0, 1]})
+
+
+def plan(**host_checks) -> dict:
+    run = podman_step(["run", "-d", "--name", "envoy", "image"], "envoy", cpuset="envoy")
+    rm = podman_step(["rm", "-f", "envoy"], "envoy", check=False)
+    checks = {"envoy_profiles": {}, "placement": {}, "owners": [["envoy", 2]], **host_checks}
+    return {"version": PLAN_VERSION, "host_checks": checks, "steps": [rm, run]}
+
+
+def test_resolve_plan_applies_local_placement(monkeypatch):
+    monkeypatch.setattr("meshctl.plan.read_numa_topology", lambda: {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]})
+    steps = resolve_plan(plan(placement={"numa_node": 1, "app_cpus": ""}))
+    assert steps[0]["args"] == ["rm", "-f", "envoy"]
+    assert steps[1]["args"] == ["run", "--cpuset-cpus", "6-7", "--cpuset-mems", "1", "-d", "--name", "envoy", "image"]
+    # Without placement the plan runs as expanded.
+    assert resolve_plan(plan())[1]["args"] == ["run", "-d", "--name", "envoy", "image"]
+
+
+def test_resolve_plan_checks_profiles_against_local_cores(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+    with pytest.raises(SystemExit):
+        resolve_plan(plan(envoy_profiles={"envoy": {"concurrency": 2}}))
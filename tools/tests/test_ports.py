@@ -0,0 +1,84 @@
+import pytest
+
+
+def test_port_index_conflicts(render):
+    index = render.PortIndex("h1")
+    index.add(100, 109, "a")
+    index.add(120, 120, "b")
+    index.add(110, 119, "c")
+    assert index.conflict(95, 99) is None
+    assert index.conflict(95, 100) == (100, 109, "a")
+    assert index.conflict(119, 119) == (110, 119, "c")
+    assert index.conflict(121, 200) is None
+    with pytest.raises(SystemExit, match="h1: port 120 is assigned to both b and d"):
+        index.add(115, 125, "d")
+
+
+def test_fixed_ports_follow_gateway_instances(render):
+    assert render.fixed_ports(1, "distinct")[-2:] == [(8443, 8443, "mesh-gateway"), (29100, 29100, "mesh-gateway admin")]
+    assert render.fixed_ports(3, "distinct")[-2:] == [(8443, 8445, "mesh-gateway"), (29100, 29102, "mesh-gateway admin")]
+    # reuseport: every instance binds the same public port, but each has its own admin port.
+    assert render.fixed_ports(3, "reuseport")[-2:] == [(8443, 8443, "mesh-gateway"), (29100, 29102, "mesh-gateway admin")]
+    gateways = render.mesh_gateways("dc1", 3, "distinct")
+    (lo, hi, _), (admin_lo, admin_hi, _) = render.fixed_ports(3, "distinct")[-2:]
+    assert all(lo <= gw["port"] <= hi and admin_lo <= gw["admin_port"] <= admin_hi for gw in gateways)
+
+
+def services() -> dict:
+    return {
+        "web": {"name": "web", "port": 8080, "sidecar_port": "auto", "upstreams": [{"destination_name": "api", "local_bind_port": "auto"}]},
+        "api": {"name": "api", "port": 8081, "sidecar_port": 21000, "upstreams": []},
+    }
+
+
+def test_auto_ports_skip_pinned_and_admin_ports(render):
+    hosts = {"h1": (["web", "api"], 8000, render.fixed_ports(1, "distinct")), "h2": (["web"], 8000, render.fixed_ports(1, "distinct"))}
+    out = render.allocate_ports({}, hosts, services())
+    # 21000 is api's sidecar on h1; 21001 is free on both hosts, and so is its admin port 29001.
+    assert out["web"]["sidecar_port"] == 21001
+    assert out["web"]["upstreams"][0]["local_bind_port"] == 18000
+    # The input catalog is not modified.
+    assert services()["web"]["sidecar_port"] == "auto"
+
+
+def test_auto_ports_avoid_extra_gateway_instances(render):
+    ranges = {"port_ranges": {"sidecar": [8443, 8460], "upstream": [29100, 29110]}}
+    one = render.allocate_ports(ranges, {"h1": (["web"], 1000, render.fixed_ports(1, "distinct"))}, services())
+    assert one["web"]["sidecar_port"] == 8444
+    assert one["web"]["upstreams"][0]["local_bind_port"] == 29101
+    three = render.allocate_ports(ranges, {"h1": (["web"], 1000, render.fixed_ports(3, "distinct"))}, services())
+    assert three["web"]["sidecar_port"] == 8446
+    assert three["web"]["upstreams"][0]["local_bind_port"] == 29103
+
+
+def test_pinned_port_on_gateway_instance_fails_render(inventory, render_bundles):
+    inventory["all"]["vars"]["mesh_gateway_instances"] = 3
+    inventory["all"]["vars"]["service_catalog"][0]["port"] = 8445
+    code, err, _ = render_bundles(inventory)
+    assert code != 0
+    assert "port 8445 is assigned to both mesh-gateway and" in err
+
+
+def test_auto_port_exhaustion(render):
+    ranges = {"port_ranges": {"sidecar": [21000, 21000], "upstream": [18000, 18000]}}
+    with pytest.raises(SystemExit, match="port_ranges.sidecar 21000-21000 has no port free on h1"):
+        render.allocate_ports(ranges, {"h1": (["web", "api"], 8000, render.fixed_ports(1, "distinct"))}, services())
+
+
+def test_auto_ports_skip_the_dns_cache_port(inventory, render_bundles):
+    all_vars = inventory["all"]["vars"]
+    all_vars["dns_cache"] = {"enabled": True, "port": 18000}
+    all_vars["port_ranges"] = {"upstream": [18000, 18001]}
+    all_vars["service_catalog"][0]["upstreams"][0]["local_bind_port"] = "auto"
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    sidecars = {sc["name"]: sc for sc in bundles["dc1-app-01"]["index"]["sidecars"]}
+    assert 18001 in sidecars["webservice"]["upstream_ports"]
+    assert 18000 not in sidecars["webservice"]["upstream_ports"]
+
+
+def test_pinned_port_on_the_dns_cache_port_fails_render(inventory, render_bundles):
+    inventory["all"]["vars"]["dns_cache"] = {"enabled": True, "port": 18082}
+    code, err, _ = render_bundles(inventory)
+    assert code != 0
+    assert "port 18082 is assigned to both dns_cache and webservice (upstream refdata)" in err
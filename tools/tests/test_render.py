@@ -0,0 +1,50 @@
+import meshschema
+
+
+def test_example_inventory_renders(inventory, render_bundles):
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    assert set(bundles) == {"dc1-consul-01", "dc2-consul-01", "dc1-app-01", "dc2-app-01"}
+    for bundle in bundles.values():
+        assert meshschema.bundle_errors(bundle) == []
+
+
+def test_placed_host_renders(inventory, render_bundles):
+    # The placement example from config/mesh.example.yml.
+    inventory["_meta"]["hostvars"]["dc1-app-01"]["placement"] = {"numa_node": "auto", "app_cpus": "0-11", "agent_cores": 1, "sidecar_cores": 1}
+    inventory["_meta"]["hostvars"]["dc2-app-01"]["placement"] = {"numa_node": 1}
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    assert bundles["dc1-app-01"]["placement"] == {"numa_node": "auto", "app_cpus": "0-11", "agent_cores": 1, "sidecar_cores": 1}
+    assert bundles["dc2-app-01"]["placement"] == {"numa_node": 1, "app_cpus": "", "agent_cores": 1, "sidecar_cores": 1}
+    assert "placement" not in bundles["dc1-consul-01"]
+
+
+def test_bundle_schema_rejects_bad_placement(inventory, render_bundles):
+    code, _, bundles = render_bundles(inventory)
+    assert code == 0
+    bundle = bundles["dc1-app-01"]
+    bundle["placement"] = {"numa_node": "any", "app_cpus": "0-3", "agent_cores": 0, "sidecar_cores": 1}
+    errors = meshschema.bundle_errors(bundle)
+    assert 'bundle.placement.numa_node: expected a NUMA node number or "auto", got \'any\'' in errors
+    assert "bundle.placement.agent_cores: 0 is out of range 1.." in errors
+
+
+def test_envoy_profiles_are_opt_in(inventory, render_bundles):
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    assert all(not bundle.get("envoy_profiles") for bundle in bundles.values())
+    # The profiles from config/mesh.example.yml, once enabled.
+    all_vars = inventory["all"]["vars"]
+    all_vars["envoy_resource_profiles"] = {
+        "small": {"concurrency": 1, "cpus": "0.5", "memory": "256m", "max_heap_bytes": 201326592, "stats_flush_interval": "10s"},
+        "hot": {"concurrency": 2, "cpus": "2", "memory": "512m", "max_heap_bytes": 402653184, "buffer_limit_bytes": 1048576},
+    }
+    all_vars["envoy_default_profile"] = "small"
+    next(s for s in all_vars["service_catalog"] if s["name"] == "refdata")["envoy_profile"] = "hot"
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    profiles = bundles["dc1-app-01"]["envoy_profiles"]
+    assert profiles["refdata"]["concurrency"] == 2
+    assert {name for name, p in profiles.items() if p["concurrency"] == 1} == {"webservice", "ordermanager", "itch-feed"}
+    assert set(bundles["dc1-consul-01"]["envoy_profiles"]) == {"mesh-gateway"}
@@ -0,0 +1,98 @@
+import csv
+import gzip
+import json
+import sys
+
+import pytest
+
+from meshctl.cli import main
+from meshctl.snapshot import SNAPSHOT_COLUMNS, diff_snapshots, instance_health, open_snapshot, passing_by_service, read_snapshot
+
+
+def row(dc: str, service: str, instance: str, check: str, status: str) -> tuple:
+    return (dc, service, f"{service}-{instance}" if instance else "", f"{dc}-app-01" if instance else "", check, status, "")
+
+
+BEFORE = [
+    row("dc1", "web", "1", "serfHealth", "passing"),
+    row("dc1", "web", "1", "service:web-1", "passing"),
+    row("dc1", "web", "2", "service:web-2", "passing"),
+    row("dc2", "web", "1", "service:web-1", "passing"),
+    row("dc2", "api", "1", "service:api-1", "warning"),
+]
+
+
+def write_snapshot(path, rows: list[tuple]) -> None:
+    with open_snapshot(path, "w") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(SNAPSHOT_COLUMNS)
+        writer.writerows(rows)
+
+
+def test_instance_health_takes_the_worst_check():
+    rows = [*BEFORE, row("dc1", "web", "1", "service:web-1:tcp", "critical"), row("dc1", "db", "", "", "")]
+    assert instance_health(rows) == {
+        ("dc1", "web", "web-1", "dc1-app-01"): "critical",
+        ("dc1", "web", "web-2", "dc1-app-01"): "passing",
+        ("dc2", "web", "web-1", "dc2-app-01"): "passing",
+        ("dc2", "api", "api-1", "dc2-app-01"): "warning",
+    }
+    assert passing_by_service(rows) == {("dc1", "web"): (1, 2), ("dc2", "web"): (1, 1), ("dc2", "api"): (0, 1)}
+
+
+def test_diff_snapshots():
+    after = [r for r in BEFORE if r[2] != "web-2"]
+    after = [(*r[:5], "critical", r[6]) if r[:2] == ("dc2", "web") else r for r in after]
+    after.append(row("dc2", "api", "2", "service:api-2", "passing"))
+    diff = diff_snapshots(BEFORE, after)
+    assert (diff["checks_added"], diff["checks_removed"]) == (1, 1)
+    assert diff["checks_changed"] == [
+        {
+            "dc": "dc2",
+            "service": "web",
+            "service_id": "web-1",
+            "node": "dc2-app-01",
+            "check_id": "service:web-1",
+            "before": "passing",
+            "after": "critical",
+        }
+    ]
+    assert [(s["dc"], s["service"], s["passing_before"], s["passing_after"]) for s in diff["services"]] == [
+        ("dc1", "web", 2, 1),
+        ("dc2", "api", 0, 1),
+        ("dc2", "web", 1, 0),
+    ]
+    assert diff["lost_dc"] == ["web@dc2"]
+    assert diff_snapshots(BEFORE, list(reversed(BEFORE))) == {
+        "checks_added": 0,
+        "checks_removed": 0,
+        "checks_changed": [],
+        "services": [],
+        "lost_dc": [],
+    }
+
+
+@pytest.mark.parametrize("name", ["snap.csv", "snap.csv.gz"])
+def test_snapshot_files_round_trip(tmp_path, name):
+    path = tmp_path / name
+    write_snapshot(path, BEFORE)
+    if name.endswith(".gz"):
+        assert gzip.open(path, "rt").readline().strip() == ",".join(SNAPSHOT_COLUMNS)
+    assert read_snapshot(path) == BEFORE
+
+
+def test_read_snapshot_rejects_other_csv(tmp_path):
+    path = tmp_path / "other.csv"
+    path.write_text("a,b\n1,2\n")
+    with pytest.raises(SystemExit):
+        read_snapshot(path)
+
+
+def test_snapshot_diff_command(tmp_path, monkeypatch, capsys):
+    write_snapshot(tmp_path / "a.csv", BEFORE)
+    write_snapshot(tmp_path / "b.csv.gz", [r for r in BEFORE if r[:2] != ("dc2", "web")])
+    monkeypatch.setattr(sys, "argv", ["meshctl", "snapshot", "--diff", str(tmp_path / "a.csv"), str(tmp_path / "b.csv.gz"), "--json"])
+    assert main() == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["checks_removed"] == 1
+    assert result["lost_dc"] == ["web@dc2"]
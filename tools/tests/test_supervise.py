@@ -0,0 +1,78 @@
+import socket
+
+import pytest
+
+from meshbundle import INDEX_VERSION
+from meshctl.dns import dns_probe, dns_stub
+from meshctl.plan import podman_step, run_plan
+from meshctl.supervise import supervise_checks
+
+
+def bundle(role: str) -> dict:
+    index = {
+        "version": INDEX_VERSION,
+        "pod": f"mesh-{role}-dc1",
+        "containers": {"consul": "consul-server-dc1"} if role == "server" else {"agent": "consul-agent-dc1"},
+        "gateways": [{"container": "mesh-gateway-dc1", "admin_port": 29100}],
+        "services": [{"name": "web", "id": "web-dc1"}],
+        "sidecars": [],
+    }
+    return {"host": "h1", "role": role, "index": index}
+
+
+@pytest.fixture
+def http(monkeypatch):
+    # path -> (code, body) served by a fake http_get.
+    responses: dict[str, tuple[int, str]] = {}
+    monkeypatch.setattr("meshctl.supervise.http_get", lambda url, timeout_s=2.0: responses.get(url.split(":8500", 1)[-1], (0, "refused")))
+    return responses
+
+
+def test_server_check_is_local_agent_health(http):
+    check = supervise_checks(bundle("server"), {})["consul-server-dc1"]
+    # No leader anywhere: the local agent still answers, so there is nothing to restart here.
+    http["/v1/agent/self"] = (200, "{}")
+    http["/v1/status/leader"] = (200, '""')
+    assert check() == ""
+    del http["/v1/agent/self"]
+    assert check() == "agent unreachable (0)"
+
+
+def test_agent_check_survives_bad_output(http):
+    check = supervise_checks(bundle("app"), {})["consul-agent-dc1"]
+    http["/v1/agent/services"] = (200, "<html>proxy error</html>")
+    assert check() == "failed to parse /v1/agent/services response"
+    http["/v1/agent/services"] = (200, "[]")
+    assert check() == "failed to parse /v1/agent/services response"
+    http["/v1/agent/services"] = (200, '{"web-dc1": {}}')
+    assert check() == ""
+    http["/v1/agent/services"] = (200, "{}")
+    assert check() == "services missing: web-dc1"
+
+
+def test_dns_probe_needs_an_answer():
+    with dns_stub() as server:
+        assert dns_probe(server, "web.service.consul", 1.0) == ""
+    # Something bound to the port that never answers (like a port forwarder with CoreDNS down).
+    silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    silent.bind(("127.0.0.1", 0))
+    try:
+        assert dns_probe(silent.getsockname(), "web.service.consul", 0.2).startswith("DNS cache not answering")
+    finally:
+        silent.close()
+
+
+def test_single_component_restart_keeps_maintenance(monkeypatch):
+    ran: list[str] = []
+    monkeypatch.setattr("meshctl.plan.podman", lambda args, **kw: ran.append(args[-1]))
+    monkeypatch.setattr("meshctl.plan.set_maintenance", lambda url, ids, enable: ran.append("maintenance_off"))
+    steps = [
+        podman_step(["run", "web-envoy"], "web-envoy"),
+        podman_step(["run", "api-envoy"], "api-envoy"),
+        {"op": "maintenance_off", "url": "http://127.0.0.1:8500", "service_ids": ["web"]},
+    ]
+    run_plan(steps, only={"web-envoy"})
+    assert ran == ["web-envoy"]
+    ran.clear()
+    run_plan(steps)
+    assert ran == ["web-envoy", "api-envoy", "maintenance_off"]
@@ -0,0 +1,56 @@
+import json
+import sys
+
+import pytest
+
+from meshctl.cli import main
+from meshctl.verify import verify_base
+
+
+def test_verify_base():
+    app = {"host": "app-01", "role": "app", "host_ip": "10.0.0.10", "env": {}}
+    server = {"host": "srv-01", "role": "server", "host_ip": "10.0.0.21", "env": {"MGMT_BIND_ADDR": "127.0.0.1"}}
+    assert verify_base(app, {}, {"app-01"}) == "http://127.0.0.1:8500"
+    assert verify_base(app, {}, {"other"}) == "http://10.0.0.10:8500"
+    assert verify_base(app, {"app-01": "127.0.0.1:18500"}, {"other"}) == "http://127.0.0.1:18500"
+    assert verify_base(server, {}, {"srv-01"}) == "http://127.0.0.1:8500"
+    assert verify_base(server, {}, {"other"}) == "http://10.0.0.21:8500"
+    routed = {**server, "env": {"MGMT_BIND_ADDR": "10.9.0.21"}}
+    assert verify_base(routed, {}, {"other"}) == "http://10.9.0.21:8500"
+    assert verify_base(server, {"srv-01": "10.9.0.1"}, {"srv-01"}) == "http://10.9.0.1:8500"
+
+
+@pytest.fixture
+def agents(fake_http):
+    # A local agent with the given services registered; returns its port.
+    def start(service_ids: list[str]) -> int:
+        return fake_http({"GET /v1/agent/services": (200, {sid: {"ID": sid} for sid in service_ids})}, default=(200, {})).server_address[1]
+
+    return start
+
+
+def test_each_bundle_is_checked_against_its_own_agent(inventory, render_bundles, tmp_path, agents, monkeypatch, capsys):
+    code, err, bundles = render_bundles(inventory)
+    assert code == 0, err
+    apps = {host: b for host, b in bundles.items() if b["role"] == "app"}
+    # dc1's agent has everything registered; dc2's agent misses one service.
+    ports = {
+        "dc1-app-01": agents([s["id"] for s in apps["dc1-app-01"]["index"]["services"]]),
+        "dc2-app-01": agents([s["id"] for s in apps["dc2-app-01"]["index"]["services"]][1:]),
+    }
+    addresses = [arg for host, port in ports.items() for arg in ("--address", f"{host}=127.0.0.1:{port}")]
+    paths = [arg for host in apps for arg in ("--bundle", str(tmp_path / "bundles" / f"{host}.bundle.json"))]
+    monkeypatch.setattr(sys, "argv", ["meshctl", "verify", *paths, *addresses, "--json"])
+    assert main() == 1
+    results = {r["host"]: r for r in json.loads(capsys.readouterr().out)["results"]}
+    assert results["dc1-app-01"]["ok"]
+    assert results["dc1-app-01"]["consul"] == f"http://127.0.0.1:{ports['dc1-app-01']}"
+    missing = apps["dc2-app-01"]["index"]["services"][0]["id"]
+    services = {c["name"]: c for c in results["dc2-app-01"]["checks"]}["services"]
+    assert services["detail"] == f"missing registered services: {missing}"
+
+
+def test_address_must_name_a_host(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["meshctl", "verify", "--bundle", "x.bundle.json", "--address", "127.0.0.1:8500"])
+    with pytest.raises(SystemExit):
+        main()